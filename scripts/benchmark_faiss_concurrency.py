@@ -0,0 +1,88 @@
+import argparse
+import json
+import logging
+import os
+import sys
+
+import faiss
+from dotenv import load_dotenv
+
+# Add src directory to sys.path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+
+from qa.databases_creation.faiss.db_creation import build_index
+from qa.databases_creation.faiss.embedding_ingest import load_embedding_shards
+from qa.databases_creation.faiss.index_benchmark import benchmark_concurrency
+
+load_dotenv()
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(message)s")
+
+
+def default_workers():
+    """1, 2, 4, ... up to the number of cores (always including it)."""
+    cores = os.cpu_count() or 1
+    workers = [1]
+    while workers[-1] * 2 < cores:
+        workers.append(workers[-1] * 2)
+    return workers + [cores] if cores > 1 else workers
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Measure concurrent single-query FAISS search throughput for "
+        "each number of search workers."
+    )
+    parser.add_argument("--index", default=os.getenv("FAISS_PATH"))
+    parser.add_argument(
+        "--shards",
+        default=os.getenv("EMBEDDING_VECTOR_PATH"),
+        help="Embedding shards to sample queries from",
+    )
+    parser.add_argument(
+        "--build",
+        metavar="INDEX_TYPE",
+        help="Build an index of this type from the shards instead of reading --index",
+    )
+    parser.add_argument("--workers", nargs="+", type=int, default=default_workers())
+    parser.add_argument("--omp-threads", type=int, default=1)
+    parser.add_argument("--nprobe", type=int, default=10)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--output", help="Write the results as JSON")
+    args = parser.parse_args()
+
+    _, embeddings = load_embedding_shards(args.shards)
+    embeddings = embeddings.astype("float32")
+    faiss.normalize_L2(embeddings)
+    index = (
+        build_index(embeddings, args.build)
+        if args.build
+        else faiss.read_index(args.index)
+    )
+
+    results = benchmark_concurrency(
+        index,
+        embeddings,
+        args.workers,
+        k=args.k,
+        nprobe=args.nprobe,
+        n_queries=args.queries,
+        omp_threads=args.omp_threads,
+    )
+
+    print(f"\n{'workers':>8}{'qps':>10}{'speedup':>10}{'p50 ms':>10}{'p99 ms':>10}")
+    for result in results:
+        print(
+            f"{result['workers']:>8}{result['qps']:>10.1f}"
+            f"{result['qps'] / results[0]['qps']:>10.2f}"
+            f"{result['p50_ms']:>10.3f}{result['p99_ms']:>10.3f}"
+        )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        logging.info(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
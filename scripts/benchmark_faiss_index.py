@@ -0,0 +1,101 @@
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+
+import faiss
+from dotenv import load_dotenv
+
+# Add src directory to sys.path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+
+from qa.databases_creation.faiss.db_creation import (
+    INDEX_TYPES,
+    REDUCTIONS,
+    build_index,
+)
+from qa.databases_creation.faiss.embedding_ingest import load_embedding_shards
+from qa.databases_creation.faiss.index_benchmark import benchmark_index
+
+load_dotenv()
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(message)s")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Build each FAISS index type over the embedding shards and compare "
+        "recall@k against exact full-dimension search, query latency and size."
+    )
+    parser.add_argument("--shards", default=os.getenv("EMBEDDING_VECTOR_PATH"))
+    parser.add_argument(
+        "--types", nargs="+", default=list(INDEX_TYPES), choices=list(INDEX_TYPES)
+    )
+    parser.add_argument(
+        "--nlist", type=int, help="IVF lists (default: from corpus size)"
+    )
+    parser.add_argument("--train-size", type=int, help="Training sample size")
+    parser.add_argument(
+        "--reduce-dims",
+        nargs="+",
+        type=int,
+        default=[0],
+        help="Dimensions to reduce to before indexing (0 keeps the full dimension)",
+    )
+    parser.add_argument("--reduction", default="pca", choices=REDUCTIONS)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--output", help="Write the full reports as JSON")
+    args = parser.parse_args()
+
+    _, embeddings = load_embedding_shards(args.shards)
+    embeddings = embeddings.astype("float32")
+    faiss.normalize_L2(embeddings)
+
+    reports = []
+    for index_type in args.types:
+        for reduce_dim in args.reduce_dims:
+            start = time.time()
+            index = build_index(
+                embeddings,
+                index_type,
+                args.nlist,
+                args.train_size,
+                reduce_dim,
+                args.reduction,
+            )
+            build_seconds = time.time() - start
+            report = benchmark_index(
+                index, embeddings, k=args.k, n_queries=args.queries
+            )
+            report.update(
+                index_type=index_type,
+                reduction=args.reduction if reduce_dim else None,
+                build_seconds=round(build_seconds, 2),
+            )
+            reports.append(report)
+
+    print(
+        f"\n{'index':<12}{'dim':>6}  {'setting':<16}{f'recall@{args.k}':>10}{'p50 ms':>10}"
+        f"{'p99 ms':>10}{'MB':>10}{'build s':>10}"
+    )
+    for report in reports:
+        for search in report["searches"]:
+            name, value = next(iter(search.items()))
+            print(
+                f"{report['index_type']:<12}{report['index_dim']:>6}  "
+                f"{f'{name}={value}':<16}"
+                f"{search['recall_at_k']:>10.3f}{search['p50_ms']:>10.3f}"
+                f"{search['p99_ms']:>10.3f}{report['size_bytes'] / 1e6:>10.1f}"
+                f"{report['build_seconds']:>10.1f}"
+            )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(reports, f, indent=2)
+        logging.info(f"Reports written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,22 @@
+import argparse
+import logging
+import os
+import sys
+
+# Add src directory to sys.path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+
+from qa.context_retrieval.faiss.metadata_store import convert_json_metadata
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(message)s")
+
+# Convert the legacy metadata JSON into the memory-mapped metadata store directory
+parser = argparse.ArgumentParser()
+parser.add_argument(
+    "json_path", help="Legacy metadata JSON written by the FAISS builder"
+)
+parser.add_argument("output_dir", help="Directory to write the metadata store to")
+args = parser.parse_args()
+
+convert_json_metadata(args.json_path, args.output_dir)
+print(f"Metadata store written to '{args.output_dir}'.")
@@ -0,0 +1,136 @@
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+
+import numpy as np
+from dotenv import load_dotenv
+from sentence_transformers import SentenceTransformer
+
+# Add src directory to sys.path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+
+from qa.qa_router_pipeline import ROUTER_CONFIDENCE_THRESHOLD, RouterPipeline
+from qa.router.local_router import (
+    LABELED_QUESTIONS_PATH,
+    ROUTER_LOG_PATH,
+    LocalRouter,
+    encode_questions,
+    load_labeled_questions,
+)
+
+load_dotenv()
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(message)s")
+
+
+def load_llm_labels(log_path):
+    """Return {question: label} for questions the LLM router classified, from the router log."""
+    llm_labels = {}
+    if not log_path or not os.path.exists(log_path):
+        return llm_labels
+    with open(log_path, "r") as f:
+        for line in f:
+            if line.strip():
+                entry = json.loads(line)
+                if entry["source"] != "local":
+                    llm_labels[entry["question"]] = entry["label"]
+    return llm_labels
+
+
+def split_by_label(labels, test_fraction, seed=0):
+    """Return (train_rows, test_rows), holding out `test_fraction` of each label."""
+    random_state = np.random.RandomState(seed)
+    labels = np.asarray(labels)
+    train_rows, test_rows = [], []
+    for label in np.unique(labels):
+        rows = random_state.permutation(np.flatnonzero(labels == label))
+        test_count = max(1, int(round(len(rows) * test_fraction)))
+        test_rows.extend(rows[:test_count])
+        train_rows.extend(rows[test_count:])
+    return np.array(train_rows), np.array(test_rows)
+
+
+def report(name, predicted, confidences, reference, threshold):
+    predicted, reference = np.asarray(predicted), np.asarray(reference)
+    confident = confidences >= threshold
+    print(
+        f"{name}: accuracy {np.mean(predicted == reference):.1%} on {len(reference)} questions"
+    )
+    if confident.any():
+        print(
+            f"    confidence >= {threshold}: {confident.mean():.1%} answered locally, "
+            f"accuracy {np.mean(predicted[confident] == reference[confident]):.1%}"
+        )
+
+
+# Train the local question router and compare it with the LLM router
+parser = argparse.ArgumentParser()
+parser.add_argument("--model", default=os.getenv("EMBEDDING_MODEL_PATH"))
+parser.add_argument("--output", default=os.getenv("ROUTER_MODEL_PATH"))
+parser.add_argument("--labeled", default=LABELED_QUESTIONS_PATH)
+parser.add_argument("--log", default=ROUTER_LOG_PATH, help="Router log with LLM labels")
+parser.add_argument("--agent", help="Also classify held-out questions with this LLM")
+parser.add_argument("--test-fraction", type=float, default=0.3)
+parser.add_argument("--threshold", type=float, default=ROUTER_CONFIDENCE_THRESHOLD)
+args = parser.parse_args()
+
+model = SentenceTransformer(args.model)
+
+# Hand labels take precedence over labels the LLM router logged
+questions, labels = load_labeled_questions(args.labeled)
+llm_labels = load_llm_labels(args.log)
+for question, label in llm_labels.items():
+    if question not in questions:
+        questions.append(question)
+        labels.append(label)
+logging.info(
+    f"{len(questions)} labeled questions ({len(llm_labels)} from the router log)"
+)
+
+train_rows, test_rows = split_by_label(labels, args.test_fraction)
+router = LocalRouter.fit(
+    model, [questions[i] for i in train_rows], [labels[i] for i in train_rows]
+)
+
+test_questions = [questions[i] for i in test_rows]
+test_labels = [labels[i] for i in test_rows]
+start = time.time()
+predicted, confidences = router.predict_embeddings(
+    encode_questions(model, test_questions)
+)
+print(
+    f"Local router: {(time.time() - start) * 1000 / len(test_rows):.2f} ms per question"
+)
+report("Local router vs labels", predicted, confidences, test_labels, args.threshold)
+
+# Agreement with the LLM router, from logged decisions and optionally live calls
+reference = {q: llm_labels[q] for q in test_questions if q in llm_labels}
+if args.agent:
+    llm_router = RouterPipeline(model, None, None)
+    llm_predicted = []
+    start = time.time()
+    for question in test_questions:
+        llm_predicted.append(llm_router.classify_with_llm(question, args.agent))
+        reference.setdefault(question, llm_predicted[-1])
+    print(
+        f"LLM router ({args.agent}): {(time.time() - start) / len(test_rows):.2f} s per question"
+    )
+    print(
+        f"LLM router vs labels: accuracy {np.mean(np.array(llm_predicted) == test_labels):.1%}"
+    )
+if reference:
+    rows = [i for i, q in enumerate(test_questions) if q in reference]
+    report(
+        "Local router vs LLM router",
+        [predicted[i] for i in rows],
+        confidences[rows],
+        [reference[test_questions[i]] for i in rows],
+        args.threshold,
+    )
+
+# Retrain on everything before saving
+if args.output:
+    LocalRouter.fit(model, questions, labels).save(args.output)
+    print(f"Local router saved to '{args.output}'.")
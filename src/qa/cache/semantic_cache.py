@@ -0,0 +1,147 @@
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+import faiss
+import numpy as np
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(message)s")
+
+
+def data_version(paths):
+    """
+    Fingerprint the data files answers are derived from.
+
+    Uses (mtime, size) of each path and of SQLite's -wal file, since in WAL mode
+    writes land there until the next checkpoint. For a directory (the metadata
+    store), its manifest is used.
+    """
+    version = []
+    for path in paths:
+        if not path:
+            continue
+        if os.path.isdir(path):
+            path = os.path.join(path, "manifest.json")
+        for candidate in (path, f"{path}-wal"):
+            try:
+                stat = os.stat(candidate)
+                version.append((candidate, stat.st_mtime_ns, stat.st_size))
+            except FileNotFoundError:
+                version.append((candidate, None, None))
+    return tuple(version)
+
+
+def question_numbers(question):
+    """Numbers in a question (years, ratings, counts), which must match exactly."""
+    return tuple(sorted(re.findall(r"\d+(?:\.\d+)?", question)))
+
+
+class SemanticCache:
+    """
+    In-memory cache of answers keyed by question embedding, per agent type.
+
+    A lookup returns the answer of the most similar cached question when the cosine
+    similarity reaches `threshold`, the agent type matches and the question mentions
+    the same numbers (so "negative reviews in 2022" never answers "... in 2023").
+    Entries expire after `ttl_seconds`, the least recently used entry is evicted
+    beyond `max_entries`, and everything is dropped when the data version changes.
+    """
+
+    def __init__(
+        self, threshold=0.95, ttl_seconds=3600, max_entries=512, data_paths=()
+    ):
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.data_paths = list(data_paths)
+        self.stats = {
+            "hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "expirations": 0,
+            "invalidations": 0,
+        }
+        self._lock = threading.Lock()
+        self._indexes = {}  # agent type -> IndexIDMap2 over normalized embeddings
+        self._entries = OrderedDict()  # id -> entry, least recently used first
+        self._next_id = 0
+        self._version = data_version(self.data_paths)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _check_version(self):
+        version = data_version(self.data_paths)
+        if version != self._version:
+            logging.info("Data changed; clearing the semantic answer cache")
+            self._indexes.clear()
+            self._entries.clear()
+            self._version = version
+            self.stats["invalidations"] += 1
+
+    def _remove(self, entry_id):
+        entry = self._entries.pop(entry_id)
+        self._indexes[entry["agent_type"]].remove_ids(
+            np.array([entry_id], dtype="int64")
+        )
+
+    def get(self, question, embedding, agent_type):
+        """Return the cached answer for a similar question, or None."""
+        embedding = np.asarray(embedding, dtype="float32").reshape(1, -1)
+        with self._lock:
+            self._check_version()
+            index = self._indexes.get(agent_type)
+            if index is not None and index.ntotal:
+                similarities, ids = index.search(embedding, min(5, index.ntotal))
+                now = time.time()
+                numbers = question_numbers(question)
+                for similarity, entry_id in zip(similarities[0], ids[0]):
+                    if entry_id < 0 or similarity < self.threshold:
+                        break
+                    entry = self._entries[entry_id]
+                    if now - entry["created_at"] > self.ttl_seconds:
+                        self._remove(entry_id)
+                        self.stats["expirations"] += 1
+                        continue
+                    if entry["numbers"] != numbers:
+                        continue
+                    self._entries.move_to_end(entry_id)
+                    self.stats["hits"] += 1
+                    logging.info(
+                        f"Semantic cache hit ({similarity:.3f}) for "
+                        f"'{question}' via '{entry['question']}'"
+                    )
+                    return entry["answer"]
+            self.stats["misses"] += 1
+            return None
+
+    def put(self, question, embedding, agent_type, answer):
+        """Cache an answer; empty answers are not cached."""
+        if not answer:
+            return
+        embedding = np.asarray(embedding, dtype="float32").reshape(1, -1)
+        with self._lock:
+            self._check_version()
+            index = self._indexes.get(agent_type)
+            if index is None:
+                index = faiss.IndexIDMap2(faiss.IndexFlatIP(embedding.shape[1]))
+                self._indexes[agent_type] = index
+
+            entry_id = self._next_id
+            self._next_id += 1
+            index.add_with_ids(embedding, np.array([entry_id], dtype="int64"))
+            self._entries[entry_id] = {
+                "agent_type": agent_type,
+                "question": question,
+                "numbers": question_numbers(question),
+                "answer": answer,
+                "created_at": time.time(),
+            }
+
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self.stats["evictions"] += 1
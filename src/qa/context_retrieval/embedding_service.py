@@ -0,0 +1,108 @@
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+import numpy as np
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "1024"))
+EMBEDDING_BATCH_WINDOW_MS = float(os.getenv("EMBEDDING_BATCH_WINDOW_MS", "5"))
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(message)s")
+
+
+class EmbeddingService:
+    """
+    Shared query encoder wrapping a SentenceTransformer.
+
+    `encode(text)` returns an L2-normalized float32 row of shape (1, dim), so it can
+    stand in for the model wherever a single question is encoded. Vectors are kept
+    in a bounded LRU, and concurrent requests for a text already being encoded wait
+    for that encode instead of starting another. A lone miss is encoded at once;
+    while another batch is encoding, a new miss waits up to `batch_window_ms` so
+    misses from parallel Streamlit sessions share one forward pass.
+    """
+
+    def __init__(
+        self,
+        model,
+        max_entries=EMBEDDING_CACHE_SIZE,
+        batch_window_ms=EMBEDDING_BATCH_WINDOW_MS,
+    ):
+        self.model = model
+        self.max_entries = max_entries
+        self.batch_window = batch_window_ms / 1000
+        self.stats = {"hits": 0, "misses": 0, "batches": 0, "encoded": 0}
+        self._lock = threading.Lock()
+        self._cache = OrderedDict()  # text -> normalized vector
+        self._in_flight = {}  # text -> Future, until its vector is cached
+        self._pending = []  # in-flight texts waiting for the next batch
+        self._batch_scheduled = False
+
+    def encode(self, text):
+        """Return the normalized float32 embedding of `text` with shape (1, dim)."""
+        with self._lock:
+            vector = self._cache.get(text)
+            if vector is not None:
+                self._cache.move_to_end(text)
+                self.stats["hits"] += 1
+                return vector.copy()
+
+            self.stats["misses"] += 1
+            future = self._in_flight.get(text)
+            leader = wait = False
+            if future is None:
+                future = Future()
+                self._in_flight[text] = future
+                self._pending.append(text)
+                if not self._batch_scheduled:
+                    self._batch_scheduled = True
+                    leader = True
+                    # Other texts in flight mean concurrent traffic worth batching
+                    wait = len(self._in_flight) > 1
+
+        # The first miss of a batch encodes it, after holding it open under load
+        if leader:
+            if wait:
+                time.sleep(self.batch_window)
+            self._encode_pending()
+
+        return future.result().copy()
+
+    def _encode_pending(self):
+        with self._lock:
+            texts = self._pending
+            self._pending = []
+            self._batch_scheduled = False
+
+        try:
+            vectors = np.asarray(self.model.encode(texts), dtype="float32")
+            vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        except Exception as e:
+            with self._lock:
+                futures = [self._in_flight.pop(text) for text in texts]
+            for future in futures:
+                future.set_exception(e)
+            return
+
+        with self._lock:
+            self.stats["batches"] += 1
+            self.stats["encoded"] += len(texts)
+            futures = []
+            for text, vector in zip(texts, vectors):
+                vector = vector.reshape(1, -1)
+                self._cache[text] = vector
+                futures.append((self._in_flight.pop(text), vector))
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+
+        if len(texts) > 1:
+            logging.info(f"Encoded {len(texts)} queries in one batch")
+        for future, vector in futures:
+            future.set_result(vector)
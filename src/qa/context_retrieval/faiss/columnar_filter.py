@@ -0,0 +1,150 @@
+import logging
+import time
+
+import numpy as np
+
+from qa.context_retrieval.faiss.metadata_store import MISSING_VALUE, NUMERIC_COLUMNS
+from qa.context_retrieval.sql.post_processing.where_parser import parse_filter_query
+
+# Sentiment labels by review rating, as assigned when the SQLite database is built
+SENTIMENT_BY_RATING = {
+    1: "negative",
+    2: "negative",
+    3: "neutral",
+    4: "positive",
+    5: "positive",
+}
+SENTIMENT_UNKNOWN = "unknown"
+
+COMPARISON_FUNCTIONS = {
+    "=": np.equal,
+    "!=": np.not_equal,
+    "<": np.less,
+    "<=": np.less_equal,
+    ">": np.greater,
+    ">=": np.greater_equal,
+}
+
+
+class ColumnarFilter:
+    """
+    In-memory copy of the structured review columns, aligned with FAISS row order.
+
+    Compiles the WHERE clause of a filter query into a boolean mask over FAISS rows,
+    so filtered vector search needs neither SQLite nor a DataFrame of ids. Queries
+    outside the supported subset (see where_parser) make `mask` return None, and the
+    caller runs them against SQLite instead.
+    """
+
+    def __init__(self, metadata):
+        start = time.time()
+        self.columns = {"id": np.array(metadata.ids)}
+        for column in NUMERIC_COLUMNS:
+            self.columns[column] = np.array(getattr(metadata, column))
+
+        # Sentiment is derived from the rating, stored as codes into `sentiment_labels`
+        self.sentiment_labels = sorted(
+            set(SENTIMENT_BY_RATING.values()) | {SENTIMENT_UNKNOWN}
+        )
+        lookup = np.full(256, self.sentiment_labels.index(SENTIMENT_UNKNOWN), "int8")
+        for rating, label in SENTIMENT_BY_RATING.items():
+            lookup[rating] = self.sentiment_labels.index(label)
+        self.columns["sentiment"] = lookup[
+            self.columns["review_rating"].astype("uint8")
+        ]
+        self.row_count = len(self.columns["id"])
+        logging.info(
+            f"Columnar filter loaded {self.row_count} rows in {time.time() - start:.2f}s"
+        )
+
+    def mask(self, query):
+        """Return a boolean mask over FAISS rows for a filter query, or None if unsupported."""
+        start = time.time()
+        try:
+            condition = parse_filter_query(query)
+            if condition is None:
+                mask = np.ones(self.row_count, dtype=bool)
+            else:
+                mask, _ = self._evaluate(condition)
+        except ValueError as e:
+            logging.info(f"Columnar filter cannot run query, using SQLite: {e}")
+            return None
+
+        logging.info(
+            f"Columnar filter matched {int(mask.sum())} rows "
+            f"in {(time.time() - start) * 1000:.1f} ms"
+        )
+        return mask
+
+    def _evaluate(self, condition):
+        """
+        Evaluate a condition tree with SQL three-valued logic.
+
+        Returns (true_mask, false_mask); rows in neither are NULL (unknown), so
+        e.g. `NOT year = 2020` excludes rows without a year, as SQLite does.
+        """
+        kind = condition[0]
+        if kind == "and":
+            left_true, left_false = self._evaluate(condition[1])
+            right_true, right_false = self._evaluate(condition[2])
+            return left_true & right_true, left_false | right_false
+        if kind == "or":
+            left_true, left_false = self._evaluate(condition[1])
+            right_true, right_false = self._evaluate(condition[2])
+            return left_true | right_true, left_false & right_false
+        if kind == "not":
+            inner_true, inner_false = self._evaluate(condition[1])
+            return inner_false, inner_true
+
+        column = condition[1]
+        values, present = self._column(column)
+        if kind == "null":
+            return ~present, present.copy()
+
+        if kind == "cmp":
+            _, _, operator, literal = condition
+            if column == "sentiment" and operator not in ("=", "!="):
+                raise ValueError(f"Unsupported operator {operator} on sentiment")
+            result = COMPARISON_FUNCTIONS[operator](
+                values, self._coerce(column, literal)
+            )
+        elif kind == "in":
+            result = np.isin(
+                values, [self._coerce(column, literal) for literal in condition[2]]
+            )
+        elif kind == "between":
+            if column == "sentiment":
+                raise ValueError("Unsupported BETWEEN on sentiment")
+            low = self._coerce(column, condition[2])
+            high = self._coerce(column, condition[3])
+            result = (values >= low) & (values <= high)
+        else:
+            raise ValueError(f"Unsupported condition {kind}")
+
+        return present & result, present & ~result
+
+    def _column(self, column):
+        """Return (values, present_mask) for a column."""
+        if column not in self.columns:
+            raise ValueError(f"Column {column!r} is not held in memory")
+        values = self.columns[column]
+        if column in NUMERIC_COLUMNS:
+            return values, values != MISSING_VALUE
+        return values, np.ones(self.row_count, dtype=bool)
+
+    def _coerce(self, column, literal):
+        """Convert a literal the way SQLite compares it against the column."""
+        if column == "sentiment":
+            if not isinstance(literal, str):
+                raise ValueError("Sentiment compared with a non-text value")
+            if literal not in self.sentiment_labels:
+                return -1  # matches no row, like an unknown label in SQLite
+            return self.sentiment_labels.index(literal)
+
+        # INTEGER columns convert numeric-looking text, as SQLite's affinity does
+        if isinstance(literal, str):
+            try:
+                literal = float(literal.strip())
+            except ValueError:
+                raise ValueError(f"Text literal compared with numeric {column!r}")
+        return literal
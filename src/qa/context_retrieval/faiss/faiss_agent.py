@@ -1,29 +1,375 @@
 import logging
+import threading
+import time
 
 import faiss
 import numpy as np
 
+from qa.context_retrieval.faiss.search_service import get_search_service
+
+# Candidates fetched per result from indexes that score compressed codes, before a
+# filtered search reranks them by exact inner product
+RERANK_FACTOR = 4
+
+
+def base_index(index):
+    """
+    The index behind any pre-transforms (OPQ rotation, dimensionality reduction) and
+    id maps (partition sub-indexes).
+    """
+    while isinstance(
+        index, (faiss.IndexPreTransform, faiss.IndexIDMap, faiss.IndexIDMap2)
+    ):
+        index = faiss.downcast_index(index.index)
+    return index
+
+
+def index_reduction(index):
+    """Return the reduction transform the builder put in front of `index`, or None."""
+    if isinstance(index, faiss.IndexPreTransform):
+        transform = faiss.downcast_VectorTransform(index.chain.at(0))
+        if isinstance(transform, (faiss.PCAMatrix, faiss.RandomRotationMatrix)):
+            return transform
+    return None
+
+
+def scores_exact_vectors(index):
+    """
+    True if the index scores the vectors as they were added; False if it scores
+    compressed codes (SQ8, PQ, OPQ), which only approximates the ranking.
+    """
+    index = base_index(index)
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        return isinstance(faiss.downcast_index(ivf), faiss.IndexIVFFlat)
+    if isinstance(index, faiss.IndexHNSW):
+        index = faiss.downcast_index(index.storage)
+    return isinstance(index, faiss.IndexFlat)
+
+
+def rerank_exact(query_embedding, vectors, rows, top_k):
+    """
+    Reorder candidate `rows` by their exact inner product with the query and keep the
+    top_k. `vectors` hold the rows in the same space as the query (e.g. reduced).
+    """
+    scores = np.asarray(vectors[rows], dtype="float32") @ query_embedding[0]
+    order = np.argsort(-scores, kind="stable")[:top_k]
+    return scores[order], rows[order]
+
+
+def search_parameters(index, nprobe=None, sel=None):
+    """
+    Per-call search parameters for any index the builder produces.
+
+    IVF indexes probe `nprobe` lists, or every list when it is None; HNSW indexes
+    search with an efSearch of at least `nprobe`. Pre-transforms pass the parameters
+    through to the index behind them, and reduce the query vector themselves.
+    """
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        return faiss.SearchParametersIVF(sel=sel, nprobe=nprobe or ivf.nlist)
+    hnsw = base_index(index)
+    if isinstance(hnsw, faiss.IndexHNSW):
+        ef_search = max(hnsw.hnsw.efSearch, nprobe or 0)
+        return faiss.SearchParametersHNSW(sel=sel, efSearch=ef_search)
+    return faiss.SearchParameters(sel=sel)
+
+
+def bitmap_selector(mask):
+    """FAISS selector for the rows where the boolean `mask` over FAISS rows is True."""
+    # Pack the mask into a bitmap; FAISS reads bit (i % 8) of byte (i // 8) for row i
+    bitmap = np.packbits(mask, bitorder="little")
+    selector = faiss.IDSelectorBitmap(mask.shape[0], faiss.swig_ptr(bitmap))
+    # The selector only points into the bitmap, which must live as long as it does
+    selector.referenced_objects = [bitmap]
+    return selector
+
+
+class AdaptiveProbe:
+    """
+    Per-query nprobe for an inner-product IVF index.
+
+    A search first probes `initial_nprobe` lists, then keeps doubling the number of
+    probed lists (only scanning the new ones) while an unvisited list could still
+    hold a better result: that is, while the best unvisited centroid score plus
+    `margin` reaches the current k-th score. It also stops at `max_nprobe` lists or
+    once `latency_budget_ms` is spent.
+
+    A vector scores at most `margin` above its centroid in all but a small share of
+    cases, so with `target_recall` the margin is calibrated as that quantile of
+    (neighbor score - neighbor's centroid score) over sampled queries.
+    """
+
+    def __init__(
+        self,
+        index,
+        target_recall=0.95,
+        latency_budget_ms=None,
+        initial_nprobe=4,
+        max_nprobe=None,
+        k=5,
+        calibration_queries=200,
+        seed=0,
+    ):
+        self.index = index
+        self.ivf = faiss.try_extract_index_ivf(index)
+        if self.ivf is None:
+            raise ValueError("Adaptive nprobe needs an IVF index")
+        self.ivf = faiss.downcast_index(self.ivf)
+        if self.ivf.metric_type != faiss.METRIC_INNER_PRODUCT:
+            raise ValueError("Adaptive nprobe needs an inner-product index")
+        self.latency_budget = latency_budget_ms / 1000 if latency_budget_ms else None
+        self.initial_nprobe = min(initial_nprobe, self.ivf.nlist)
+        self.max_nprobe = min(max_nprobe or self.ivf.nlist, self.ivf.nlist)
+        self.margin = (
+            self.calibrate(target_recall, k, calibration_queries, seed)
+            if target_recall
+            else 0.0
+        )
+        self.stats = {"queries": 0, "probes": 0, "widened": 0, "over_budget": 0}
+        self._stats_lock = threading.Lock()
+
+    def _to_ivf_space(self, x):
+        """Apply the index's pre-transforms, giving the vectors the IVF index sees."""
+        index = self.index
+        while isinstance(index, faiss.IndexPreTransform):
+            for i in range(index.chain.size()):
+                x = index.chain.at(i).apply(x)
+            index = faiss.downcast_index(index.index)
+        return np.ascontiguousarray(x, dtype="float32")
+
+    def calibrate(self, target_recall, k=5, n_queries=200, seed=0):
+        """Return the margin at which about `target_recall` of true neighbors are kept."""
+        ivf = self.ivf
+        if ivf.direct_map.no():
+            raise ValueError("Calibrating adaptive nprobe needs the index direct map")
+        n = ivf.ntotal
+        rows = np.random.default_rng(seed).choice(
+            n, size=min(n_queries, n), replace=False
+        )
+        queries = np.vstack([ivf.reconstruct(int(row)) for row in rows])
+
+        # Exact neighbors, and the list each neighbor is stored in
+        scores, neighbors = ivf.search(
+            queries, min(k, n), params=faiss.SearchParametersIVF(nprobe=ivf.nlist)
+        )
+        found = neighbors >= 0
+        lists = np.array(
+            [faiss.lo_listno(ivf.direct_map.get(int(i))) for i in neighbors[found]]
+        )
+        centroids = ivf.quantizer.reconstruct_n(0, ivf.nlist)
+        query_rows = np.nonzero(found)[0]
+        centroid_scores = np.einsum("ij,ij->i", queries[query_rows], centroids[lists])
+
+        margin = float(np.quantile(scores[found] - centroid_scores, target_recall))
+        logging.info(
+            f"Adaptive nprobe calibrated: margin {margin:.4f} for "
+            f"target recall {target_recall} over {len(rows)} queries"
+        )
+        return margin
+
+    def _search_lists(self, query, k, lists, centroid_scores):
+        """Scan only the given lists for one query, without touching shared index state."""
+        lists = np.ascontiguousarray(lists)
+        centroid_scores = np.ascontiguousarray(centroid_scores)
+        D = np.empty((1, k), dtype="float32")
+        I = np.empty((1, k), dtype="int64")
+        # The Python search_preassigned wrapper rejects per-call parameters, and
+        # without them FAISS would read nprobe from the (shared) index
+        params = faiss.SearchParametersIVF(nprobe=lists.shape[1])
+        self.ivf.search_preassigned_c(
+            1,
+            faiss.swig_ptr(query),
+            k,
+            faiss.swig_ptr(lists),
+            faiss.swig_ptr(centroid_scores),
+            faiss.swig_ptr(D),
+            faiss.swig_ptr(I),
+            False,
+            params,
+        )
+        return D, I
+
+    def search(self, query_embedding, k):
+        """
+        Search one normalized query; returns (scores, rows, nprobe used) with unfilled
+        result slots removed.
+        """
+        start = time.perf_counter()
+        query = self._to_ivf_space(query_embedding)
+        centroid_scores, lists = self.ivf.quantizer.search(query, self.max_nprobe)
+
+        best_scores = np.empty(0, dtype="float32")
+        best_rows = np.empty(0, dtype="int64")
+        probed, nprobe = 0, self.initial_nprobe
+        while True:
+            D, I = self._search_lists(
+                query, k, lists[:, probed:nprobe], centroid_scores[:, probed:nprobe]
+            )
+            found = I[0] >= 0
+            best_scores = np.concatenate([best_scores, D[0][found]])
+            best_rows = np.concatenate([best_rows, I[0][found]])
+            order = np.argsort(-best_scores, kind="stable")[:k]
+            best_scores, best_rows = best_scores[order], best_rows[order]
+            probed = nprobe
+
+            if probed >= self.max_nprobe or lists[0, probed] < 0:
+                break
+            if (
+                len(best_scores) == k
+                and best_scores[-1] > centroid_scores[0, probed] + self.margin
+            ):
+                break
+            if (
+                self.latency_budget is not None
+                and time.perf_counter() - start >= self.latency_budget
+            ):
+                break
+            nprobe = min(2 * nprobe, self.max_nprobe)
+
+        elapsed = time.perf_counter() - start
+        logging.info(
+            f"Adaptive search probed {probed}/{self.ivf.nlist} lists in "
+            f"{elapsed * 1000:.2f} ms"
+        )
+        with self._stats_lock:
+            self.stats["queries"] += 1
+            self.stats["probes"] += probed
+            self.stats["widened"] += probed > self.initial_nprobe
+            self.stats["over_budget"] += (
+                self.latency_budget is not None and elapsed >= self.latency_budget
+            )
+        return best_scores, best_rows, probed
+
 
 class FaissAgent:
+    def __init__(self, search_service=None):
+        # Searches share one index between sessions; they run on the service's pool
+        self.search_service = search_service or get_search_service()
+
     def search_similar_sentences(
-        self, user_question, model, index, metadata, top_k=5, nprobe=10
+        self, user_question, model, index, metadata, top_k=5, nprobe=10, adaptive=None
     ):
-        """Perform similarity search on the provided FAISS index using the query embedding."""
+        """
+        Perform similarity search on the provided FAISS index using the query embedding.
+
+        With an `adaptive` AdaptiveProbe for this index, nprobe is chosen per query
+        instead of the fixed `nprobe`.
+        """
         # Encode the question to create a query embedding
         logging.info(f"Encoding the question: '{user_question}'")
         query_embedding = model.encode(user_question)
 
-        # Set nprobe for partition search
-        index.nprobe = nprobe
-
         # Normalize query embedding for cosine similarity
         query_embedding = np.array(query_embedding).astype("float32").reshape(1, -1)
         faiss.normalize_L2(query_embedding)
 
         # Perform similarity search
-        logging.info(f"Performing similarity search with nprobe={nprobe}")
-        D, I = index.search(query_embedding, k=top_k)
+        if adaptive is not None:
+            _, rows, _ = self.search_service.run(
+                adaptive.search, query_embedding, top_k
+            )
+        else:
+            logging.info(f"Performing similarity search with nprobe={nprobe}")
+            D, I = self.search_service.search(
+                index, query_embedding, top_k, search_parameters(index, nprobe)
+            )
+            rows = I[0][I[0] >= 0]
 
         # Retrieve closest sentences from metadata
-        closest_sentences = [metadata[idx]["text"] for idx in I[0]]
+        closest_sentences = metadata.texts(rows)
         return closest_sentences
+
+    def search_filtered(self, query_embedding, index, mask, top_k=5, vectors=None):
+        """
+        Perform similarity search restricted to the FAISS rows where `mask` is True.
+
+        The mask is handed to FAISS as a bitmap selector and every partition is probed,
+        so on an IVF index the result is the top-k among the selected rows in a single
+        search call (exact for IVF-Flat). Indexes that score compressed codes (SQ8,
+        PQ, OPQ) only approximate that ranking; given `vectors`, the rows as the index
+        holds them (e.g. `MetadataStore.vectors`), RERANK_FACTOR times as many
+        candidates are fetched and reranked exactly. Returns (scores, rows) with
+        unfilled slots removed.
+        """
+        mask = np.asarray(mask, dtype=bool)
+        if mask.shape[0] != index.ntotal:
+            raise ValueError(
+                f"Mask length {mask.shape[0]} does not match index size {index.ntotal}"
+            )
+
+        params = search_parameters(index, sel=bitmap_selector(mask))
+        rerank = vectors is not None and not scores_exact_vectors(index)
+        k = top_k * RERANK_FACTOR if rerank else top_k
+
+        logging.info(
+            f"Performing filtered similarity search over {int(mask.sum())} rows"
+        )
+        D, I = self.search_service.search(index, query_embedding, k, params)
+
+        found = I[0] >= 0
+        if not rerank:
+            return D[0][found], I[0][found]
+        transform = index_reduction(index)
+        if transform is not None:
+            query_embedding = transform.apply(query_embedding)
+        return rerank_exact(query_embedding, vectors, I[0][found], top_k)
+
+    def search_partitioned(
+        self, query_embedding, partitions, condition, mask, top_k=5, vectors=None
+    ):
+        """
+        Perform filtered similarity search in only the partitions `condition` can match.
+
+        `partitions` is a PartitionedIndex and `condition` the parsed WHERE clause that
+        produced `mask`. Partitions the condition fully matches are searched as they
+        are, the others with `mask` as a selector, and the per-partition top-k are
+        merged, so the cost follows the size of the selected slice. `vectors` enables
+        the exact rerank as in `search_filtered`. Returns (scores, rows) like
+        `search_filtered`.
+        """
+        mask = np.asarray(mask, dtype=bool)
+        if mask.shape[0] != partitions.count:
+            raise ValueError(
+                f"Mask length {mask.shape[0]} does not match partitioned rows "
+                f"{partitions.count}"
+            )
+        query_embedding = partitions.prepare_query(query_embedding)
+        selected = partitions.select(condition)
+
+        searched_rows = sum(partition["count"] for partition, _ in selected)
+        logging.info(
+            f"Performing partitioned similarity search in {len(selected)}/"
+            f"{len(partitions.partitions)} partitions ({searched_rows} of "
+            f"{partitions.count} rows)"
+        )
+        # One pool task for all partitions, rather than a hand-off per partition
+        return self.search_service.run(
+            self._search_partitions, query_embedding, selected, mask, top_k, vectors
+        )
+
+    def _search_partitions(self, query_embedding, selected, mask, top_k, vectors):
+        """Search each selected partition and merge their top-k into (scores, rows)."""
+        rerank = vectors is not None and not all(
+            scores_exact_vectors(partition["index"]) for partition, _ in selected
+        )
+        k = top_k * RERANK_FACTOR if rerank else top_k
+        selector = None
+        scores = [np.empty(0, dtype="float32")]
+        rows = [np.empty(0, dtype="int64")]
+        for partition, fully_matched in selected:
+            if not fully_matched and selector is None:
+                selector = bitmap_selector(mask)
+            index = partition["index"]
+            params = search_parameters(index, sel=None if fully_matched else selector)
+            D, I = index.search(query_embedding, k, params=params)
+            found = I[0] >= 0
+            scores.append(D[0][found])
+            rows.append(I[0][found])
+
+        scores, rows = np.concatenate(scores), np.concatenate(rows)
+        if rerank:
+            # Partition vectors and the prepared query are in the same (reduced) space
+            return rerank_exact(query_embedding, vectors, rows, top_k)
+        order = np.argsort(-scores, kind="stable")[:top_k]
+        return scores[order], rows[order]
@@ -0,0 +1,224 @@
+import json
+import logging
+import os
+
+import numpy as np
+
+# Files that make up a metadata store directory
+MANIFEST_FILE = "manifest.json"
+VECTORS_FILE = "vectors.npy"
+IDS_FILE = "ids.npy"
+TEXT_OFFSETS_FILE = "text_offsets.npy"
+TEXT_BLOB_FILE = "texts.bin"
+
+# Numeric columns stored next to the vectors, with their on-disk dtypes
+NUMERIC_COLUMNS = {
+    "review_rating": "int8",
+    "year": "int16",
+    "month": "int8",
+    "day": "int8",
+}
+
+# Stored in place of missing numeric values (e.g. unparsable review timestamps)
+MISSING_VALUE = -1
+
+
+class MetadataStore:
+    """
+    Read-only, memory-mapped metadata aligned with FAISS index order.
+
+    Row `i` of every array describes the vector at FAISS index `i`. Vectors, ids and
+    numeric columns are `.npy` arrays and texts live in one UTF-8 blob addressed by
+    an offsets array, so nothing is parsed or copied until a row is actually read.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, MANIFEST_FILE), "r") as f:
+            self.manifest = json.load(f)
+
+        # The manifest count is authoritative; rows past it belong to an unfinished append
+        count = int(self.manifest["count"])
+        self.vectors = self._load(VECTORS_FILE)[:count]
+        self.ids = self._load(IDS_FILE)[:count]
+        self.text_offsets = self._load(TEXT_OFFSETS_FILE)[: count + 1]
+        for column in NUMERIC_COLUMNS:
+            setattr(self, column, self._load(f"{column}.npy")[:count])
+
+        blob_path = os.path.join(directory, TEXT_BLOB_FILE)
+        if os.path.getsize(blob_path) > 0:
+            self.text_blob = np.memmap(blob_path, dtype="uint8", mode="r")
+        else:
+            self.text_blob = np.empty(0, dtype="uint8")
+
+        logging.info(
+            f"Metadata store opened from {directory} with {len(self)} rows "
+            f"of dimension {self.vectors.shape[1]}"
+        )
+
+    def _load(self, file_name):
+        return np.load(os.path.join(self.directory, file_name), mmap_mode="r")
+
+    def __len__(self):
+        return self.ids.shape[0]
+
+    def text(self, row):
+        """Return the review text stored at the given FAISS row."""
+        start, end = self.text_offsets[row], self.text_offsets[row + 1]
+        return self.text_blob[start:end].tobytes().decode("utf-8")
+
+    def texts(self, rows):
+        """Return the review texts stored at the given FAISS rows, in order."""
+        return [self.text(row) for row in rows]
+
+
+def _column_array(values, dtype):
+    """Convert a column that may contain None/NaN into a fixed-width integer array."""
+    array = np.asarray(values, dtype="float64")
+    array = np.where(np.isnan(array), MISSING_VALUE, array)
+    return array.astype(dtype)
+
+
+def write_metadata_store(directory, ids, texts, vectors, columns, manifest=None):
+    """
+    Write a metadata store to `directory`.
+
+    Args:
+    - ids: Review ids in FAISS index order.
+    - texts: Review texts in FAISS index order.
+    - vectors: 2-D float32 array of the vectors added to the index.
+    - columns: Mapping of the NUMERIC_COLUMNS names to per-row values.
+    - manifest: Optional extra entries (e.g. index training stats) for manifest.json.
+    """
+    os.makedirs(directory, exist_ok=True)
+    vectors = np.ascontiguousarray(vectors, dtype="float32")
+    count = vectors.shape[0]
+
+    _save_array(os.path.join(directory, VECTORS_FILE), vectors)
+    _save_array(os.path.join(directory, IDS_FILE), np.asarray(ids, dtype="int64"))
+    for column, dtype in NUMERIC_COLUMNS.items():
+        _save_array(
+            os.path.join(directory, f"{column}.npy"),
+            _column_array(columns[column], dtype),
+        )
+
+    # Texts are appended to one blob; offsets[i]:offsets[i + 1] addresses row i
+    offsets = np.zeros(count + 1, dtype="int64")
+    blob_path = os.path.join(directory, TEXT_BLOB_FILE)
+    with open(f"{blob_path}.tmp", "wb") as f:
+        for row, text in enumerate(texts):
+            encoded = (text or "").encode("utf-8")
+            f.write(encoded)
+            offsets[row + 1] = offsets[row] + len(encoded)
+    os.replace(f"{blob_path}.tmp", blob_path)
+    _save_array(os.path.join(directory, TEXT_OFFSETS_FILE), offsets)
+
+    _write_manifest(
+        directory, {**(manifest or {}), "count": count, "dim": int(vectors.shape[1])}
+    )
+    logging.info(f"Metadata store with {count} rows saved at {directory}")
+
+
+def _save_array(path, array):
+    """Save via a temporary file so readers that mapped the old file are not truncated."""
+    with open(f"{path}.tmp", "wb") as f:
+        np.save(f, array)
+    os.replace(f"{path}.tmp", path)
+
+
+def _write_manifest(directory, manifest):
+    tmp_path = os.path.join(directory, f"{MANIFEST_FILE}.tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, os.path.join(directory, MANIFEST_FILE))
+
+
+def _append_array(path, keep_rows, new_rows, chunk_rows=65536):
+    """
+    Append rows after the first `keep_rows` rows of a `.npy` file.
+
+    The result is streamed into a new file and swapped in, so readers that already
+    mapped the old file keep a valid mapping of it.
+    """
+    old = np.load(path, mmap_mode="r")[:keep_rows]
+    new_rows = np.asarray(new_rows, dtype=old.dtype).reshape((-1,) + old.shape[1:])
+    tmp_path = f"{path}.tmp"
+    out = np.lib.format.open_memmap(
+        tmp_path,
+        mode="w+",
+        dtype=old.dtype,
+        shape=(old.shape[0] + new_rows.shape[0],) + old.shape[1:],
+    )
+    for start in range(0, old.shape[0], chunk_rows):
+        end = min(start + chunk_rows, old.shape[0])
+        out[start:end] = old[start:end]
+    out[old.shape[0] :] = new_rows
+    out.flush()
+    del out
+    os.replace(tmp_path, path)
+
+
+def append_metadata_store(directory, ids, texts, vectors, columns):
+    """
+    Append rows (in FAISS index order, after the existing ones) to a metadata store.
+
+    The manifest is rewritten last, so its `count` only covers fully appended rows.
+    """
+    with open(os.path.join(directory, MANIFEST_FILE), "r") as f:
+        manifest = json.load(f)
+    count = int(manifest["count"])
+    offsets = np.load(os.path.join(directory, TEXT_OFFSETS_FILE), mmap_mode="r")
+    blob_end = int(offsets[count])
+
+    # Texts go to the end of the blob, truncating any tail left by an interrupted append
+    new_offsets = []
+    with open(os.path.join(directory, TEXT_BLOB_FILE), "r+b") as f:
+        f.truncate(blob_end)
+        f.seek(blob_end)
+        for text in texts:
+            encoded = (text or "").encode("utf-8")
+            f.write(encoded)
+            blob_end += len(encoded)
+            new_offsets.append(blob_end)
+
+    _append_array(os.path.join(directory, VECTORS_FILE), count, vectors)
+    _append_array(os.path.join(directory, IDS_FILE), count, ids)
+    for column, dtype in NUMERIC_COLUMNS.items():
+        _append_array(
+            os.path.join(directory, f"{column}.npy"),
+            count,
+            _column_array(columns[column], dtype),
+        )
+    _append_array(os.path.join(directory, TEXT_OFFSETS_FILE), count + 1, new_offsets)
+
+    manifest["count"] = count + len(new_offsets)
+    _write_manifest(directory, manifest)
+    logging.info(
+        f"Appended {len(new_offsets)} rows to metadata store at {directory} "
+        f"({manifest['count']} rows total)"
+    )
+
+
+def convert_json_metadata(json_path, directory):
+    """Convert a legacy METADATA_FAISS_PATH JSON list into a metadata store."""
+    logging.info(f"Loading legacy metadata from {json_path}")
+    with open(json_path, "r") as f:
+        metadata = json.load(f)
+
+    # Entries are written in FAISS index order, but sort defensively on faiss_index
+    metadata.sort(key=lambda entry: entry.get("faiss_index", 0))
+
+    # Legacy files kept the raw embeddings; the index holds them L2-normalized
+    vectors = np.array([entry["embedding"] for entry in metadata], dtype="float32")
+    vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+    write_metadata_store(
+        directory,
+        ids=[entry["id"] for entry in metadata],
+        texts=(entry["text"] for entry in metadata),
+        vectors=vectors,
+        columns={
+            column: [entry.get(column) for entry in metadata]
+            for column in NUMERIC_COLUMNS
+        },
+    )
@@ -0,0 +1,183 @@
+import json
+import logging
+import operator
+import os
+
+import faiss
+import numpy as np
+
+from qa.context_retrieval.faiss.columnar_filter import (
+    SENTIMENT_BY_RATING,
+    SENTIMENT_UNKNOWN,
+)
+from qa.context_retrieval.faiss.metadata_store import MISSING_VALUE
+
+# Files that make up a partition directory, next to the full index
+PARTITIONS_MANIFEST_FILE = "manifest.json"
+REDUCTION_FILE = "reduction.vt"
+
+COMPARISON_OPERATORS = {
+    "=": operator.eq,
+    "!=": operator.ne,
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+}
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(message)s")
+
+
+def partitions_path(index_path):
+    """Directory holding the partition sub-indexes of the index at `index_path`."""
+    return f"{index_path}.partitions"
+
+
+def partition_keys(years, ratings):
+    """Return the (year, sentiment) partition of each row; missing years are -1."""
+    years = np.asarray(years, dtype="float64")
+    years = np.where(np.isnan(years), MISSING_VALUE, years).astype("int64")
+    ratings = np.asarray(ratings, dtype="float64")
+    sentiments = [
+        (
+            SENTIMENT_BY_RATING.get(int(rating), SENTIMENT_UNKNOWN)
+            if not np.isnan(rating)
+            else SENTIMENT_UNKNOWN
+        )
+        for rating in ratings
+    ]
+    return list(zip(years.tolist(), sentiments))
+
+
+def partition_name(year, sentiment):
+    return f"{year}_{sentiment}"
+
+
+def match_partition(condition, year, sentiment):
+    """
+    Evaluate a WHERE condition tree (see where_parser) for a whole partition.
+
+    Returns True if every row of the partition matches, False if none can, and None
+    if it depends on other columns or cannot be decided. Partitions without a year
+    or sentiment are never ruled out.
+    """
+    if condition is None:
+        return True
+    kind = condition[0]
+    if kind == "and":
+        left = match_partition(condition[1], year, sentiment)
+        right = match_partition(condition[2], year, sentiment)
+        if left is False or right is False:
+            return False
+        return True if left and right else None
+    if kind == "or":
+        left = match_partition(condition[1], year, sentiment)
+        right = match_partition(condition[2], year, sentiment)
+        if left or right:
+            return True
+        return False if left is False and right is False else None
+    if kind == "not":
+        inner = match_partition(condition[1], year, sentiment)
+        return None if inner is None else not inner
+
+    column = condition[1]
+    if column == "year" and year != MISSING_VALUE:
+        value = year
+    elif column == "sentiment" and sentiment != SENTIMENT_UNKNOWN:
+        value = sentiment
+    else:
+        return None
+
+    try:
+        if kind == "null":
+            return False
+        if kind == "cmp":
+            _, _, op, literal = condition
+            return COMPARISON_OPERATORS[op](value, _coerce(column, literal))
+        if kind == "in":
+            return value in [_coerce(column, literal) for literal in condition[2]]
+        if kind == "between":
+            low, high = _coerce(column, condition[2]), _coerce(column, condition[3])
+            return low <= value <= high
+    except (TypeError, ValueError):
+        pass
+    return None
+
+
+def _coerce(column, literal):
+    """Compare year with numeric-looking text as SQLite does; sentiment only with text."""
+    if column == "sentiment":
+        if not isinstance(literal, str):
+            raise TypeError("Sentiment compared with a non-text value")
+        return literal
+    return float(literal.strip()) if isinstance(literal, str) else literal
+
+
+class PartitionedIndex:
+    """
+    FAISS sub-indexes over the (year, sentiment) slices of the corpus.
+
+    Each sub-index stores its rows under their FAISS row in the full index, so
+    results from several partitions merge directly and a row mask over the full
+    index applies to them as a selector. Vectors are stored as in the full index,
+    i.e. reduced when the index was built with a reduction.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, PARTITIONS_MANIFEST_FILE)) as f:
+            self.manifest = json.load(f)
+        self.count = int(self.manifest["count"])
+        self.partitions = [
+            dict(entry, index=faiss.read_index(os.path.join(directory, entry["file"])))
+            for entry in self.manifest["partitions"]
+        ]
+        self.reduction = None
+        if self.manifest.get("reduction_file"):
+            self.reduction = faiss.read_VectorTransform(
+                os.path.join(directory, self.manifest["reduction_file"])
+            )
+        logging.info(
+            f"Loaded {len(self.partitions)} FAISS partitions with {self.count} rows "
+            f"from {directory}"
+        )
+
+    def select(self, condition):
+        """
+        Return (partition, fully_matched) for the partitions the condition can match;
+        rows of fully matched partitions need no further filtering.
+        """
+        selected = []
+        for partition in self.partitions:
+            match = match_partition(
+                condition, partition["year"], partition["sentiment"]
+            )
+            if match is not False:
+                selected.append((partition, match is True))
+        return selected
+
+    def prepare_query(self, query_embedding):
+        """Reduce a normalized query the way the partition vectors were reduced."""
+        if self.reduction is None:
+            return query_embedding
+        return np.ascontiguousarray(self.reduction.apply(query_embedding))
+
+
+def load_partitions(index_path, expected_count):
+    """
+    Load the partitions built next to `index_path`, or return None if there are
+    none or they do not cover the same rows as the full index (e.g. an update was
+    interrupted).
+    """
+    directory = partitions_path(index_path)
+    if not os.path.exists(os.path.join(directory, PARTITIONS_MANIFEST_FILE)):
+        return None
+    partitions = PartitionedIndex(directory)
+    if partitions.count != expected_count:
+        logging.warning(
+            f"FAISS partitions cover {partitions.count} rows but the index has "
+            f"{expected_count}; filtered searches use the full index"
+        )
+        return None
+    return partitions
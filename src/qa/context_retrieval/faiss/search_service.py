@@ -0,0 +1,111 @@
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+import faiss
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+# Concurrent searches; each runs single-threaded inside FAISS, so about one per core
+FAISS_SEARCH_WORKERS = int(os.getenv("FAISS_SEARCH_WORKERS", str(os.cpu_count() or 1)))
+# OpenMP threads per FAISS call. Single-query searches gain nothing from more, and
+# several concurrent calls each starting a full OpenMP team oversubscribe the cores.
+FAISS_OMP_THREADS = int(os.getenv("FAISS_OMP_THREADS", "1"))
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(message)s")
+
+
+@contextmanager
+def limited_omp_threads(omp_threads):
+    """Set the calling thread's OpenMP thread count, restoring it afterwards."""
+    previous = faiss.omp_get_max_threads()
+    faiss.omp_set_num_threads(omp_threads)
+    try:
+        yield
+    finally:
+        faiss.omp_set_num_threads(previous)
+
+
+class FaissSearchService:
+    """
+    Runs FAISS searches for concurrent sessions on a bounded thread pool.
+
+    Searches never modify the shared index: callers pass per-call search parameters
+    (see `search_parameters`). FAISS releases the GIL while it scans, so searches
+    from different sessions run in parallel on up to `workers` cores, and only the
+    Python code around them is serialized. With `workers=0` searches run in the
+    calling thread.
+
+    `omp_threads` applies only to the threads running searches. The OpenMP thread
+    count is a per-thread setting, so it is set once in each pool thread (or around
+    each search run in the calling thread), and index builds, calibration and
+    retraining elsewhere in the process keep their own.
+    """
+
+    def __init__(self, workers=FAISS_SEARCH_WORKERS, omp_threads=FAISS_OMP_THREADS):
+        self.workers = workers
+        self.omp_threads = omp_threads
+        self._executor = (
+            ThreadPoolExecutor(
+                max_workers=workers,
+                thread_name_prefix="faiss-search",
+                initializer=faiss.omp_set_num_threads,
+                initargs=(omp_threads,),
+            )
+            if workers
+            else None
+        )
+        self.stats = {"searches": 0, "queued_seconds": 0.0, "search_seconds": 0.0}
+        self._stats_lock = threading.Lock()
+        logging.info(
+            f"FAISS search service started with {workers} workers and "
+            f"{omp_threads} OpenMP threads per search"
+        )
+
+    def run(self, fn, *args, **kwargs):
+        """Run a search function (e.g. `index.search`) on the pool and return its result."""
+        submitted = time.perf_counter()
+        if self._executor is None:
+            with limited_omp_threads(self.omp_threads):
+                return self._timed(submitted, fn, *args, **kwargs)
+        return self._executor.submit(
+            self._timed, submitted, fn, *args, **kwargs
+        ).result()
+
+    def search(self, index, query_embedding, k, params=None):
+        """Thread-safe `index.search` of the query rows; returns (D, I)."""
+        return self.run(index.search, query_embedding, k, params=params)
+
+    def close(self):
+        """Stop the worker threads once queued searches are done."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+
+    def _timed(self, submitted, fn, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            finished = time.perf_counter()
+            with self._stats_lock:
+                self.stats["searches"] += 1
+                self.stats["queued_seconds"] += started - submitted
+                self.stats["search_seconds"] += finished - started
+
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def get_search_service():
+    """Return the process-wide search service, creating it on first use."""
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = FaissSearchService()
+        return _service
@@ -1,11 +1,19 @@
+import json
 import logging
 import os
+import time
 
+import numpy as np
 import pandas as pd
 from dotenv import load_dotenv
 
-from qa.context_retrieval.sql.post_processing.query_executor import run_query
+from qa.context_retrieval.sql.post_processing.query_executor import (
+    CONTEXT_MAX_BYTES,
+    CONTEXT_MAX_ROWS,
+    run_query,
+)
 from qa.context_retrieval.sql.post_processing.query_extractor import extract_query
+from qa.context_retrieval.sql.post_processing.query_rewriter import rewrite_to_rollup
 from qa.context_retrieval.sql.retrieval_agent.gemini_flash import GeminiQueryRetriever
 from qa.context_retrieval.sql.retrieval_agent.llama_3 import LlamaQueryRetriever
 from qa.context_retrieval.sql.retrieval_agent.my_cohere import CohereQueryRetriever
@@ -18,8 +26,86 @@ logging.basicConfig(
     level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
 )
 
+# Optional JSONL log of generated SQL, replayed by the SQLite index advisor
+SQL_QUERY_LOG_PATH = os.getenv("SQL_QUERY_LOG_PATH")
+
+
+def log_generated_query(query, query_type):
+    """Append a generated SQL query to SQL_QUERY_LOG_PATH, if configured."""
+    if not SQL_QUERY_LOG_PATH or not query:
+        return
+    try:
+        with open(SQL_QUERY_LOG_PATH, "a") as f:
+            f.write(
+                json.dumps(
+                    {"timestamp": time.time(), "query_type": query_type, "query": query}
+                )
+                + "\n"
+            )
+    except OSError as e:
+        logging.warning(f"Could not write SQL query log: {e}")
+
+
+def is_query_result(result):
+    """True for a query result (DataFrame or row mask), False for an error message."""
+    return isinstance(result, (pd.DataFrame, np.ndarray))
+
+
+def is_empty_result(result):
+    """True when a DataFrame has no rows or a row mask selects nothing."""
+    if isinstance(result, np.ndarray):
+        return not result.any()
+    return result.empty
+
+
+def run_generated_query(query, query_type, query_budget, query_runner=None):
+    """
+    Run a generated query, answering aggregates from user_review_rollup when possible.
 
-def retrieve_and_execute_pipeline(user_question, query_type, agent_type="cohere"):
+    Falls back to the original query if it cannot be rewritten or the rewrite fails
+    (e.g. a database built before the rollup table existed). If `query_runner` is
+    given it is tried first; it returns a result, or None to fall back to SQLite.
+    """
+    if query_runner is not None:
+        result = query_runner(query)
+        if result is not None:
+            return result
+    if query_type == "aggregating":
+        rollup_query = rewrite_to_rollup(query)
+        if rollup_query:
+            result = run_query(rollup_query, **query_budget)
+            if isinstance(result, pd.DataFrame):
+                logging.info("Answered from rollup table:\n%s", rollup_query)
+                return result
+            logging.warning(f"Rollup query failed, using user_review: {result}")
+    return run_query(query, **query_budget)
+
+
+def is_cancelled(cancelled, step):
+    """True (and logged) when a speculative retrieval was cancelled before `step`."""
+    if cancelled is not None and cancelled.is_set():
+        logging.info(f"Speculative SQL retrieval cancelled before {step}.")
+        return True
+    return False
+
+
+def retrieve_and_execute_pipeline(
+    user_question,
+    query_type,
+    agent_type="cohere",
+    query_runner=None,
+    initial_query=None,
+    cancelled=None,
+):
+    """
+    Generates, runs and if needed relaxes or fixes the SQL query for the question.
+    Returns (query, result) for the query that produced the result.
+
+    `initial_query` is a query already generated for the question (by the combined
+    router prompt); the first generation call is skipped when it is given.
+    `cancelled` is a threading.Event set when a speculative retrieval is no longer
+    needed; no further LLM call is made once it is set, and (None, None) is returned.
+    """
     # Initialize the appropriate agent based on agent_type
     api_key = (
         os.getenv("COHERE_API")
@@ -38,23 +124,42 @@ def retrieve_and_execute_pipeline(user_question, query_type, agent_type="cohere"
     else:
         raise ValueError(f"Unsupported agent_type: {agent_type}")
 
-    # Step 1: Get raw output from agent
-    raw_response = retriever.get_query(user_question, query_type)
-    logging.info("Step 1 - Raw Output from Agent Retriever:\n%s", raw_response)
+    # Aggregate results are placed in the prompt, so keep them within the context budget.
+    # Filter results are ids for the FAISS row mask and must stay complete.
+    query_budget = (
+        {"max_rows": CONTEXT_MAX_ROWS, "max_bytes": CONTEXT_MAX_BYTES}
+        if query_type == "aggregating"
+        else {}
+    )
+
+    if initial_query:
+        clean_query = initial_query
+        logging.info("Steps 1-2 - SQL Query from the router:\n%s", clean_query)
+    else:
+        if is_cancelled(cancelled, "SQL generation"):
+            return None, None
+        # Step 1: Get raw output from agent
+        raw_response = retriever.get_query(user_question, query_type)
+        logging.info("Step 1 - Raw Output from Agent Retriever:\n%s", raw_response)
 
-    # Step 2: Clean SQL extraction
-    clean_query = extract_query(raw_response)
-    logging.info("Step 2 - Clean SQL Query:\n%s", clean_query)
+        # Step 2: Clean SQL extraction
+        clean_query = extract_query(raw_response)
+        logging.info("Step 2 - Clean SQL Query:\n%s", clean_query)
+    log_generated_query(clean_query, query_type)
 
     # Step 3: Run the query and retrieve data
     if clean_query:
-        query_result = run_query(clean_query)
+        query_result = run_generated_query(
+            clean_query, query_type, query_budget, query_runner
+        )
 
-        if isinstance(query_result, pd.DataFrame):
+        if is_query_result(query_result):
             logging.info("Step 3 - Data Retrieved:\n%s", query_result)
             # Check if data is empty; if so, retrieve a relaxed query
-            if query_result.empty:
+            if is_empty_result(query_result):
                 logging.warning("No results found. Attempting a relaxed query.")
+                if is_cancelled(cancelled, "relaxing the query"):
+                    return None, None
 
                 # Get a more relaxed query based on the previous query
                 relaxed_query_response = retriever.get_relax_query(
@@ -62,15 +167,18 @@ def retrieve_and_execute_pipeline(user_question, query_type, agent_type="cohere"
                 )
                 relaxed_query = extract_query(relaxed_query_response)
                 logging.info("Relaxed SQL Query:\n%s", relaxed_query)
+                log_generated_query(relaxed_query, query_type)
 
                 # Execute the relaxed query if it exists
                 if relaxed_query:
-                    relaxed_results_df = run_query(relaxed_query)
+                    relaxed_results_df = run_generated_query(
+                        relaxed_query, query_type, query_budget, query_runner
+                    )
                     logging.info(
                         "Step 4 - Data Retrieved from Relaxed Query:\n%s",
                         relaxed_results_df,
                     )
-                    return clean_query, relaxed_results_df
+                    return relaxed_query, relaxed_results_df
                 else:
                     logging.warning("No valid relaxed SQL query was generated.")
             else:
@@ -78,19 +186,24 @@ def retrieve_and_execute_pipeline(user_question, query_type, agent_type="cohere"
         else:
             # If `query_result` is an error message, pass it to `solved_error_query`
             logging.error("Step 3 - Error Encountered:\n%s", query_result)
+            if is_cancelled(cancelled, "fixing the query"):
+                return None, None
             solved_query_response = retriever.solved_error_query(
                 user_question, clean_query, query_result
             )
             solved_query = extract_query(solved_query_response)
             logging.info("Step 4 - Resolved Query:\n%s", solved_query)
+            log_generated_query(solved_query, query_type)
 
             # Attempt to run the resolved query
             if solved_query:
-                fixed_results_df = run_query(solved_query)
+                fixed_results_df = run_generated_query(
+                    solved_query, query_type, query_budget, query_runner
+                )
                 logging.info(
                     "Step 5 - Data Retrieved from Resolved Query:\n%s", fixed_results_df
                 )
-                return clean_query, fixed_results_df
+                return solved_query, fixed_results_df
             else:
                 logging.warning("No valid resolved SQL query was generated.")
 
@@ -1,5 +1,10 @@
+import logging
 import os
+import random
 import sqlite3
+import threading
+import time
+from contextlib import contextmanager
 
 import pandas as pd
 from dotenv import load_dotenv
@@ -10,22 +15,249 @@ load_dotenv()
 # Get the database path from the .env file
 database_path = os.getenv("SQLITE_PATH")
 
+# Generated queries running longer than this are aborted
+QUERY_TIMEOUT_SECONDS = float(os.getenv("SQLITE_QUERY_TIMEOUT", "10"))
 
-def run_query(query):
+# Read-side tuning applied to every pooled connection
+CONNECTION_PRAGMAS = [
+    "PRAGMA query_only = ON",
+    "PRAGMA mmap_size = 268435456",  # 256 MB
+    "PRAGMA cache_size = -65536",  # 64 MB
+    "PRAGMA temp_store = MEMORY",
+]
+
+# How many SQLite VM instructions run between deadline checks
+PROGRESS_HANDLER_INTERVAL = 10000
+
+# Budget for SQL results that are placed in an LLM prompt
+CONTEXT_MAX_ROWS = int(os.getenv("SQL_CONTEXT_MAX_ROWS", "200"))
+CONTEXT_MAX_BYTES = int(os.getenv("SQL_CONTEXT_MAX_BYTES", "20000"))
+SUMMARY_SAMPLE_ROWS = 20
+FETCH_BATCH_ROWS = 1000
+
+
+class SQLiteConnectionPool:
     """
-    Connects to the SQLite database, executes the given query, and returns the results in a DataFrame.
-    If an error occurs, returns the error message as a string.
+    Keeps one read-only SQLite connection open per thread.
+
+    Streamlit runs each session's script in its own thread, so connections are never
+    shared between concurrent queries. Connections of threads that have finished are
+    closed the next time a connection is opened.
+    """
+
+    def __init__(self, database_path, timeout_seconds=QUERY_TIMEOUT_SECONDS):
+        self.database_path = database_path
+        self.timeout_seconds = timeout_seconds
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections = {}  # thread -> connection
+
+    def _connect(self):
+        conn = sqlite3.connect(
+            f"file:{self.database_path}?mode=ro", uri=True, check_same_thread=False
+        )
+        for pragma in CONNECTION_PRAGMAS:
+            conn.execute(pragma)
+
+        # Abort the running statement once the per-query deadline has passed
+        state = {"deadline": None}
+
+        def check_deadline():
+            deadline = state["deadline"]
+            return 1 if deadline is not None and time.monotonic() > deadline else 0
+
+        conn.set_progress_handler(check_deadline, PROGRESS_HANDLER_INTERVAL)
+        self._local.conn = conn
+        self._local.state = state
+
+        with self._lock:
+            for thread in [t for t in self._connections if not t.is_alive()]:
+                self._connections.pop(thread).close()
+            self._connections[threading.current_thread()] = conn
+        logging.info(f"Opened read-only SQLite connection to {self.database_path}")
+        return conn
+
+    @contextmanager
+    def connection(self):
+        """Yield this thread's connection with the query deadline armed."""
+        conn = getattr(self._local, "conn", None) or self._connect()
+        self._local.state["deadline"] = time.monotonic() + self.timeout_seconds
+        try:
+            yield conn
+        finally:
+            self._local.state["deadline"] = None
+
+    def close_all(self):
+        with self._lock:
+            for conn in self._connections.values():
+                conn.close()
+            self._connections.clear()
+        self._local = threading.local()
+
+
+class ResultSummary:
+    """Streaming statistics and a reservoir sample over a result set of any size."""
+
+    def __init__(self, columns, sample_size=SUMMARY_SAMPLE_ROWS):
+        self.columns = columns
+        self.row_count = 0
+        self.sample = []
+        self.sample_size = sample_size
+        self._random = random.Random(0)
+        self._stats = [
+            {
+                "nulls": 0,
+                "numeric": 0,
+                "min": None,
+                "max": None,
+                "sum": 0.0,
+                "length": 0,
+            }
+            for _ in columns
+        ]
+
+    def add(self, row):
+        self.row_count += 1
+        for value, stats in zip(row, self._stats):
+            if value is None:
+                stats["nulls"] += 1
+            elif isinstance(value, (int, float)):
+                stats["numeric"] += 1
+                stats["sum"] += value
+                stats["min"] = (
+                    value if stats["min"] is None else min(stats["min"], value)
+                )
+                stats["max"] = (
+                    value if stats["max"] is None else max(stats["max"], value)
+                )
+            else:
+                stats["length"] += len(str(value))
+
+        # Reservoir sampling keeps a uniform sample without holding the full result
+        if len(self.sample) < self.sample_size:
+            self.sample.append(row)
+        else:
+            slot = self._random.randrange(self.row_count)
+            if slot < self.sample_size:
+                self.sample[slot] = row
+
+    def to_text(self):
+        lines = [
+            f"The result has {self.row_count} rows, too many to include in full. "
+            f"Columns: {', '.join(self.columns)}.",
+            "Column statistics:",
+        ]
+        for column, stats in zip(self.columns, self._stats):
+            non_null = self.row_count - stats["nulls"]
+            if stats["numeric"] and stats["numeric"] == non_null:
+                mean = stats["sum"] / stats["numeric"]
+                lines.append(
+                    f"- {column}: min {stats['min']}, max {stats['max']}, "
+                    f"mean {mean:.2f}, {stats['nulls']} nulls"
+                )
+            else:
+                average_length = stats["length"] / non_null if non_null else 0
+                lines.append(
+                    f"- {column}: {non_null} non-null values, "
+                    f"average length {average_length:.0f} characters"
+                )
+        lines.append(f"Random sample of {len(self.sample)} rows:")
+        lines.append(
+            pd.DataFrame(self.sample, columns=self.columns).to_string(index=False)
+        )
+        return "\n".join(lines)
+
+
+def _row_bytes(row):
+    return sum(len(str(value)) + 1 for value in row)
+
+
+def fetch_bounded(cursor, max_rows, max_bytes):
+    """
+    Stream rows from an executed cursor, keeping at most `max_rows` rows / `max_bytes`.
+
+    Returns a DataFrame of all rows when the result fits the budget. Otherwise returns
+    a DataFrame of sampled rows whose `attrs` carry `summary` (text for the prompt) and
+    `total_rows`, without ever materializing the full result. Meant for results that
+    go into a prompt; see `run_query` for why filter queries are not bounded.
+    """
+    columns = [description[0] for description in cursor.description]
+    rows = []
+    used_bytes = 0
+    summary = None
+
+    while True:
+        batch = cursor.fetchmany(FETCH_BATCH_ROWS)
+        if not batch:
+            break
+        for row in batch:
+            if summary is None:
+                used_bytes += _row_bytes(row)
+                if len(rows) < max_rows and used_bytes <= max_bytes:
+                    rows.append(row)
+                    continue
+                # Over budget: fold the rows kept so far into a streaming summary
+                summary = ResultSummary(columns)
+                for kept in rows:
+                    summary.add(kept)
+                rows = None
+            summary.add(row)
+
+    if summary is None:
+        df_results = pd.DataFrame(rows, columns=columns)
+        df_results.attrs["total_rows"] = len(rows)
+        return df_results
+
+    logging.info(f"Result of {summary.row_count} rows exceeded the budget; summarized")
+    df_results = pd.DataFrame(summary.sample, columns=columns)
+    df_results.attrs["summary"] = summary.to_text()
+    df_results.attrs["total_rows"] = summary.row_count
+    return df_results
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_connection_pool():
+    """Return the process-wide connection pool, creating it on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = SQLiteConnectionPool(database_path)
+        return _pool
+
+
+def run_query(query, max_rows=None, max_bytes=None):
+    """
+    Executes the given query on a pooled read-only connection and returns the results in a DataFrame.
+    If `max_rows`/`max_bytes` are given, results are streamed and summarized once over budget (see fetch_bounded).
+    Only aggregate queries get a budget, because their rows are placed in the prompt. Filter queries are read in
+    full: their ids become the FAISS row mask, and a sample would silently drop matching reviews.
+    If an error occurs (including hitting the query time limit), returns the error message as a string.
     """
     if not query:
         return "No SQL query provided."
 
-    conn = sqlite3.connect(database_path)
-
+    pool = get_connection_pool()
+    start = time.monotonic()
     try:
-        df_results = pd.read_sql_query(query, conn)
+        with pool.connection() as conn:
+            if max_rows is None and max_bytes is None:
+                df_results = pd.read_sql_query(query, conn)
+            else:
+                cursor = conn.execute(query)
+                try:
+                    df_results = fetch_bounded(
+                        cursor,
+                        max_rows if max_rows is not None else CONTEXT_MAX_ROWS,
+                        max_bytes if max_bytes is not None else CONTEXT_MAX_BYTES,
+                    )
+                finally:
+                    cursor.close()
         return df_results
     except Exception as e:
+        if time.monotonic() - start >= pool.timeout_seconds:
+            e = f"query exceeded the {pool.timeout_seconds:g}s time limit ({e})"
         error_message = f"Error executing query: {e}"
         return error_message  # Return the error message instead of an empty DataFrame
-    finally:
-        conn.close()
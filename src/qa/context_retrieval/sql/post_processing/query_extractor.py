@@ -2,6 +2,9 @@ import re
 
 
 def extract_query(response_text):
+    if not response_text:
+        return None
+
     # Match SQL query inside ```...``` blocks and remove `sql` or `sqlite` tag if present
     match = re.search(
         r"```(?:sql|sqlite)?\s+(SELECT|WITH)[\s\S]*?```", response_text, re.IGNORECASE
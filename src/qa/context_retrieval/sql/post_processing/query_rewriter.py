@@ -0,0 +1,126 @@
+import re
+
+# Columns shared by user_review and user_review_rollup
+ROLLUP_DIMENSIONS = {"year", "month", "day", "review_rating", "sentiment"}
+
+# Aggregates over user_review and their equivalents over the rollup's partial sums
+ROLLUP_AGGREGATES = [
+    (r"COUNT\s*\(\s*(?:\*|1|id|review_id)\s*\)", "COALESCE(SUM(review_count), 0)"),
+    (r"SUM\s*\(\s*review_rating\s*\)", "SUM(rating_sum)"),
+    (
+        r"AVG\s*\(\s*review_rating\s*\)",
+        "(SUM(rating_sum) * 1.0 / SUM(CASE WHEN review_rating IS NOT NULL "
+        "THEN review_count END))",
+    ),
+]
+
+# Words that may appear in a rewritable query besides dimensions and aliases
+ALLOWED_WORDS = {
+    "select", "from", "user_review", "where", "and", "or", "not", "in", "between",
+    "is", "null", "like", "group", "by", "having", "order", "asc", "desc", "limit",
+    "offset", "as", "min", "max", "round", "cast", "integer", "real",
+}  # fmt: skip
+
+
+def _split_top_level(text):
+    """Split on commas that are not inside parentheses."""
+    parts, depth, current = [], 0, ""
+    for char in text:
+        if char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        if char == "," and depth == 0:
+            parts.append(current)
+            current = ""
+        else:
+            current += char
+    parts.append(current)
+    return [part.strip() for part in parts]
+
+
+def rewrite_to_rollup(query):
+    """
+    Rewrite a simple aggregate query over user_review to read user_review_rollup.
+
+    Handles COUNT(*)/COUNT(id), SUM(review_rating) and AVG(review_rating), optionally
+    grouped, filtered, ordered and limited by year, month, day, review_rating or
+    sentiment. Returns the rewritten query, or None when the query needs anything
+    the rollup does not have.
+    """
+    # Mask string literals so their contents are never mistaken for SQL
+    literals = []
+
+    def mask_literal(match):
+        literals.append(match.group(0))
+        return f"__lit{len(literals) - 1}__"
+
+    masked = re.sub(r"'(?:[^']|'')*'", mask_literal, query)
+    if '"' in masked or "`" in masked or "--" in masked or "/*" in masked:
+        return None
+    masked = " ".join(masked.split()).rstrip(";").strip()
+
+    match = re.match(
+        r"SELECT (?P<select>.+?) FROM user_review\b(?P<rest>.*)$", masked, re.IGNORECASE
+    )
+    if not match or re.search(
+        r"\b(SELECT|JOIN|UNION|DISTINCT)\b",
+        match.group("rest") + match.group("select"),
+        re.IGNORECASE,
+    ):
+        return None
+
+    # Keep output column names: aggregate items without an alias get the original text
+    select_items = []
+    aliases = set()
+    labels = []
+    for item in _split_top_level(match.group("select")):
+        alias_match = re.search(r"\s+AS\s+(\w+)$", item, re.IGNORECASE)
+        if alias_match:
+            aliases.add(alias_match.group(1).lower())
+        elif any(re.search(p, item, re.IGNORECASE) for p, _ in ROLLUP_AGGREGATES):
+            original = re.sub(
+                r"__lit(\d+)__", lambda m: literals[int(m.group(1))], item
+            )
+            labels.append(original)
+            item = f"{item} AS __lbl{len(labels) - 1}__"
+        select_items.append(item)
+    if not any(
+        re.search(p, match.group("select"), re.IGNORECASE) for p, _ in ROLLUP_AGGREGATES
+    ):
+        return None
+
+    rewritten = (
+        f"SELECT {', '.join(select_items)} FROM user_review_rollup{match.group('rest')}"
+    )
+
+    # Swap each aggregate for a placeholder, then check every remaining word
+    replacements = []
+
+    def mask_aggregate(replacement):
+        def mask(_):
+            replacements.append(replacement)
+            return f"__agg{len(replacements) - 1}__"
+
+        return mask
+
+    for pattern, replacement in ROLLUP_AGGREGATES:
+        rewritten = re.sub(
+            pattern, mask_aggregate(replacement), rewritten, flags=re.IGNORECASE
+        )
+
+    checked = rewritten.replace("user_review_rollup", "")
+    for word in re.findall(r"[A-Za-z_][A-Za-z_0-9]*", checked):
+        word = word.lower()
+        if re.fullmatch(r"__(lit|agg|lbl)\d+__", word):
+            continue
+        if word not in ALLOWED_WORDS | ROLLUP_DIMENSIONS | aliases:
+            return None
+
+    rewritten = re.sub(
+        r"__agg(\d+)__", lambda m: replacements[int(m.group(1))], rewritten
+    )
+    rewritten = re.sub(
+        r"__lbl(\d+)__", lambda m: f'"{labels[int(m.group(1))]}"', rewritten
+    )
+    return re.sub(r"__lit(\d+)__", lambda m: literals[int(m.group(1))], rewritten)
@@ -0,0 +1,183 @@
+import re
+
+# Tokens of the WHERE clauses produced by the filter prompt
+TOKEN_PATTERN = re.compile(
+    r"\s*(?:(?P<string>'(?:[^']|'')*')"
+    r"|(?P<number>-?\d+(?:\.\d+)?)"
+    r"|(?P<word>[A-Za-z_][A-Za-z_0-9]*(?:\.[A-Za-z_][A-Za-z_0-9]*)?)"
+    r"|(?P<op><=|>=|<>|!=|==|=|<|>|\(|\)|,))"
+)
+
+# Comparison operators, normalized to one spelling
+COMPARISON_OPERATORS = {
+    "=": "=",
+    "==": "=",
+    "!=": "!=",
+    "<>": "!=",
+    "<": "<",
+    "<=": "<=",
+    ">": ">",
+    ">=": ">=",
+}
+
+KEYWORDS = {"and", "or", "not", "in", "between", "is", "null"}
+
+
+def tokenize(text):
+    """Split a WHERE clause into (kind, value) tokens, or raise ValueError."""
+    tokens = []
+    position = 0
+    text = text.strip()
+    while position < len(text):
+        match = TOKEN_PATTERN.match(text, position)
+        if not match or match.end() == position:
+            raise ValueError(f"Unsupported syntax near: {text[position:position + 20]}")
+        position = match.end()
+        kind = match.lastgroup
+        value = match.group(kind)
+        if kind == "string":
+            value = value[1:-1].replace("''", "'")
+        elif kind == "number":
+            value = float(value) if "." in value else int(value)
+        elif kind == "word":
+            value = value.lower()
+            if value.startswith("user_review."):
+                value = value[len("user_review.") :]
+            if value in KEYWORDS:
+                kind = "keyword"
+        tokens.append((kind, value))
+    return tokens
+
+
+class _Parser:
+    """
+    Recursive descent parser producing a condition tree of nested tuples:
+
+    ("and", left, right), ("or", left, right), ("not", condition),
+    ("cmp", column, operator, value), ("in", column, values),
+    ("between", column, low, high) and ("null", column).
+    """
+
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.position = 0
+
+    def peek(self, offset=0):
+        index = self.position + offset
+        return self.tokens[index] if index < len(self.tokens) else (None, None)
+
+    def take(self, kind=None, value=None):
+        token = self.peek()
+        if (kind and token[0] != kind) or (value is not None and token[1] != value):
+            raise ValueError(f"Unexpected token {token[1]!r}")
+        self.position += 1
+        return token
+
+    def accept(self, kind, value):
+        if self.peek() == (kind, value):
+            self.position += 1
+            return True
+        return False
+
+    def parse(self):
+        condition = self.parse_or()
+        if self.position != len(self.tokens):
+            raise ValueError(f"Unexpected token {self.peek()[1]!r}")
+        return condition
+
+    def parse_or(self):
+        condition = self.parse_and()
+        while self.accept("keyword", "or"):
+            condition = ("or", condition, self.parse_and())
+        return condition
+
+    def parse_and(self):
+        condition = self.parse_not()
+        while self.accept("keyword", "and"):
+            condition = ("and", condition, self.parse_not())
+        return condition
+
+    def parse_not(self):
+        if self.accept("keyword", "not"):
+            return ("not", self.parse_not())
+        return self.parse_predicate()
+
+    def parse_predicate(self):
+        if self.accept("op", "("):
+            condition = self.parse_or()
+            self.take("op", ")")
+            return condition
+
+        column = self.take("word")[1]
+        negate = self.accept("keyword", "not")
+
+        if self.accept("keyword", "in"):
+            self.take("op", "(")
+            values = [self.parse_literal()]
+            while self.accept("op", ","):
+                values.append(self.parse_literal())
+            self.take("op", ")")
+            condition = ("in", column, tuple(values))
+        elif self.accept("keyword", "between"):
+            low = self.parse_literal()
+            self.take("keyword", "and")
+            condition = ("between", column, low, self.parse_literal())
+        elif not negate and self.accept("keyword", "is"):
+            negate = self.accept("keyword", "not")
+            self.take("keyword", "null")
+            condition = ("null", column)
+        elif (
+            not negate
+            and self.peek()[0] == "op"
+            and self.peek()[1] in COMPARISON_OPERATORS
+        ):
+            operator = COMPARISON_OPERATORS[self.take("op")[1]]
+            condition = ("cmp", column, operator, self.parse_literal())
+        else:
+            raise ValueError(f"Unsupported predicate on {column!r}")
+
+        return ("not", condition) if negate else condition
+
+    def parse_literal(self):
+        kind, value = self.take()
+        if kind not in ("string", "number"):
+            raise ValueError(f"Expected a literal, got {value!r}")
+        return value
+
+
+def parse_where_clause(text):
+    """Parse a WHERE clause into a condition tree, or raise ValueError."""
+    return _Parser(tokenize(text)).parse()
+
+
+def parse_filter_query(query):
+    """
+    Parse `SELECT id FROM user_review [WHERE ...]`, as produced by the filter prompt.
+
+    Returns the condition tree of the WHERE clause (None when there is no WHERE
+    clause), or raises ValueError for anything outside the supported subset:
+    comparisons, IN, BETWEEN and IS NULL on plain columns against literals,
+    combined with AND, OR, NOT and parentheses.
+    """
+    match = re.fullmatch(
+        r"\s*SELECT\s+(?:user_review\.)?id\s+FROM\s+user_review"
+        r"(?:\s+WHERE\s+(?P<where>.+?))?\s*;?\s*",
+        query,
+        re.IGNORECASE | re.DOTALL,
+    )
+    if not match:
+        raise ValueError("Not a plain SELECT id FROM user_review query")
+    if match.group("where") is None:
+        return None
+    return parse_where_clause(match.group("where"))
+
+
+def condition_columns(condition):
+    """Return the set of columns referenced by a condition tree."""
+    if condition is None:
+        return set()
+    if condition[0] in ("and", "or"):
+        return condition_columns(condition[1]) | condition_columns(condition[2])
+    if condition[0] == "not":
+        return condition_columns(condition[1])
+    return {condition[1]}
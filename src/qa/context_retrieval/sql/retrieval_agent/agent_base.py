@@ -1,6 +1,18 @@
+from qa.context_retrieval.sql.post_processing.query_extractor import extract_query
+from qa.llm.scheduler import get_llm
+
+
+def is_valid_query_response(response):
+    """A hedged SQL answer only counts if a query can be extracted from it."""
+    return extract_query(response) is not None
+
+
 class AgentBase:
+    provider = None  # LLM provider name, set by each retriever
+
     def __init__(self, api_key):
         self.api_key = api_key
+        self.llm = get_llm(self.provider, api_key, validator=is_valid_query_response)
 
     def build_aggregate_query(self, user_question):
         return f"""
@@ -54,9 +66,21 @@ class AgentBase:
         """
 
     def get_query(self, user_question, query_type):
-        """Abstract method to retrieve SQL query based on a user question."""
-        raise NotImplementedError("Subclasses should implement this method.")
+        """Retrieve SQL query based on a user question."""
+        if query_type == "filtering":
+            prompt = self.build_filter_query(user_question)
+        elif query_type == "aggregating":
+            prompt = self.build_aggregate_query(user_question)
+        else:
+            raise ValueError(f"Unsupported query_type: {query_type}")
+        return self.llm.generate(prompt)
 
     def get_relax_query(self, user_question, previous_query):
-        """Abstract method to retrieve relaxed SQL query based on a user question."""
-        raise NotImplementedError("Subclasses should implement this method.")
+        """Retrieve relaxed SQL query based on a user question."""
+        return self.llm.generate(self.build_relax_query(user_question, previous_query))
+
+    def solved_error_query(self, user_question, query, error_message):
+        """Retrieve a corrected SQL query for a query that failed with `error_message`."""
+        return self.llm.generate(
+            self.build_fixed_error_query_prompt(user_question, query, error_message)
+        )
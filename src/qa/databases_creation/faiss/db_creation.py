@@ -1,100 +1,419 @@
 import json
 import logging
+import math
 import os
+import shutil
+import sqlite3
+import time
 
 import faiss
 import numpy as np
 import pandas as pd
 from dotenv import load_dotenv
 
+from qa.context_retrieval.faiss.faiss_agent import index_reduction
+from qa.context_retrieval.faiss.metadata_store import (
+    NUMERIC_COLUMNS,
+    write_metadata_store,
+)
+from qa.context_retrieval.faiss.partitioned_index import (
+    PARTITIONS_MANIFEST_FILE,
+    REDUCTION_FILE,
+    partition_keys,
+    partition_name,
+    partitions_path,
+)
+from qa.databases_creation.faiss.embedding_ingest import load_embedding_shards
+from qa.databases_creation.faiss.index_benchmark import benchmark_index
+
 # Load environment variables
 load_dotenv()
 EMBEDDING_VECTOR_PATH = os.getenv("EMBEDDING_VECTOR_PATH")
 FAISS_PATH = os.getenv("FAISS_PATH")
 METADATA_FAISS_PATH = os.getenv("METADATA_FAISS_PATH")
+SQLITE_PATH = os.getenv("SQLITE_PATH")
+FAISS_INDEX_TYPE = os.getenv("FAISS_INDEX_TYPE", "ivf_flat")
+# Optional dimensionality reduction before indexing (0 keeps the full dimension)
+FAISS_REDUCE_DIM = int(os.getenv("FAISS_REDUCE_DIM", "0"))
+FAISS_REDUCTION = os.getenv("FAISS_REDUCTION", "pca")
+# Also build one sub-index per (year, sentiment) partition for filtered searches
+FAISS_BUILD_PARTITIONS = os.getenv("FAISS_BUILD_PARTITIONS", "true").lower() == "true"
+
+# FAISS index_factory layouts; {nlist} and {m} (PQ sub-quantizers) are set per build.
+# PQ stores m bytes per vector instead of 4 * dim, SQ8 stores dim bytes.
+INDEX_TYPES = {
+    "ivf_flat": "IVF{nlist},Flat",
+    "ivf_sq8": "IVF{nlist},SQ8",
+    "ivf_pq": "IVF{nlist},PQ{m}",
+    "opq_ivf_pq": "OPQ{m},IVF{nlist},PQ{m}",
+    "hnsw": "HNSW32,Flat",
+}
+
+# Reductions applied in front of the index. "pcar" rotates the PCA output so variance
+# is spread evenly over the kept dimensions, which suits SQ8/PQ codes.
+REDUCTIONS = ("pca", "pcar", "random_rotation")
+
+# Training sample per IVF list; 8-bit PQ codebooks need about 39 * 256 points
+TRAIN_POINTS_PER_LIST = 64
+MIN_PQ_TRAINING_POINTS = 9984
+
+# Partitions up to this size are searched exactly; larger ones get their own index
+PARTITION_FLAT_MAX_ROWS = 20000
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(message)s")
 
 
-def load_all_embeddings(directory_path):
-    logging.info("Loading all embeddings from directory")
-    embeddings = []
+def load_review_attributes(database_path, ids):
+    """Load text and numeric columns from `user_review`, aligned with the given ids."""
+    logging.info("Loading review attributes from SQLite")
+    conn = sqlite3.connect(database_path)
+    try:
+        df = pd.read_sql_query(
+            "SELECT id, review_text AS text, review_rating, year, month, day FROM user_review",
+            conn,
+        )
+    finally:
+        conn.close()
 
-    # Iterate over each file in the directory
-    for file_name in os.listdir(directory_path):
-        if file_name.startswith("embeddings_batch_") and file_name.endswith(".json"):
-            file_path = os.path.join(directory_path, file_name)
-            logging.info(f"Loading embeddings from file: {file_name}")
+    df = df.set_index("id").reindex(ids).reset_index()
+    missing = df["text"].isna().sum()
+    if missing:
+        logging.warning(f"{missing} embedded ids were not found in user_review")
+        df["text"] = df["text"].fillna("")
+    return df
 
-            # Load embeddings from the file
-            with open(file_path, "r") as f:
-                for line in f:
-                    batch = json.loads(line)
-                    embeddings.extend(batch)
 
-    # Convert to DataFrame
-    df = pd.DataFrame(embeddings)
-    logging.info("All embeddings loaded into DataFrame")
-    return df
+def list_imbalance(index):
+    """
+    Return the FAISS imbalance factor of the inverted lists (1.0 is perfectly balanced).
 
+    Computed as nlist * sum(size^2) / total^2, the same measure FAISS reports.
+    Returns None for indexes without inverted lists (HNSW).
+    """
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is None:
+        return None
+    sizes = np.array(
+        [ivf.invlists.list_size(i) for i in range(ivf.nlist)], dtype="float64"
+    )
+    total = sizes.sum()
+    return float(ivf.nlist * (sizes**2).sum() / total**2) if total else 1.0
 
-# Modify this function in your FAISS creation script
-def create_partitioned_faiss_index_and_save_metadata(
-    df, index_path, metadata_path, nlist=100
+
+def auto_nlist(n):
+    """Number of IVF lists for `n` vectors: about sqrt(n), with at least 39 points per list."""
+    return max(1, min(int(round(math.sqrt(n))), n // 39))
+
+
+def pq_subquantizers(d):
+    """PQ sub-quantizer count: one byte per 8 dimensions, rounded down to a divisor of d."""
+    return next(m for m in range(max(1, d // 8), 0, -1) if d % m == 0)
+
+
+def training_sample(embeddings, index_type, nlist, train_size=None, seed=0):
+    """Random subset of rows to train on; the whole set if it is small enough."""
+    n = embeddings.shape[0]
+    if train_size is None:
+        train_size = nlist * TRAIN_POINTS_PER_LIST
+        if "pq" in index_type:
+            train_size = max(train_size, MIN_PQ_TRAINING_POINTS)
+    if train_size >= n:
+        return embeddings
+    rows = np.random.default_rng(seed).choice(n, size=train_size, replace=False)
+    return embeddings[np.sort(rows)]
+
+
+def train_reduction(sample, reduce_dim, reduction="pca"):
+    """
+    Train a transform from the sample's dimension down to `reduce_dim`.
+
+    The PCA basis is fitted on the centred sample as usual, but applied without
+    mean subtraction: the index ranks by inner product, and subtracting the mean
+    would add a per-vector bias to every score.
+    """
+    d = sample.shape[1]
+    if reduction == "random_rotation":
+        transform = faiss.RandomRotationMatrix(d, reduce_dim)
+    elif reduction in ("pca", "pcar"):
+        transform = faiss.PCAMatrix(d, reduce_dim, 0, reduction == "pcar")
+    else:
+        raise ValueError(
+            f"Unsupported reduction: {reduction} (choose from {', '.join(REDUCTIONS)})"
+        )
+    logging.info(f"Training {reduction} reduction {d} -> {reduce_dim}")
+    transform.train(sample)
+
+    if isinstance(transform, faiss.PCAMatrix):
+        faiss.copy_array_to_vector(np.zeros(d, dtype="float32"), transform.mean)
+        transform.prepare_Ab()
+    return transform
+
+
+def build_index(
+    embeddings,
+    index_type="ivf_flat",
+    nlist=None,
+    train_size=None,
+    reduce_dim=None,
+    reduction="pca",
 ):
-    # Prepare embeddings and normalize them
-    logging.info("Preparing embeddings and normalizing for FAISS")
-    embeddings = np.array(df["embedding"].tolist()).astype("float32")
-    faiss.normalize_L2(embeddings)  # Normalize for cosine similarity
+    """
+    Build a FAISS inner-product index of `index_type` over normalized `embeddings`.
 
-    # Define the dimension of embeddings
+    `nlist` defaults to `auto_nlist` of the corpus size, and training uses a random
+    sample of `train_size` rows (by default TRAIN_POINTS_PER_LIST per list). With
+    `reduce_dim` the vectors are first reduced by a trained `reduction`; the index
+    is then an IndexPreTransform, which stores the transform and applies it to
+    every added or searched vector.
+    """
+    if index_type not in INDEX_TYPES:
+        raise ValueError(
+            f"Unsupported index type: {index_type} (choose from {', '.join(INDEX_TYPES)})"
+        )
     d = embeddings.shape[1]
+    nlist = nlist or auto_nlist(embeddings.shape[0])
+    sample = training_sample(embeddings, index_type, nlist, train_size)
+
+    transform = None
+    if reduce_dim and reduce_dim < d:
+        transform = train_reduction(sample, reduce_dim, reduction)
+        sample = transform.apply(sample)
+        d = reduce_dim
 
-    # Create an IVF index with partitioning
-    logging.info(f"Creating partitioned FAISS IVF index with {nlist} clusters")
-    quantizer = faiss.IndexFlatIP(d)  # Quantizer used to find clusters
-    index = faiss.IndexIVFFlat(quantizer, d, nlist, faiss.METRIC_INNER_PRODUCT)
+    factory = INDEX_TYPES[index_type].format(nlist=nlist, m=pq_subquantizers(d))
+    logging.info(f"Creating FAISS index '{factory}'")
+    index = faiss.index_factory(d, factory, faiss.METRIC_INNER_PRODUCT)
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        ivf = faiss.downcast_index(ivf)
+        # Polysemous codes only serve Hamming-threshold search, which is never used
+        # here, and their training dominates the PQ build time
+        if isinstance(ivf, faiss.IndexIVFPQ):
+            ivf.do_polysemous_training = False
 
-    # Enable a direct map
-    index.make_direct_map()
+    if not index.is_trained:
+        logging.info(f"Training FAISS index on {len(sample)} sampled embeddings")
+        index.train(sample)
+        logging.info("Index training completed")
 
-    # Train the index with a subset of embeddings (required for IVF)
-    logging.info("Training FAISS index on embeddings")
-    index.train(embeddings)
-    logging.info("Index training completed")
+    # Enable a direct map so rows can be reconstructed by position
+    if ivf is not None:
+        ivf.make_direct_map()
+
+    if transform is not None:
+        index = faiss.IndexPreTransform(transform, index)
 
     # Add embeddings to the index
     index.add(embeddings)
     logging.info("Embeddings added to the FAISS index")
+    return index
+
+
+def build_partition_index(vectors, rows, index_type="ivf_flat"):
+    """
+    Build a sub-index over `vectors` that returns their FAISS rows `rows` as ids.
+
+    Small partitions are a flat (exact) index; larger ones use `index_type` with
+    `nlist` sized for the partition.
+    """
+    d = vectors.shape[1]
+    if len(rows) <= PARTITION_FLAT_MAX_ROWS:
+        index = faiss.IndexIDMap(faiss.IndexFlatIP(d))
+    else:
+        nlist = auto_nlist(len(rows))
+        factory = INDEX_TYPES[index_type].format(nlist=nlist, m=pq_subquantizers(d))
+        index = faiss.index_factory(d, f"IDMap,{factory}", faiss.METRIC_INNER_PRODUCT)
+        ivf = faiss.try_extract_index_ivf(index)
+        if ivf is not None and isinstance(faiss.downcast_index(ivf), faiss.IndexIVFPQ):
+            faiss.downcast_index(ivf).do_polysemous_training = False
+        if not index.is_trained:
+            index.train(training_sample(vectors, index_type, nlist))
+    index.add_with_ids(vectors, np.asarray(rows, dtype="int64"))
+    return index
+
+
+def create_partition_indexes(vectors, df, index_path, index_type, transform=None):
+    """
+    Write one sub-index per (year, sentiment) partition of the rows, with a manifest,
+    to the partition directory next to `index_path`.
+
+    `vectors` are the vectors as the full index holds them (reduced by `transform`
+    if the index has a reduction), in FAISS row order.
+    """
+    directory = partitions_path(index_path)
+    tmp_directory = f"{directory}.tmp"
+    shutil.rmtree(tmp_directory, ignore_errors=True)
+    os.makedirs(tmp_directory)
+
+    keys = pd.Series(partition_keys(df["year"], df["review_rating"]))
+    entries = []
+    for (year, sentiment), rows in keys.groupby(keys).groups.items():
+        rows = np.sort(np.asarray(rows, dtype="int64"))
+        file_name = f"{partition_name(year, sentiment)}.faiss"
+        index = build_partition_index(vectors[rows], rows, index_type)
+        faiss.write_index(index, os.path.join(tmp_directory, file_name))
+        entries.append(
+            {
+                "year": int(year),
+                "sentiment": sentiment,
+                "file": file_name,
+                "count": len(rows),
+            }
+        )
+
+    if transform is not None:
+        faiss.write_VectorTransform(
+            transform, os.path.join(tmp_directory, REDUCTION_FILE)
+        )
+    _write_partitions_manifest(
+        tmp_directory,
+        {
+            "index_type": index_type,
+            "reduction_file": REDUCTION_FILE if transform is not None else None,
+            "count": int(vectors.shape[0]),
+            "partitions": entries,
+        },
+    )
+
+    shutil.rmtree(directory, ignore_errors=True)
+    os.replace(tmp_directory, directory)
+    logging.info(f"{len(entries)} FAISS partitions saved at {directory}")
+
+
+def append_to_partitions(index_path, vectors, rows, df):
+    """
+    Add rows (already in the full index at FAISS rows `rows`) to their partitions,
+    creating partitions for new (year, sentiment) pairs. Does nothing if the index
+    has no partitions.
+    """
+    directory = partitions_path(index_path)
+    manifest_path = os.path.join(directory, PARTITIONS_MANIFEST_FILE)
+    if not os.path.exists(manifest_path):
+        return
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+    entries = {
+        (entry["year"], entry["sentiment"]): entry for entry in manifest["partitions"]
+    }
+
+    rows = np.asarray(rows, dtype="int64")
+    keys = pd.Series(partition_keys(df["year"], df["review_rating"]))
+    for (year, sentiment), positions in keys.groupby(keys).groups.items():
+        positions = np.asarray(positions)
+        entry = entries.get((year, sentiment))
+        if entry is None:
+            entry = {
+                "year": int(year),
+                "sentiment": sentiment,
+                "file": f"{partition_name(year, sentiment)}.faiss",
+                "count": 0,
+            }
+            entries[(year, sentiment)] = entry
+            index = build_partition_index(
+                vectors[positions], rows[positions], manifest["index_type"]
+            )
+        else:
+            index = faiss.read_index(os.path.join(directory, entry["file"]))
+            index.add_with_ids(vectors[positions], rows[positions])
+        path = os.path.join(directory, entry["file"])
+        faiss.write_index(index, f"{path}.tmp")
+        os.replace(f"{path}.tmp", path)
+        entry["count"] += len(positions)
+
+    # The manifest count marks the partitions as covering the new rows
+    manifest["partitions"] = list(entries.values())
+    manifest["count"] += len(rows)
+    _write_partitions_manifest(directory, manifest)
+    logging.info(f"Added {len(rows)} rows to the FAISS partitions")
+
+
+def _write_partitions_manifest(directory, manifest):
+    tmp_path = os.path.join(directory, f"{PARTITIONS_MANIFEST_FILE}.tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, os.path.join(directory, PARTITIONS_MANIFEST_FILE))
+
+
+def create_partitioned_faiss_index_and_save_metadata(
+    embeddings,
+    df,
+    index_path,
+    metadata_path,
+    nlist=None,
+    index_type=FAISS_INDEX_TYPE,
+    train_size=None,
+    reduce_dim=FAISS_REDUCE_DIM,
+    reduction=FAISS_REDUCTION,
+    build_partitions=FAISS_BUILD_PARTITIONS,
+):
+    """
+    Build a FAISS index over `embeddings` and save it with its metadata store.
+
+    `df` holds the id, text and numeric columns for each embedding row. A recall and
+    latency report against exact full-dimension search is written next to the index.
+    With `reduce_dim` the metadata store keeps the reduced vectors, as the index does.
+    With `build_partitions` per-(year, sentiment) sub-indexes are written as well.
+    """
+    # Normalize embeddings for cosine similarity
+    logging.info("Preparing embeddings and normalizing for FAISS")
+    embeddings = embeddings.astype("float32")
+    faiss.normalize_L2(embeddings)
+
+    start = time.time()
+    index = build_index(
+        embeddings, index_type, nlist, train_size, reduce_dim, reduction
+    )
+    build_seconds = time.time() - start
+    transform = index_reduction(index)
+    if transform is None:
+        reduce_dim = reduction = None
 
     # Save FAISS index
     faiss.write_index(index, index_path)
-    logging.info(f"Partitioned FAISS index with direct map saved at {index_path}")
+    logging.info(f"FAISS {index_type} index saved at {index_path}")
 
-    # Save metadata (including ID, text, etc.)
-    metadata = [
-        {
-            "id": row["id"],
-            "faiss_index": idx,
-            "text": row["text"],
-            "review_rating": row["review_rating"],
-            "year": row["year"],
-            "month": row["month"],
-            "day": row["day"],
-            "embedding": row["embedding"],  # Include the embedding for verification
-        }
-        for idx, row in df.iterrows()
-    ]
-
-    with open(metadata_path, "w") as f:
-        json.dump(metadata, f)
+    report = benchmark_index(index, embeddings)
+    report.update(
+        index_type=index_type,
+        reduction=reduction,
+        reduced_dim=reduce_dim,
+        build_seconds=round(build_seconds, 2),
+    )
+    with open(f"{index_path}.report.json", "w") as f:
+        json.dump(report, f, indent=2)
+    logging.info(f"Index report saved at {index_path}.report.json")
+
+    vectors = transform.apply(embeddings) if transform else embeddings
+    if build_partitions:
+        create_partition_indexes(vectors, df, index_path, index_type, transform)
+    else:
+        shutil.rmtree(partitions_path(index_path), ignore_errors=True)
+
+    # Save metadata (ID, text, numeric columns and vectors) as a memory-mappable store.
+    # Training stats are kept so incremental updates can tell when to retrain.
+    write_metadata_store(
+        metadata_path,
+        ids=df["id"].to_numpy(),
+        texts=df["text"],
+        vectors=vectors,
+        columns={column: df[column].to_numpy() for column in NUMERIC_COLUMNS},
+        manifest={
+            "index_type": index_type,
+            "reduction": reduction,
+            "reduced_dim": reduce_dim,
+            "trained_count": int(index.ntotal),
+            "trained_imbalance": list_imbalance(index),
+        },
+    )
     logging.info(f"Metadata with ID-to-FAISS mapping saved at {metadata_path}")
 
 
-# Load data, create partitioned index, and save metadata
-df = load_all_embeddings(EMBEDDING_VECTOR_PATH)
-create_partitioned_faiss_index_and_save_metadata(
-    df, FAISS_PATH, METADATA_FAISS_PATH, nlist=100
-)
-logging.info("Partitioned FAISS index and metadata saved successfully.")
+if __name__ == "__main__":
+    # Load embedding shards, create partitioned index, and save metadata
+    ids, embeddings = load_embedding_shards(EMBEDDING_VECTOR_PATH)
+    df = load_review_attributes(SQLITE_PATH, ids)
+    create_partitioned_faiss_index_and_save_metadata(
+        embeddings, df, FAISS_PATH, METADATA_FAISS_PATH
+    )
+    logging.info("Partitioned FAISS index and metadata saved successfully.")
@@ -0,0 +1,204 @@
+import argparse
+import logging
+import os
+import re
+import sqlite3
+import time
+
+import numpy as np
+from dotenv import load_dotenv
+from sentence_transformers import SentenceTransformer
+
+# Load environment variables
+load_dotenv()
+SQLITE_PATH = os.getenv("SQLITE_PATH")
+EMBEDDING_MODEL_PATH = os.getenv("EMBEDDING_MODEL_PATH")
+EMBEDDING_VECTOR_PATH = os.getenv("EMBEDDING_VECTOR_PATH")
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(message)s")
+
+# Each shard is a float32 vectors file plus an int64 id sidecar with the same stem
+SHARD_VECTORS_FILE = "shard_{:05d}.npy"
+SHARD_IDS_FILE = "shard_{:05d}_ids.npy"
+SHARD_IDS_PATTERN = re.compile(r"shard_(\d{5})_ids\.npy$")
+
+
+def completed_shards(directory):
+    """Return the numbers of fully written shards, in order."""
+    if not os.path.isdir(directory):
+        return []
+    numbers = []
+    for file_name in os.listdir(directory):
+        match = SHARD_IDS_PATTERN.match(file_name)
+        if match and os.path.exists(
+            os.path.join(directory, SHARD_VECTORS_FILE.format(int(match.group(1))))
+        ):
+            numbers.append(int(match.group(1)))
+    return sorted(numbers)
+
+
+def last_ingested_id(directory):
+    """Return the highest review id already embedded, or None for a fresh run."""
+    shards = completed_shards(directory)
+    if not shards:
+        return None
+    ids = np.load(os.path.join(directory, SHARD_IDS_FILE.format(shards[-1])))
+    return int(ids.max()) if ids.size else None
+
+
+def _save_atomic(path, array):
+    """Write an array to `path` via a temporary file so a crash never leaves a partial shard."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        np.save(f, array)
+    os.replace(tmp_path, path)
+
+
+def write_shard(directory, shard_number, ids, embeddings):
+    """Write one shard; the id sidecar goes last and marks the shard as complete."""
+    _save_atomic(
+        os.path.join(directory, SHARD_VECTORS_FILE.format(shard_number)),
+        np.ascontiguousarray(embeddings, dtype="float32"),
+    )
+    _save_atomic(
+        os.path.join(directory, SHARD_IDS_FILE.format(shard_number)),
+        np.asarray(ids, dtype="int64"),
+    )
+
+
+def iter_review_batches(database_path, batch_size, after_id=None):
+    """Yield (ids, texts) from `user_review` in id order, starting after `after_id`."""
+    conn = sqlite3.connect(database_path)
+    try:
+        last_id = -1 if after_id is None else after_id
+        while True:
+            rows = conn.execute(
+                "SELECT id, review_text FROM user_review WHERE id > ? ORDER BY id LIMIT ?",
+                (last_id, batch_size),
+            ).fetchall()
+            if not rows:
+                return
+            ids, texts = zip(*rows)
+            last_id = ids[-1]
+            yield list(ids), list(texts)
+    finally:
+        conn.close()
+
+
+class BatchEncoder:
+    """Encode texts in large batches, fanning out to a process pool on CPU."""
+
+    def __init__(self, model_path, batch_size=256, workers=None):
+        self.model = SentenceTransformer(model_path)
+        self.batch_size = batch_size
+        self.pool = None
+
+        workers = workers if workers is not None else os.cpu_count()
+        if self.model.device.type == "cpu" and workers > 1:
+            logging.info(f"Starting {workers} CPU encoding processes")
+            self.pool = self.model.start_multi_process_pool(
+                target_devices=["cpu"] * workers
+            )
+
+    def encode(self, texts):
+        if self.pool is not None:
+            embeddings = self.model.encode_multi_process(
+                texts, self.pool, batch_size=self.batch_size
+            )
+        else:
+            embeddings = self.model.encode(
+                texts,
+                batch_size=self.batch_size,
+                convert_to_numpy=True,
+                show_progress_bar=False,
+            )
+        return np.asarray(embeddings, dtype="float32")
+
+    def close(self):
+        if self.pool is not None:
+            self.model.stop_multi_process_pool(self.pool)
+            self.pool = None
+
+
+def embed_reviews(
+    database_path,
+    model_path,
+    output_dir,
+    shard_size=50000,
+    batch_size=256,
+    workers=None,
+):
+    """
+    Embed every review in `user_review` into float32 shards under `output_dir`.
+
+    Shards are written in id order, so a crashed run resumes after the last complete
+    shard instead of starting over.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    shards = completed_shards(output_dir)
+    next_shard = shards[-1] + 1 if shards else 0
+    after_id = last_ingested_id(output_dir)
+    if after_id is not None:
+        logging.info(f"Resuming after review id {after_id} ({len(shards)} shards done)")
+
+    encoder = BatchEncoder(model_path, batch_size=batch_size, workers=workers)
+    start = time.time()
+    total = 0
+    try:
+        for ids, texts in iter_review_batches(database_path, shard_size, after_id):
+            embeddings = encoder.encode(texts)
+            write_shard(output_dir, next_shard, ids, embeddings)
+            total += len(ids)
+            elapsed = time.time() - start
+            logging.info(
+                f"Saved shard {next_shard} ({len(ids)} rows); "
+                f"{total} rows in {elapsed:.1f}s ({total / elapsed:.0f} rows/s)"
+            )
+            next_shard += 1
+    finally:
+        encoder.close()
+
+    logging.info(
+        f"Embedding completed: {total} new rows in {time.time() - start:.2f} seconds"
+    )
+
+
+def load_embedding_shards(directory):
+    """Load all completed shards as (ids, embeddings) arrays in shard order."""
+    shards = completed_shards(directory)
+    if not shards:
+        raise FileNotFoundError(
+            f"No completed embedding shards in {directory}; run embedding_ingest first"
+        )
+    logging.info(f"Loading {len(shards)} embedding shards from {directory}")
+    ids = [np.load(os.path.join(directory, SHARD_IDS_FILE.format(n))) for n in shards]
+    embeddings = [
+        np.load(os.path.join(directory, SHARD_VECTORS_FILE.format(n)), mmap_mode="r")
+        for n in shards
+    ]
+    return np.concatenate(ids), np.concatenate(embeddings).astype("float32", copy=False)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Embed user reviews from SQLite into float32 .npy shards."
+    )
+    parser.add_argument("--database", default=SQLITE_PATH)
+    parser.add_argument("--model", default=EMBEDDING_MODEL_PATH)
+    parser.add_argument("--output-dir", default=EMBEDDING_VECTOR_PATH)
+    parser.add_argument("--shard-size", type=int, default=50000)
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument(
+        "--workers", type=int, default=None, help="CPU encoding processes"
+    )
+    args = parser.parse_args()
+
+    embed_reviews(
+        args.database,
+        args.model,
+        args.output_dir,
+        shard_size=args.shard_size,
+        batch_size=args.batch_size,
+        workers=args.workers,
+    )
@@ -0,0 +1,150 @@
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import faiss
+import numpy as np
+
+from qa.context_retrieval.faiss.faiss_agent import base_index, search_parameters
+from qa.context_retrieval.faiss.search_service import FaissSearchService
+
+# Search effort settings measured per index: nprobe for IVF, efSearch for HNSW
+IVF_NPROBES = (1, 5, 10, 20, 50)
+HNSW_EF_SEARCHES = (16, 32, 64, 128)
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(message)s")
+
+
+def index_size_bytes(index):
+    """Serialized size of the index, i.e. what it takes on disk and in memory."""
+    return int(faiss.serialize_index(index).nbytes)
+
+
+def search_efforts(index):
+    """Return (parameter name, values) of the search effort settings to measure."""
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        return "nprobe", [p for p in IVF_NPROBES if p < ivf.nlist] + [ivf.nlist]
+    if isinstance(base_index(index), faiss.IndexHNSW):
+        return "ef_search", list(HNSW_EF_SEARCHES)
+    return None, [None]
+
+
+def without_row(neighbors, row, k):
+    """The first `k` neighbors other than `row` (and unfilled result slots)."""
+    return neighbors[(neighbors != row) & (neighbors >= 0)][:k]
+
+
+def benchmark_index(index, embeddings, k=10, n_queries=200, seed=0):
+    """
+    Measure `index` against exact inner-product search over the same `embeddings`.
+
+    Queries are sampled from the corpus, and each query's own row is left out of
+    both the ground truth and the results: it is always its own top-1, and an IVF
+    index always finds it in the first list it probes, which would inflate recall.
+    For each search effort setting the report has recall@k and the p50/p99 latency
+    of single-query searches; it also gives the serialized index size. Ground truth
+    always uses the full `embeddings`, so the recall of a reduced-dimension index
+    includes the loss from the reduction.
+    """
+    n = embeddings.shape[0]
+    k = min(k, n - 1)
+    rows = np.random.default_rng(seed).choice(n, size=min(n_queries, n), replace=False)
+    queries = np.ascontiguousarray(embeddings[rows])
+
+    exact = faiss.IndexFlatIP(embeddings.shape[1])
+    exact.add(embeddings)
+    _, truth = exact.search(queries, k + 1)
+    truth = [without_row(neighbors, row, k) for neighbors, row in zip(truth, rows)]
+
+    effort_name, efforts = search_efforts(index)
+    searches = []
+    for effort in efforts:
+        params = search_parameters(index, effort)
+        latencies = []
+        hits = 0
+        for query, row, expected in zip(queries, rows, truth):
+            start = time.perf_counter()
+            _, I = index.search(query.reshape(1, -1), k + 1, params=params)
+            latencies.append(time.perf_counter() - start)
+            hits += len(np.intersect1d(without_row(I[0], row, k), expected))
+        latencies_ms = np.array(latencies) * 1000
+        searches.append(
+            {
+                effort_name or "default": effort,
+                "recall_at_k": round(hits / (k * len(queries)), 4),
+                "p50_ms": round(float(np.percentile(latencies_ms, 50)), 3),
+                "p99_ms": round(float(np.percentile(latencies_ms, 99)), 3),
+            }
+        )
+
+    ivf = faiss.try_extract_index_ivf(index)
+    size = index_size_bytes(index)
+    report = {
+        "ntotal": int(index.ntotal),
+        "dim": int(embeddings.shape[1]),
+        "index_dim": int(base_index(index).d),
+        "nlist": int(ivf.nlist) if ivf is not None else None,
+        "size_bytes": size,
+        "bytes_per_vector": round(size / max(1, index.ntotal), 1),
+        "k": k,
+        "queries": len(queries),
+        "searches": searches,
+    }
+    for search in searches:
+        logging.info(f"Index benchmark: {search}")
+    logging.info(
+        f"Index size {size / 1e6:.1f} MB ({report['bytes_per_vector']} bytes/vector)"
+    )
+    return report
+
+
+def benchmark_concurrency(
+    index,
+    embeddings,
+    workers_list,
+    k=5,
+    nprobe=10,
+    n_queries=2000,
+    omp_threads=1,
+    seed=0,
+):
+    """
+    Measure search throughput of a FaissSearchService for each worker count.
+
+    Every query is sent as its own single-query search, as concurrent sessions do,
+    from twice as many client threads as workers so the pool stays busy. Latency
+    includes time spent queued for a worker.
+    """
+    n = embeddings.shape[0]
+    rows = np.random.default_rng(seed).choice(n, size=n_queries, replace=n_queries > n)
+    queries = np.ascontiguousarray(embeddings[rows])
+    params = search_parameters(index, nprobe)
+
+    results = []
+    for workers in workers_list:
+        service = FaissSearchService(workers=workers, omp_threads=omp_threads)
+
+        def timed_search(query):
+            start = time.perf_counter()
+            service.search(index, query.reshape(1, -1), k, params)
+            return time.perf_counter() - start
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=2 * max(workers, 1)) as clients:
+            latencies = list(clients.map(timed_search, queries))
+        elapsed = time.perf_counter() - start
+        service.close()
+
+        latencies_ms = np.array(latencies) * 1000
+        result = {
+            "workers": workers,
+            "omp_threads": omp_threads,
+            "qps": round(len(queries) / elapsed, 1),
+            "p50_ms": round(float(np.percentile(latencies_ms, 50)), 3),
+            "p99_ms": round(float(np.percentile(latencies_ms, 99)), 3),
+        }
+        logging.info(f"Concurrency benchmark: {result}")
+        results.append(result)
+    return results
@@ -0,0 +1,323 @@
+import argparse
+import json
+import logging
+import os
+import sqlite3
+
+import faiss
+import numpy as np
+import pandas as pd
+from dotenv import load_dotenv
+
+from qa.context_retrieval.faiss.metadata_store import (
+    MANIFEST_FILE,
+    NUMERIC_COLUMNS,
+    MetadataStore,
+    append_metadata_store,
+)
+from qa.databases_creation.faiss.db_creation import (
+    append_to_partitions,
+    create_partitioned_faiss_index_and_save_metadata,
+    index_reduction,
+    list_imbalance,
+    load_review_attributes,
+)
+from qa.databases_creation.faiss.embedding_ingest import (
+    BatchEncoder,
+    completed_shards,
+    last_ingested_id,
+    load_embedding_shards,
+    write_shard,
+)
+from qa.databases_creation.sql_lite.db_creation import (
+    append_rollup,
+    build_rollup,
+    create_user_review_indexes,
+    insert_reviews,
+    preprocess_text,
+)
+
+# Load environment variables
+load_dotenv()
+SQLITE_PATH = os.getenv("SQLITE_PATH")
+FAISS_PATH = os.getenv("FAISS_PATH")
+METADATA_FAISS_PATH = os.getenv("METADATA_FAISS_PATH")
+EMBEDDING_MODEL_PATH = os.getenv("EMBEDDING_MODEL_PATH")
+EMBEDDING_VECTOR_PATH = os.getenv("EMBEDDING_VECTOR_PATH")
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(message)s")
+
+
+def insert_new_reviews(database_path, csv_path, chunksize=100_000):
+    """
+    Insert reviews from `csv_path` whose review_id is not yet in `user_review`.
+
+    The CSV is streamed chunk by chunk like `build_database`, all in one transaction.
+    New rows get ids after the current maximum, so FAISS rows can be appended in id
+    order. Returns the number of inserted rows.
+    """
+    conn = sqlite3.connect(database_path)
+    try:
+        create_user_review_indexes(conn)
+        conn.execute("CREATE TEMP TABLE incoming_review (review_id TEXT PRIMARY KEY)")
+        first_id = next_id = conn.execute(
+            "SELECT COALESCE(MAX(id), -1) + 1 FROM user_review"
+        ).fetchone()[0]
+        rows_read = 0
+        for chunk in pd.read_csv(csv_path, chunksize=chunksize):
+            df = preprocess_text(chunk).drop_duplicates("review_id")
+            rows_read += len(df)
+
+            # Stage the chunk's review_ids so the existence check runs inside SQLite;
+            # rows inserted from earlier chunks count as existing too
+            conn.execute("DELETE FROM incoming_review")
+            conn.executemany(
+                "INSERT INTO incoming_review VALUES (?)",
+                ((review_id,) for review_id in df["review_id"]),
+            )
+            existing = {
+                row[0]
+                for row in conn.execute(
+                    "SELECT review_id FROM incoming_review "
+                    "WHERE review_id IN (SELECT review_id FROM user_review)"
+                )
+            }
+            df_new = df[~df["review_id"].isin(existing)]
+            if df_new.empty:
+                continue
+            df_new = df_new.assign(id=np.arange(next_id, next_id + len(df_new)))
+            insert_reviews(conn, df_new)
+            next_id += len(df_new)
+
+        inserted = next_id - first_id
+        logging.info(
+            f"{rows_read} reviews in batch, {rows_read - inserted} already ingested, "
+            f"{inserted} new"
+        )
+        if not inserted:
+            return 0
+
+        # Keep the rollup cube current: add partial aggregates for the new rows only
+        has_rollup = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'user_review_rollup'"
+        ).fetchone()
+        if has_rollup:
+            append_rollup(conn, min_id=first_id)
+        else:
+            build_rollup(conn)
+        conn.commit()
+
+        # Refresh planner statistics if the new rows changed them noticeably
+        conn.execute("PRAGMA optimize")
+        return inserted
+    finally:
+        conn.close()
+
+
+def needs_retraining(index, manifest, max_imbalance_growth=1.2, max_size_growth=2.0):
+    """
+    Decide whether the IVF centroids have drifted too far from the data.
+
+    Compares the current list imbalance and index size against the values recorded
+    when the index was trained. Indexes without IVF centroids (HNSW) never need it.
+    """
+    imbalance = list_imbalance(index)
+    if imbalance is None:
+        return False
+    trained_imbalance = manifest.get("trained_imbalance", imbalance)
+    trained_count = manifest.get("trained_count", index.ntotal)
+    logging.info(
+        f"List imbalance {imbalance:.3f} (trained {trained_imbalance:.3f}), "
+        f"size {index.ntotal} (trained {trained_count})"
+    )
+    return (
+        imbalance > trained_imbalance * max_imbalance_growth
+        or index.ntotal > trained_count * max_size_growth
+    )
+
+
+def rebuild_index(
+    database_path, index_path, metadata_path, shard_dir, nlist, settings=None
+):
+    """Retrain the index from scratch on every embedding shard with the given build settings."""
+    logging.info("Retraining FAISS index from embedding shards")
+    ids, embeddings = load_embedding_shards(shard_dir)
+    df = load_review_attributes(database_path, ids)
+    create_partitioned_faiss_index_and_save_metadata(
+        embeddings, df, index_path, metadata_path, nlist=nlist, **(settings or {})
+    )
+
+
+def built_index_settings(metadata_path):
+    """
+    Index type and reduction recorded by the last build. Indexes built before they
+    were recorded are full-dimension IVF-Flat.
+    """
+    try:
+        with open(os.path.join(metadata_path, MANIFEST_FILE)) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        manifest = {}
+    return {
+        "index_type": manifest.get("index_type", "ivf_flat"),
+        "reduce_dim": manifest.get("reduced_dim"),
+        "reduction": manifest.get("reduction") or "pca",
+    }
+
+
+def index_new_reviews(
+    database_path,
+    index_path,
+    metadata_path,
+    model_path,
+    shard_dir,
+    workers=1,
+    max_imbalance_growth=1.2,
+    max_size_growth=2.0,
+    force_rebuild=False,
+    encoder=None,
+):
+    """
+    Embed reviews that are in SQLite but not yet in FAISS and add them to the index.
+
+    Rows are appended in id order, so FAISS row i and metadata row i keep describing
+    the same review. The index is retrained only when drift passes the thresholds.
+    `encoder` replaces the BatchEncoder loaded from `model_path`.
+    """
+    if not shard_dir:
+        raise ValueError(
+            "An embedding shard directory is required to keep the shards complete "
+            "for retraining (set EMBEDDING_VECTOR_PATH or pass --shards)"
+        )
+    index = faiss.read_index(index_path)
+    ivf = faiss.try_extract_index_ivf(index)
+    rebuild_args = (
+        database_path,
+        index_path,
+        metadata_path,
+        shard_dir,
+        ivf.nlist if ivf is not None else None,
+        built_index_settings(metadata_path),
+    )
+    if force_rebuild:
+        rebuild_index(*rebuild_args)
+        return
+
+    store = MetadataStore(metadata_path)
+    if index.ntotal != len(store):
+        raise ValueError(
+            f"FAISS index has {index.ntotal} rows but metadata has {len(store)}; "
+            "run with --rebuild to restore a consistent index"
+        )
+
+    last_indexed_id = int(store.ids.max()) if len(store) else -1
+    conn = sqlite3.connect(database_path)
+    try:
+        df_new = pd.read_sql_query(
+            "SELECT id, review_text AS text, review_rating, year, month, day "
+            "FROM user_review WHERE id > ? ORDER BY id",
+            conn,
+            params=(last_indexed_id,),
+        )
+    finally:
+        conn.close()
+
+    if df_new.empty:
+        logging.info("FAISS index is up to date")
+        return
+
+    logging.info(f"Embedding {len(df_new)} new reviews")
+    own_encoder = encoder is None
+    if own_encoder:
+        encoder = BatchEncoder(model_path, workers=workers)
+    try:
+        embeddings = encoder.encode(df_new["text"].tolist())
+    finally:
+        if own_encoder:
+            encoder.close()
+
+    # Keep the shards complete so a later retrain sees the new reviews too
+    shard_last_id = last_ingested_id(shard_dir)
+    if shard_last_id is None or shard_last_id < df_new["id"].iloc[0]:
+        shards = completed_shards(shard_dir)
+        write_shard(
+            shard_dir, shards[-1] + 1 if shards else 0, df_new["id"], embeddings
+        )
+
+    faiss.normalize_L2(embeddings)
+    first_row = index.ntotal
+    index.add(embeddings)
+
+    if needs_retraining(index, store.manifest, max_imbalance_growth, max_size_growth):
+        rebuild_index(*rebuild_args)
+        return
+
+    # The metadata store keeps vectors as the index holds them, i.e. reduced
+    transform = index_reduction(index)
+    if transform is not None:
+        embeddings = transform.apply(embeddings)
+
+    # Index first, metadata last: the metadata manifest count marks the commit point
+    tmp_path = f"{index_path}.tmp"
+    faiss.write_index(index, tmp_path)
+    os.replace(tmp_path, index_path)
+    append_to_partitions(
+        index_path, embeddings, np.arange(first_row, index.ntotal), df_new
+    )
+    append_metadata_store(
+        metadata_path,
+        ids=df_new["id"].to_numpy(),
+        texts=df_new["text"],
+        vectors=embeddings,
+        columns={column: df_new[column].to_numpy() for column in NUMERIC_COLUMNS},
+    )
+    logging.info(
+        f"Added {len(df_new)} reviews; FAISS index now has {index.ntotal} rows"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Append new reviews to SQLite and the FAISS index without a full rebuild."
+    )
+    parser.add_argument(
+        "--csv", help="CSV with new reviews (same columns as the dataset)"
+    )
+    parser.add_argument("--database", default=SQLITE_PATH)
+    parser.add_argument("--index", default=FAISS_PATH)
+    parser.add_argument("--metadata", default=METADATA_FAISS_PATH)
+    parser.add_argument("--model", default=EMBEDDING_MODEL_PATH)
+    parser.add_argument("--shards", default=EMBEDDING_VECTOR_PATH)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--max-imbalance-growth", type=float, default=1.2)
+    parser.add_argument("--max-size-growth", type=float, default=2.0)
+    parser.add_argument(
+        "--rebuild", action="store_true", help="Retrain the index from all shards"
+    )
+    args = parser.parse_args()
+    # The path defaults come from the environment, which may not set them
+    for option, variable in [
+        ("database", "SQLITE_PATH"),
+        ("index", "FAISS_PATH"),
+        ("metadata", "METADATA_FAISS_PATH"),
+        ("shards", "EMBEDDING_VECTOR_PATH"),
+    ]:
+        if not getattr(args, option):
+            parser.error(f"--{option} is required when {variable} is not set")
+
+    if args.csv:
+        inserted = insert_new_reviews(args.database, args.csv)
+        logging.info(f"Inserted {inserted} new reviews into user_review")
+
+    index_new_reviews(
+        args.database,
+        args.index,
+        args.metadata,
+        args.model,
+        args.shards,
+        workers=args.workers,
+        max_imbalance_growth=args.max_imbalance_growth,
+        max_size_growth=args.max_size_growth,
+        force_rebuild=args.rebuild,
+    )
@@ -1,8 +1,9 @@
 import logging
 import os
-import re
 import sqlite3
+import time
 
+import numpy as np
 import pandas as pd
 from dotenv import load_dotenv
 
@@ -12,27 +13,44 @@ load_dotenv()
 # Configure logging
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(message)s")
 
-
-def remove_emojis(text):
-    """Remove emojis and special characters from text."""
-    return re.sub(r"[^\w\s,]", "", text)
-
-
-def assign_sentiment(rating):
-    """Assign sentiment based on review rating."""
-    if rating in [1, 2]:
-        return "negative"
-    elif rating == 3:
-        return "neutral"
-    elif rating in [4, 5]:
-        return "positive"
-    return "unknown"  # in case of missing or unusual rating values
+# Columns of the user_review table, in insert order
+USER_REVIEW_COLUMNS = [
+    "id",
+    "pseudo_author_id",
+    "review_id",
+    "review_text",
+    "review_rating",
+    "sentiment",
+    "year",
+    "month",
+    "day",
+]
+
+# Secondary indexes on the columns the filter/aggregate prompts expose
+USER_REVIEW_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS idx_user_review_review_id ON user_review (review_id)",
+    "CREATE INDEX IF NOT EXISTS idx_user_review_sentiment_date ON user_review (sentiment, year, month, day)",
+    "CREATE INDEX IF NOT EXISTS idx_user_review_rating_date ON user_review (review_rating, year, month, day)",
+    "CREATE INDEX IF NOT EXISTS idx_user_review_date ON user_review (year, month, day)",
+]
+
+
+def remove_emojis(texts):
+    """Remove emojis and special characters from a Series of texts."""
+    return texts.str.replace(r"[^\w\s,]", "", regex=True)
+
+
+def assign_sentiment(ratings):
+    """Assign sentiment to a Series of review ratings."""
+    return np.select(
+        [ratings.isin([1, 2]), ratings == 3, ratings.isin([4, 5])],
+        ["negative", "neutral", "positive"],
+        default="unknown",  # in case of missing or unusual rating values
+    )
 
 
 def preprocess_text(df):
     """Apply uniform preprocessing: remove emojis, filter text length, add sentiment, and extract date components."""
-    logging.info("Starting text preprocessing")
-
     # Rename 'Unnamed: 0' to 'id' if it exists
     if "Unnamed: 0" in df.columns:
         df = df.rename(columns={"Unnamed: 0": "id"})
@@ -44,75 +62,164 @@ def preprocess_text(df):
     df = df.dropna(subset=["review_text"])
 
     # Clean 'review_text' and overwrite it with cleaned content
-    df["review_text"] = df["review_text"].apply(remove_emojis)
+    df = df.assign(review_text=remove_emojis(df["review_text"]))
 
     # Filter for rows with at least 10 words in 'review_text' after cleaning
-    df = df[df["review_text"].apply(lambda x: len(x.split()) >= 10)].reset_index(
-        drop=True
-    )
+    df = df[df["review_text"].str.count(r"\S+") >= 10]
 
     # Convert 'review_timestamp' to datetime and extract year, month, and day
-    df["review_timestamp"] = pd.to_datetime(df["review_timestamp"], errors="coerce")
-    df["year"] = df["review_timestamp"].dt.year
-    df["month"] = df["review_timestamp"].dt.month
-    df["day"] = df["review_timestamp"].dt.day
-
-    # Assign sentiment based on review rating
-    df["sentiment"] = df["review_rating"].apply(assign_sentiment)
-
-    # Drop unnecessary columns
-    df = df.drop(
-        columns=[
-            "author_app_version",
-            "review_timestamp",
-            "author_name",
-            "review_likes",
-        ]
+    timestamps = pd.to_datetime(df["review_timestamp"], errors="coerce")
+
+    return df.assign(
+        year=timestamps.dt.year,
+        month=timestamps.dt.month,
+        day=timestamps.dt.day,
+        sentiment=assign_sentiment(df["review_rating"]),
+    )[USER_REVIEW_COLUMNS]
+
+
+def create_user_review_table(conn):
+    """(Re)create the user_review table with cleaned text under review_text, sentiment, and date components."""
+    conn.execute("DROP TABLE IF EXISTS user_review")
+    conn.execute(
+        """
+        CREATE TABLE user_review (
+            id INTEGER PRIMARY KEY,
+            pseudo_author_id TEXT,
+            review_id TEXT NOT NULL,
+            review_text TEXT NOT NULL,
+            review_rating INTEGER,
+            sentiment TEXT,
+            year INTEGER,
+            month INTEGER,
+            day INTEGER
+        )
+    """
     )
 
-    logging.info("Text preprocessing completed")
-    return df
 
+def create_user_review_indexes(conn):
+    """
+    Create the secondary indexes used by LLM-generated queries.
+
+    Filter and aggregate prompts restrict on sentiment, review_rating and the date
+    columns, so each leads a composite index that continues with year, month, day.
+    """
+    for statement in USER_REVIEW_INDEXES:
+        conn.execute(statement)
 
-# Paths to database and CSV file
-database_path = os.getenv("SQLITE_PATH")
-csv_file_path = os.getenv("DATASET_PATH")
 
-# Load the CSV data
-df = pd.read_csv(csv_file_path)
-logging.info("CSV data loaded successfully")
+def create_rollup_table(conn):
+    """
+    (Re)create user_review_rollup, a pre-aggregated cube of user_review.
 
-# Preprocess the data
-df_filtered = preprocess_text(df)
+    Each row holds the review count and rating sum for one (year, month, day,
+    review_rating, sentiment) cell; per-sentiment counts come from grouping by
+    sentiment. Rows are partial aggregates, so one cell may span several rows and
+    readers always SUM them.
+    """
+    conn.execute("DROP TABLE IF EXISTS user_review_rollup")
+    conn.execute(
+        """
+        CREATE TABLE user_review_rollup (
+            year INTEGER,
+            month INTEGER,
+            day INTEGER,
+            review_rating INTEGER,
+            sentiment TEXT,
+            review_count INTEGER NOT NULL,
+            rating_sum INTEGER NOT NULL
+        )
+    """
+    )
 
-# Connect to the SQLite database
-conn = sqlite3.connect(database_path)
-cursor = conn.cursor()
 
-# Create the user_review table with cleaned text under review_text, sentiment, and date components
-cursor.execute(
+def append_rollup(conn, min_id=None):
+    """Aggregate user_review rows (those with id >= min_id, if given) into the rollup."""
+    conn.execute(
+        """
+        INSERT INTO user_review_rollup
+        SELECT year, month, day, review_rating, sentiment,
+               COUNT(*), COALESCE(SUM(review_rating), 0)
+        FROM user_review
+        WHERE ? IS NULL OR id >= ?
+        GROUP BY year, month, day, review_rating, sentiment
+    """,
+        (min_id, min_id),
+    )
+
+
+def build_rollup(conn):
+    """Rebuild the rollup cube from the whole user_review table."""
+    create_rollup_table(conn)
+    append_rollup(conn)
+    conn.execute(
+        "CREATE INDEX idx_user_review_rollup_date ON user_review_rollup (year, month, day)"
+    )
+
+
+def insert_reviews(conn, df):
+    """Insert preprocessed rows into user_review with a single executemany."""
+    columns = ", ".join(USER_REVIEW_COLUMNS)
+    placeholders = ", ".join("?" for _ in USER_REVIEW_COLUMNS)
+    conn.executemany(
+        f"INSERT INTO user_review ({columns}) VALUES ({placeholders})",
+        df.itertuples(index=False, name=None),
+    )
+
+
+def build_database(csv_file_path, database_path, chunksize=100_000):
+    """
+    Stream the CSV into SQLite chunk by chunk.
+
+    Only one chunk is held in memory at a time, and all chunks are written in a single
+    transaction so a failed build leaves the previous table untouched. Indexes are
+    created and the rollup cube is built after the bulk insert, then the database is
+    switched to WAL and analyzed.
     """
-    CREATE TABLE IF NOT EXISTS user_review (
-        id INTEGER PRIMARY KEY,
-        pseudo_author_id TEXT,
-        review_id TEXT,
-        review_text TEXT,
-        review_rating INTEGER,
-        sentiment TEXT,
-        year INTEGER,
-        month INTEGER,
-        day INTEGER
+    conn = sqlite3.connect(database_path)
+    start = time.time()
+    rows_read = rows_written = 0
+    try:
+        with conn:
+            conn.execute("BEGIN")
+            create_user_review_table(conn)
+            for chunk in pd.read_csv(csv_file_path, chunksize=chunksize):
+                df_filtered = preprocess_text(chunk)
+                insert_reviews(conn, df_filtered)
+
+                rows_read += len(chunk)
+                rows_written += len(df_filtered)
+                elapsed = time.time() - start
+                logging.info(
+                    f"Processed {rows_read} rows, kept {rows_written} "
+                    f"({rows_read / elapsed:.0f} rows/s)"
+                )
+
+            logging.info("Creating secondary indexes")
+            create_user_review_indexes(conn)
+
+            logging.info("Building rollup table")
+            build_rollup(conn)
+
+        # WAL lets the app keep reading while incremental updates write
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("ANALYZE")
+    finally:
+        conn.close()
+
+    logging.info(
+        f"Wrote {rows_written} of {rows_read} rows in {time.time() - start:.2f} seconds"
     )
-"""
-)
 
-# Insert preprocessed data from DataFrame to the SQLite table
-df_filtered.to_sql("user_review", conn, if_exists="replace", index=False)
 
-# Commit changes and close the connection
-conn.commit()
-conn.close()
+if __name__ == "__main__":
+    # Paths to database and CSV file
+    database_path = os.getenv("SQLITE_PATH")
+    csv_file_path = os.getenv("DATASET_PATH")
+
+    build_database(csv_file_path, database_path)
 
-logging.info(
-    "Filtered and preprocessed data successfully inserted into the SQLite database."
-)
+    logging.info(
+        "Filtered and preprocessed data successfully inserted into the SQLite database."
+    )
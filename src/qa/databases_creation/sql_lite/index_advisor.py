@@ -0,0 +1,124 @@
+import argparse
+import json
+import logging
+import os
+import re
+import sqlite3
+from collections import Counter
+
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+SQLITE_PATH = os.getenv("SQLITE_PATH")
+SQL_QUERY_LOG_PATH = os.getenv("SQL_QUERY_LOG_PATH")
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(message)s")
+
+# Columns the prompts expose for filtering; used to suggest index keys
+FILTER_COLUMNS = ["sentiment", "review_rating", "year", "month", "day", "review_id"]
+
+
+def load_logged_queries(log_path):
+    """Return (query, times_seen) pairs from the generated-query log, most frequent first."""
+    counts = Counter()
+    with open(log_path, "r") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                logging.warning("Skipping malformed query log line")
+                continue
+            counts[" ".join(entry["query"].split())] += 1
+    return counts.most_common()
+
+
+def explain_query(conn, query):
+    """Return the EXPLAIN QUERY PLAN detail lines for a query, or raise sqlite3.Error."""
+    return [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {query}")]
+
+
+def is_full_scan(plan):
+    """True when any plan step scans user_review without using an index."""
+    return any(
+        re.match(r"SCAN (TABLE )?user_review\b", detail) and "INDEX" not in detail
+        for detail in plan
+    )
+
+
+def filtered_columns(query):
+    """Columns from FILTER_COLUMNS that appear in the query's WHERE clause."""
+    match = re.search(r"\bWHERE\b(.*)", query, re.IGNORECASE | re.DOTALL)
+    if not match:
+        return []
+    where = re.sub(r"'[^']*'", "''", match.group(1))  # ignore words inside literals
+    return [
+        column
+        for column in FILTER_COLUMNS
+        if re.search(rf"\b{column}\b", where, re.IGNORECASE)
+    ]
+
+
+def advise(database_path, log_path):
+    """Replay logged queries through EXPLAIN QUERY PLAN and report full table scans."""
+    conn = sqlite3.connect(f"file:{database_path}?mode=ro", uri=True)
+    report = {"queries": 0, "full_scans": [], "errors": []}
+    try:
+        for query, times_seen in load_logged_queries(log_path):
+            report["queries"] += 1
+            try:
+                plan = explain_query(conn, query)
+            except sqlite3.Error as e:
+                report["errors"].append({"query": query, "error": str(e)})
+                continue
+            if is_full_scan(plan):
+                report["full_scans"].append(
+                    {
+                        "query": query,
+                        "times_seen": times_seen,
+                        "plan": plan,
+                        "filtered_columns": filtered_columns(query),
+                    }
+                )
+    finally:
+        conn.close()
+    return report
+
+
+def print_report(report):
+    print(
+        f"{report['queries']} distinct queries replayed, "
+        f"{len(report['full_scans'])} still scan user_review, "
+        f"{len(report['errors'])} failed to plan"
+    )
+    for entry in report["full_scans"]:
+        print(f"\n[{entry['times_seen']}x] {entry['query']}")
+        for detail in entry["plan"]:
+            print(f"    {detail}")
+        if entry["filtered_columns"]:
+            print(f"    candidate index: ({', '.join(entry['filtered_columns'])})")
+
+    # Column combinations behind the most scanned queries
+    suggestions = Counter()
+    for entry in report["full_scans"]:
+        if entry["filtered_columns"]:
+            suggestions[tuple(entry["filtered_columns"])] += entry["times_seen"]
+    if suggestions:
+        print("\nMost frequent unindexed filters:")
+        for columns, times_seen in suggestions.most_common(5):
+            print(f"    ({', '.join(columns)}): {times_seen} queries")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Report logged LLM-generated queries that still do full table scans."
+    )
+    parser.add_argument("--database", default=SQLITE_PATH)
+    parser.add_argument("--log", default=SQL_QUERY_LOG_PATH)
+    args = parser.parse_args()
+
+    print_report(advise(args.database, args.log))
@@ -0,0 +1,3 @@
+from .cache import LLMResponseCache
+from .client import LLMClient, LLMError, get_llm_client
+from .scheduler import ProviderScheduler, get_llm, get_scheduler
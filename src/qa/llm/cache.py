@@ -0,0 +1,161 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Disk cache of LLM responses; disabled when no path is configured
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH")
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", str(7 * 24 * 3600)))
+LLM_CACHE_MAX_MB = float(os.getenv("LLM_CACHE_MAX_MB", "100"))
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(message)s")
+
+
+def prompt_key(provider, model, prompt):
+    """Cache key for a prompt sent to one model of one provider."""
+    digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+    return f"{provider}:{model}:{digest}"
+
+
+class LLMResponseCache:
+    """
+    SQLite-backed cache of LLM responses keyed by (provider, model, prompt hash).
+
+    Entries older than `ttl_seconds` are ignored and deleted on read. When the
+    stored responses exceed `max_bytes`, the least recently used ones are evicted.
+    """
+
+    def __init__(self, path, ttl_seconds=LLM_CACHE_TTL, max_bytes=None):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = (
+            max_bytes if max_bytes is not None else int(LLM_CACHE_MAX_MB * 1024**2)
+        )
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        with self._conn:
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS llm_response (
+                    key TEXT PRIMARY KEY,
+                    provider TEXT NOT NULL,
+                    model TEXT NOT NULL,
+                    response TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_used REAL NOT NULL
+                )
+            """
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_llm_response_last_used "
+                "ON llm_response (last_used)"
+            )
+
+    def get(self, provider, model, prompt):
+        """Return the cached response, or None."""
+        key = prompt_key(provider, model, prompt)
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT response, created_at FROM llm_response WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or now - row[1] > self.ttl_seconds:
+                if row is not None:
+                    self._conn.execute("DELETE FROM llm_response WHERE key = ?", (key,))
+                self.stats["misses"] += 1
+                return None
+            self._conn.execute(
+                "UPDATE llm_response SET last_used = ? WHERE key = ?", (now, key)
+            )
+            self.stats["hits"] += 1
+            return row[0]
+
+    def put(self, provider, model, prompt, response):
+        """Store a response, evicting least recently used entries over the size limit."""
+        size = len(response.encode("utf-8"))
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_response VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    prompt_key(provider, model, prompt),
+                    provider,
+                    model,
+                    response,
+                    size,
+                    now,
+                    now,
+                ),
+            )
+            total = self._conn.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM llm_response"
+            ).fetchone()[0]
+            if total <= self.max_bytes:
+                return
+            evicted = 0
+            for key, entry_size in self._conn.execute(
+                "SELECT key, size FROM llm_response ORDER BY last_used"
+            ).fetchall():
+                if total <= self.max_bytes:
+                    break
+                self._conn.execute("DELETE FROM llm_response WHERE key = ?", (key,))
+                total -= entry_size
+                evicted += 1
+            self.stats["evictions"] += evicted
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_llm_cache():
+    """Return the process-wide response cache, or None if LLM_CACHE_PATH is unset."""
+    global _cache
+    if not LLM_CACHE_PATH:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = LLMResponseCache(LLM_CACHE_PATH)
+            logging.info(f"LLM response cache opened at {LLM_CACHE_PATH}")
+        return _cache
+
+
+def cache_get(provider, model, prompt):
+    """Look a prompt up in the shared cache; None on a miss, when disabled or on error."""
+    cache = get_llm_cache()
+    if cache is None:
+        return None
+    try:
+        response = cache.get(provider, model, prompt)
+    except sqlite3.Error as e:
+        logging.warning(f"LLM cache read failed: {e}")
+        return None
+    if response is not None:
+        logging.info(f"LLM cache hit for {provider}/{model}")
+    return response
+
+
+def cache_put(provider, model, prompt, response):
+    """Store a response in the shared cache; empty responses are never cached."""
+    cache = get_llm_cache()
+    if cache is None or not response:
+        return
+    try:
+        cache.put(provider, model, prompt, response)
+    except sqlite3.Error as e:
+        logging.warning(f"LLM cache write failed: {e}")
@@ -0,0 +1,261 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+import requests
+from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+
+from qa.llm.cache import cache_get, cache_put
+from qa.llm.providers import CohereProvider, GeminiProvider, OllamaProvider
+
+# Load environment variables
+load_dotenv()
+
+# Read timeouts per provider (seconds); local Ollama generation can be slow
+PROVIDER_TIMEOUTS = {
+    "cohere": float(os.getenv("LLM_TIMEOUT_COHERE", "60")),
+    "gemini": float(os.getenv("LLM_TIMEOUT_GEMINI", "60")),
+    "llama": float(os.getenv("LLM_TIMEOUT_LLAMA", "180")),
+}
+CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", "5"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+LLM_RETRY_BACKOFF = float(os.getenv("LLM_RETRY_BACKOFF", "1.0"))
+
+# Statuses worth retrying: rate limiting and transient server errors
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(message)s")
+
+
+def retry_after_seconds(value):
+    """Seconds to wait from a Retry-After header (delay or HTTP-date), or None."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        date = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        logging.warning(f"Ignoring unreadable Retry-After header: {value!r}")
+        return None
+    if date.tzinfo is None:
+        date = date.replace(tzinfo=timezone.utc)
+    return max(0.0, (date - datetime.now(timezone.utc)).total_seconds())
+
+
+class LLMError(Exception):
+    """A provider call failed; `status` is the HTTP status, if there was one."""
+
+    def __init__(self, message, status=None, retry_after=None):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+
+class AnswerStream:
+    """
+    Iterable over a streamed answer that ends quietly if the provider fails.
+
+    Provider errors are logged and kept in `error` instead of raised into the UI;
+    `completed` is only set once the provider finished the answer, and callbacks
+    registered with `on_complete` then receive the full text.
+    """
+
+    def __init__(self, chunks):
+        self._chunks = chunks
+        self.parts = []
+        self.error = None
+        self.completed = False
+        self._callbacks = []
+
+    def on_complete(self, callback):
+        self._callbacks.append(callback)
+
+    @property
+    def text(self):
+        return "".join(self.parts)
+
+    def __iter__(self):
+        try:
+            for chunk in self._chunks:
+                self.parts.append(chunk)
+                yield chunk
+        except LLMError as e:
+            logging.error(f"Answer stream ended early: {e}")
+            self.error = e
+            return
+        self.completed = True
+        for callback in self._callbacks:
+            callback(self.text)
+
+
+class LLMClient:
+    """
+    One provider behind a pooled keep-alive HTTP session.
+
+    Every request has a connect and read timeout, and rate-limit or transient server
+    errors are retried with exponential backoff (honouring Retry-After). Responses
+    go through the persistent response cache when LLM_CACHE_PATH is set.
+    """
+
+    def __init__(
+        self,
+        provider,
+        timeout=None,
+        max_retries=LLM_MAX_RETRIES,
+        backoff=LLM_RETRY_BACKOFF,
+    ):
+        self.provider = provider
+        self.name = provider.name
+        self.model = provider.model
+        self.timeout = (
+            CONNECT_TIMEOUT,
+            timeout if timeout is not None else PROVIDER_TIMEOUTS[provider.name],
+        )
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def _post(self, prompt, stream=False):
+        """POST the prompt, retrying transient failures; returns an open response."""
+        url, headers, payload = self.provider.build_request(prompt, stream=stream)
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = self.session.post(
+                    url,
+                    json=payload,
+                    headers=headers,
+                    timeout=self.timeout,
+                    stream=stream,
+                )
+            except requests.RequestException as e:
+                error = LLMError(f"{self.name} request failed: {e}")
+            else:
+                if response.status_code == 200:
+                    return response
+                error = LLMError(
+                    f"{self.name} returned {response.status_code}: {response.text[:200]}",
+                    status=response.status_code,
+                    retry_after=retry_after_seconds(
+                        response.headers.get("Retry-After")
+                    ),
+                )
+                response.close()
+                if response.status_code not in RETRY_STATUSES:
+                    raise error
+
+            if attempt == self.max_retries:
+                raise error
+            delay = error.retry_after or self.backoff * 2**attempt
+            logging.warning(f"{error}; retrying in {delay:.1f}s")
+            time.sleep(delay)
+
+    def complete(self, prompt):
+        """Return the full response text, or raise LLMError."""
+        cached = cache_get(self.name, self.model, prompt)
+        if cached is not None:
+            return cached
+
+        start = time.time()
+        response = self._post(prompt)
+        try:
+            text = self.provider.parse_response(response)
+        except ValueError as e:
+            raise LLMError(f"{self.name} returned an unreadable response: {e}")
+        finally:
+            response.close()
+        logging.info(f"{self.name} answered in {time.time() - start:.2f}s")
+
+        cache_put(self.name, self.model, prompt, text)
+        return text
+
+    def generate(self, prompt):
+        """Return the response text, or None if the provider failed (error is logged)."""
+        try:
+            return self.complete(prompt)
+        except LLMError as e:
+            logging.error(str(e))
+            return None
+
+    def stream(self, prompt):
+        """
+        Yield the response text in chunks as the provider produces it.
+
+        Failures before the first chunk are retried like `complete`; the full text
+        is cached once the stream finishes.
+        """
+        cached = cache_get(self.name, self.model, prompt)
+        if cached is not None:
+            yield cached
+            return
+
+        response = self._post(prompt, stream=True)
+        chunks = []
+        try:
+            for chunk in self.provider.parse_stream(response):
+                if chunk:
+                    chunks.append(chunk)
+                    yield chunk
+        except requests.RequestException as e:
+            raise LLMError(f"{self.name} stream failed: {e}")
+        except ValueError as e:
+            raise LLMError(f"{self.name} returned an unreadable stream: {e}")
+        finally:
+            response.close()
+
+        cache_put(self.name, self.model, prompt, "".join(chunks))
+
+    def generate_stream(self, prompt):
+        """Return the response chunks as an AnswerStream; errors end the stream."""
+        return AnswerStream(self.stream(prompt))
+
+    async def acomplete(self, prompt):
+        """Async `complete`; the blocking call runs in a worker thread."""
+        return await asyncio.to_thread(self.complete, prompt)
+
+    async def agenerate(self, prompt):
+        return await asyncio.to_thread(self.generate, prompt)
+
+    async def astream(self, prompt):
+        """Async `stream`, pulling each chunk in a worker thread."""
+        chunks = self.stream(prompt)
+        while True:
+            chunk = await asyncio.to_thread(next, chunks, None)
+            if chunk is None:
+                return
+            yield chunk
+
+
+def create_provider(name, api_key=None):
+    """Build a provider, reading its key (or Ollama URL) from the environment by default."""
+    if name == "cohere":
+        return CohereProvider(api_key or os.getenv("COHERE_API_KEY"))
+    if name == "gemini":
+        return GeminiProvider(api_key or os.getenv("GEMINI_API_KEY"))
+    if name == "llama":
+        return OllamaProvider(api_key or os.getenv("LLAMA_API"))
+    raise ValueError(f"Unsupported agent type: {name}")
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_llm_client(name, api_key=None):
+    """Return the shared client for a provider, so its HTTP connections are reused."""
+    with _clients_lock:
+        key = (name, api_key)
+        if key not in _clients:
+            _clients[key] = LLMClient(create_provider(name, api_key))
+        return _clients[key]
@@ -0,0 +1,319 @@
+import logging
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import numpy as np
+from dotenv import load_dotenv
+
+from qa.llm.client import AnswerStream, LLMError
+
+# Load environment variables
+load_dotenv()
+USE_LLM_HEDGING = os.getenv("USE_LLM_HEDGING", "false").lower() == "true"
+# The backup request is sent once the primary is slower than this latency percentile
+HEDGE_PERCENTILE = float(os.getenv("HEDGE_PERCENTILE", "95"))
+# Deadline (seconds) used until a provider has HEDGE_MIN_SAMPLES recorded latencies
+HEDGE_DEFAULT_DEADLINE = float(os.getenv("HEDGE_DEFAULT_DEADLINE", "8"))
+HEDGE_MIN_SAMPLES = int(os.getenv("HEDGE_MIN_SAMPLES", "10"))
+HEDGE_WINDOW = int(os.getenv("HEDGE_WINDOW", "200"))
+# Hedged requests running at once across all sessions; beyond this, calls go unhedged
+HEDGE_MAX_WORKERS = int(os.getenv("HEDGE_MAX_WORKERS", "16"))
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(message)s")
+
+
+class LatencyTracker:
+    """Recent response latencies per provider, used to set the hedging deadline."""
+
+    def __init__(self, window=HEDGE_WINDOW):
+        self.window = window
+        self._samples = {}
+        self._lock = threading.Lock()
+
+    def record(self, name, seconds):
+        with self._lock:
+            samples = self._samples.setdefault(name, deque(maxlen=self.window))
+            samples.append(seconds)
+
+    def deadline(
+        self,
+        name,
+        percentile=HEDGE_PERCENTILE,
+        default=HEDGE_DEFAULT_DEADLINE,
+        min_samples=HEDGE_MIN_SAMPLES,
+    ):
+        """Latency percentile for `name`, or `default` until enough samples exist."""
+        with self._lock:
+            samples = list(self._samples.get(name, ()))
+        if len(samples) < min_samples:
+            return default
+        return float(np.percentile(samples, percentile))
+
+
+class HedgePool:
+    """
+    Worker threads for hedged requests, shared by all sessions.
+
+    A cancelled request keeps its worker until the provider sends its next chunk,
+    or up to the read timeout, so `submit` never queues: it returns None when all
+    `workers` are busy and the caller goes without hedging instead of stalling.
+    """
+
+    def __init__(self, workers=HEDGE_MAX_WORKERS):
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="llm-hedge"
+        )
+        self._slots = threading.BoundedSemaphore(workers)
+
+    def submit(self, fn, *args):
+        """Run `fn(*args)` on a free worker and return its future, or None."""
+        if not self._slots.acquire(blocking=False):
+            return None
+        try:
+            return self._executor.submit(self._run, fn, *args)
+        except RuntimeError:
+            self._slots.release()
+            raise
+
+    def _run(self, fn, *args):
+        try:
+            return fn(*args)
+        finally:
+            self._slots.release()
+
+
+latency_tracker = LatencyTracker()
+hedge_pool = HedgePool()
+hedge_stats = {"requests": 0, "hedged": 0, "backup_wins": 0, "pool_full": 0}
+_stats_lock = threading.Lock()
+
+
+class HedgedClient:
+    """
+    Sends a prompt to `primary` and, if no valid answer arrives by the primary's
+    latency percentile, the same prompt to `backup`; the first valid answer wins.
+
+    `validator(text)` decides whether an answer counts (by default any non-empty
+    text), so a fast malformed answer does not beat a slower good one. Both
+    requests are streamed so the loser can be cancelled: its connection is closed
+    at the next chunk instead of being read to the end.
+    """
+
+    def __init__(
+        self,
+        primary,
+        backup,
+        validator=None,
+        tracker=latency_tracker,
+        pool=hedge_pool,
+    ):
+        self.primary = primary
+        self.backup = backup
+        self.name = primary.name
+        self.validator = validator or bool
+        self.tracker = tracker
+        self.pool = pool
+
+    def _run(self, client, prompt, cancelled):
+        """Stream `client`'s answer; returns None if cancelled before it finished."""
+        start = time.monotonic()
+        chunks = []
+        stream = client.stream(prompt)
+        try:
+            for chunk in stream:
+                if cancelled.is_set():
+                    logging.info(f"Cancelled the slower {client.name} request")
+                    return None
+                chunks.append(chunk)
+        finally:
+            stream.close()
+            # Cancelled requests count too, or the deadline would drift below the tail
+            self.tracker.record(client.name, time.monotonic() - start)
+        return "".join(chunks)
+
+    def _count(self, key):
+        with _stats_lock:
+            hedge_stats[key] += 1
+
+    def _pool_full(self):
+        self._count("pool_full")
+        logging.warning("All hedge workers are busy, sending the request unhedged")
+
+    def complete(self, prompt):
+        """Return the first valid answer; raise LLMError if both requests failed."""
+        self._count("requests")
+        events = {}
+        primary_event = threading.Event()
+        primary = self.pool.submit(self._run, self.primary, prompt, primary_event)
+        if primary is None:
+            self._pool_full()
+            return self.primary.complete(prompt)
+        events[primary] = primary_event
+        pending = {primary}
+
+        deadline = self.tracker.deadline(self.primary.name)
+        done, pending = wait(pending, timeout=deadline)
+        fallback, error = None, None
+        for future in done:
+            fallback, error, valid = self._result(future)
+            if valid:
+                return fallback
+
+        backup_event = threading.Event()
+        backup = self.pool.submit(self._run, self.backup, prompt, backup_event)
+        if backup is None:
+            self._pool_full()
+        else:
+            self._count("hedged")
+            logging.info(
+                f"{self.primary.name} gave no valid answer within {deadline:.2f}s, "
+                f"hedging with {self.backup.name}"
+            )
+            events[backup] = backup_event
+            pending.add(backup)
+
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                text, future_error, valid = self._result(future)
+                if valid:
+                    for loser in pending:
+                        events[loser].set()
+                    if future is backup:
+                        self._count("backup_wins")
+                    return text
+                if text is not None and (fallback is None or future is primary):
+                    fallback = text
+                error = error or future_error
+
+        # Neither answer passed validation: return what we got, as without hedging
+        if fallback is not None:
+            return fallback
+        raise error
+
+    def _result(self, future):
+        """Return (text, error, valid) for a finished request."""
+        try:
+            text = future.result()
+        except LLMError as e:
+            logging.warning(f"Hedged request failed: {e}")
+            return None, e, False
+        return text, None, text is not None and bool(self.validator(text))
+
+    def generate(self, prompt):
+        """Return the response text, or None if both requests failed (error is logged)."""
+        try:
+            return self.complete(prompt)
+        except LLMError as e:
+            logging.error(str(e))
+            return None
+
+    def _pump(self, source, client, prompt, messages, cancelled):
+        """Stream `client`'s answer into `messages` as (source, kind, value) tuples."""
+        start = time.monotonic()
+        first_chunk = None
+        stream = client.stream(prompt)
+        try:
+            for chunk in stream:
+                if first_chunk is None:
+                    first_chunk = time.monotonic() - start
+                if cancelled.is_set():
+                    logging.info(f"Cancelled the slower {client.name} stream")
+                    return
+                messages.put((source, "chunk", chunk))
+            messages.put((source, "done", None))
+        except Exception as e:
+            messages.put((source, "error", e))
+        finally:
+            stream.close()
+            self.tracker.record(
+                f"{client.name} first chunk",
+                first_chunk if first_chunk is not None else time.monotonic() - start,
+            )
+
+    def stream(self, prompt):
+        """
+        Yield the answer of whichever provider starts answering first.
+
+        The backup is started when the primary has yielded no chunk within its
+        time-to-first-chunk percentile, or failed before its first chunk. The stream
+        then commits to the first request to yield a chunk and cancels the other.
+        The validator does not apply, as a partial answer cannot be validated.
+        """
+        self._count("requests")
+        messages = queue.Queue()
+        events = {"primary": threading.Event()}
+        primary = self.pool.submit(
+            self._pump, "primary", self.primary, prompt, messages, events["primary"]
+        )
+        if primary is None:
+            self._pool_full()
+            yield from self.primary.stream(prompt)
+            return
+        running = {"primary"}
+        try:
+            deadline = self.tracker.deadline(f"{self.primary.name} first chunk")
+            try:
+                message = messages.get(timeout=deadline)
+            except queue.Empty:
+                message = None
+            if message is None or message[1] == "error":
+                backup_event = threading.Event()
+                backup = self.pool.submit(
+                    self._pump, "backup", self.backup, prompt, messages, backup_event
+                )
+                if backup is None:
+                    self._pool_full()
+                else:
+                    self._count("hedged")
+                    logging.info(
+                        f"{self.primary.name} started no answer within "
+                        f"{deadline:.2f}s, hedging with {self.backup.name}"
+                    )
+                    events["backup"] = backup_event
+                    running.add("backup")
+
+            # Wait for the first chunk from either request
+            error = None
+            while message is None or message[1] != "chunk":
+                if message is not None:
+                    source, kind, value = message
+                    running.discard(source)
+                    if kind == "done":
+                        return
+                    logging.warning(f"Hedged stream failed: {value}")
+                    error = error or value
+                    if not running:
+                        raise error
+                message = messages.get()
+
+            winner, _, chunk = message
+            for source, event in events.items():
+                if source != winner:
+                    event.set()
+            if winner == "backup":
+                self._count("backup_wins")
+            yield chunk
+            while True:
+                source, kind, value = messages.get()
+                if source != winner:
+                    continue
+                if kind == "chunk":
+                    yield value
+                elif kind == "error":
+                    raise value
+                else:
+                    return
+        finally:
+            # Also stops both requests when the caller abandons the stream
+            for event in events.values():
+                event.set()
+
+    def generate_stream(self, prompt):
+        """Return the response chunks as an AnswerStream; errors end the stream."""
+        return AnswerStream(self.stream(prompt))
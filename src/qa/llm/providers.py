@@ -0,0 +1,109 @@
+import json
+import logging
+
+
+class CohereProvider:
+    """Cohere v2 chat API."""
+
+    name = "cohere"
+    url = "https://api.cohere.com/v2/chat"
+
+    def __init__(self, api_key, model="command-r-plus-08-2024"):
+        self.api_key = api_key
+        self.model = model
+
+    def build_request(self, prompt, stream=False):
+        """Return (url, headers, payload) for one prompt."""
+        headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json",
+        }
+        payload = {
+            "model": self.model,
+            "messages": [{"role": "user", "content": prompt}],
+            "stream": stream,
+        }
+        return self.url, headers, payload
+
+    def parse_response(self, response):
+        content = response.json().get("message", {}).get("content") or [{}]
+        return content[0].get("text", "")
+
+    def parse_stream(self, response):
+        """Yield text deltas from the server-sent event stream."""
+        for line in response.iter_lines():
+            if not line or not line.startswith(b"data:"):
+                continue
+            try:
+                event = json.loads(line[len(b"data:") :])
+            except json.JSONDecodeError:
+                logging.warning("Could not decode Cohere stream event as JSON")
+                continue
+            if event.get("type") == "content-delta":
+                yield event["delta"]["message"]["content"]["text"]
+
+
+class GeminiProvider:
+    """Gemini generateContent REST API."""
+
+    name = "gemini"
+    base_url = "https://generativelanguage.googleapis.com/v1beta/models"
+
+    def __init__(self, api_key, model="gemini-1.5-flash"):
+        self.api_key = api_key
+        self.model = model
+
+    def build_request(self, prompt, stream=False):
+        method = "streamGenerateContent?alt=sse" if stream else "generateContent"
+        headers = {"Content-Type": "application/json", "x-goog-api-key": self.api_key}
+        payload = {"contents": [{"parts": [{"text": prompt}]}]}
+        return f"{self.base_url}/{self.model}:{method}", headers, payload
+
+    @staticmethod
+    def _candidate_text(data):
+        """Text of the first candidate; blocked prompts have none and raise ValueError."""
+        candidates = data.get("candidates")
+        if not candidates:
+            reason = data.get("promptFeedback", {}).get("blockReason", "unknown")
+            raise ValueError(f"no candidates returned (block reason: {reason})")
+        parts = candidates[0].get("content", {}).get("parts") or [{}]
+        return parts[0].get("text", "")
+
+    def parse_response(self, response):
+        return self._candidate_text(response.json())
+
+    def parse_stream(self, response):
+        for line in response.iter_lines():
+            if not line or not line.startswith(b"data:"):
+                continue
+            try:
+                yield self._candidate_text(json.loads(line[len(b"data:") :]))
+            except json.JSONDecodeError:
+                logging.warning("Could not decode Gemini stream event as JSON")
+
+
+class OllamaProvider:
+    """Ollama /api/generate endpoint; `url` is the LLAMA_API address."""
+
+    name = "llama"
+
+    def __init__(self, url, model="llama3.2"):
+        self.url = url
+        self.model = model
+
+    def build_request(self, prompt, stream=False):
+        headers = {"Content-Type": "application/json"}
+        payload = {"model": self.model, "prompt": prompt, "stream": stream}
+        return self.url, headers, payload
+
+    def parse_response(self, response):
+        return response.json().get("response", "")
+
+    def parse_stream(self, response):
+        for line in response.iter_lines():
+            if not line:
+                continue
+            try:
+                yield json.loads(line.decode("utf-8")).get("response", "")
+            except json.JSONDecodeError:
+                logging.warning("Could not decode line as JSON")
@@ -0,0 +1,311 @@
+import logging
+import os
+import threading
+import time
+
+from dotenv import load_dotenv
+
+from qa.llm.cache import cache_get
+from qa.llm.client import AnswerStream, LLMError, get_llm_client
+from qa.llm.hedging import USE_LLM_HEDGING, HedgedClient
+
+# Load environment variables
+load_dotenv()
+USE_LLM_SCHEDULER = os.getenv("USE_LLM_SCHEDULER", "true").lower() == "true"
+# Free-tier request limits per minute; the local Llama model is not limited
+PROVIDER_RATE_LIMITS = {
+    "gemini": float(os.getenv("GEMINI_RPM", "15")),
+    "cohere": float(os.getenv("COHERE_RPM", "20")),
+}
+FALLBACK_PROVIDER = os.getenv("LLM_FALLBACK_PROVIDER", "llama")
+# Longest a call queues for its provider when nothing else has capacity (seconds)
+LLM_SCHEDULER_MAX_WAIT = float(os.getenv("LLM_SCHEDULER_MAX_WAIT", "30"))
+
+# Environment variable that must be set for a provider to be used as a reroute target
+PROVIDER_CREDENTIALS = {
+    "cohere": "COHERE_API_KEY",
+    "gemini": "GEMINI_API_KEY",
+    "llama": "LLAMA_API",
+}
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(message)s")
+
+
+class TokenBucket:
+    """Allows `rate_per_minute` calls per minute, with bursts of up to `capacity`."""
+
+    def __init__(self, rate_per_minute, capacity=None, clock=time.monotonic):
+        self.rate = rate_per_minute / 60
+        self.capacity = capacity if capacity is not None else rate_per_minute
+        self.clock = clock
+        self.tokens = self.capacity
+        self.updated = clock()
+        self.blocked_until = 0.0
+
+    def _refill(self, now):
+        if now < self.blocked_until:
+            return
+        start = max(self.updated, self.blocked_until)
+        self.tokens = min(self.capacity, self.tokens + (now - start) * self.rate)
+        self.updated = now
+
+    def try_acquire(self):
+        now = self.clock()
+        self._refill(now)
+        if now >= self.blocked_until and self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    def time_until_available(self):
+        """Seconds until the next token is available."""
+        now = self.clock()
+        self._refill(now)
+        if now < self.blocked_until:
+            return self.blocked_until - now + 1 / self.rate
+        return max(0.0, (1 - self.tokens) / self.rate)
+
+    def drain(self, seconds=None):
+        """Empty the bucket after the provider rate-limited us, optionally for `seconds`."""
+        now = self.clock()
+        self.tokens = 0
+        self.updated = now
+        if seconds:
+            self.blocked_until = now + seconds
+
+
+class ProviderScheduler:
+    """
+    Spreads LLM calls over the providers' rate limits.
+
+    Each call names a preferred provider. It is sent there while its token bucket
+    has capacity, otherwise to another rate-limited provider with capacity, then to
+    the fallback provider (local Llama). Only when none of those is usable does the
+    call queue for the preferred provider, for at most `max_wait` seconds. A 429
+    from a provider empties its bucket and the call is rerouted.
+    """
+
+    def __init__(
+        self,
+        rate_limits=PROVIDER_RATE_LIMITS,
+        providers=None,
+        fallback=FALLBACK_PROVIDER,
+        max_wait=LLM_SCHEDULER_MAX_WAIT,
+        client_factory=get_llm_client,
+        clock=time.monotonic,
+    ):
+        self.buckets = {
+            name: TokenBucket(rpm, clock=clock) for name, rpm in rate_limits.items()
+        }
+        self.providers = list(providers) if providers is not None else []
+        self.fallback = fallback
+        self.max_wait = max_wait
+        self.client_factory = client_factory
+        self.clock = clock
+        self._cond = threading.Condition()
+        self.stats = {
+            "queue_depth": 0,
+            "max_queue_depth": 0,
+            "reroutes": 0,
+            "fallbacks": 0,
+            "rate_limited": 0,
+            "queued": 0,
+            "wait_seconds": 0.0,
+            "max_wait_seconds": 0.0,
+            "calls": {},
+        }
+
+    def acquire(self, preferred, exclude=()):
+        """Return the provider the next call should use, or None if all are excluded."""
+        with self._cond:
+            candidates = [preferred] + [
+                name
+                for name in self.providers
+                if name != preferred and name != self.fallback and name in self.buckets
+            ]
+            for name in candidates:
+                if name in exclude:
+                    continue
+                bucket = self.buckets.get(name)
+                if bucket is None or bucket.try_acquire():
+                    if name != preferred:
+                        self.stats["reroutes"] += 1
+                        logging.info(f"{preferred} is at its rate limit, using {name}")
+                    return self._record(name)
+
+            if self.fallback in self.providers and self.fallback not in exclude:
+                self.stats["fallbacks"] += 1
+                logging.info(
+                    f"No provider has capacity, falling back to {self.fallback}"
+                )
+                return self._record(self.fallback)
+            if preferred in exclude:
+                return None
+
+            # Nothing to reroute to: wait for the preferred provider's bucket
+            bucket = self.buckets[preferred]
+            start = self.clock()
+            self.stats["queued"] += 1
+            self.stats["queue_depth"] += 1
+            self.stats["max_queue_depth"] = max(
+                self.stats["max_queue_depth"], self.stats["queue_depth"]
+            )
+            try:
+                while not bucket.try_acquire():
+                    remaining = self.max_wait - (self.clock() - start)
+                    if remaining <= 0:
+                        logging.warning(
+                            f"Waited {self.max_wait:.0f}s for {preferred}, sending anyway"
+                        )
+                        break
+                    self._cond.wait(min(bucket.time_until_available(), remaining))
+            finally:
+                self.stats["queue_depth"] -= 1
+            waited = self.clock() - start
+            self.stats["wait_seconds"] += waited
+            self.stats["max_wait_seconds"] = max(self.stats["max_wait_seconds"], waited)
+            return self._record(preferred)
+
+    def _record(self, name):
+        self.stats["calls"][name] = self.stats["calls"].get(name, 0) + 1
+        return name
+
+    def _rate_limited(self, name, error):
+        with self._cond:
+            self.stats["rate_limited"] += 1
+            bucket = self.buckets.get(name)
+            if bucket is not None:
+                bucket.drain(error.retry_after)
+        logging.warning(f"{name} is rate limited, rerouting: {error}")
+
+    def _client(self, name, preferred, api_key):
+        return self.client_factory(name, api_key if name == preferred else None)
+
+    def complete(self, preferred, prompt, api_key=None):
+        """Return the response text from the first provider that can serve it."""
+        client = self._client(preferred, preferred, api_key)
+        cached = cache_get(client.name, client.model, prompt)
+        if cached is not None:
+            return cached
+
+        tried = set()
+        name = self.acquire(preferred)
+        while True:
+            try:
+                return self._client(name, preferred, api_key).complete(prompt)
+            except LLMError as e:
+                if e.status != 429:
+                    raise
+                self._rate_limited(name, e)
+                tried.add(name)
+                name = self.acquire(preferred, exclude=tried)
+                if name is None:
+                    raise
+
+    def stream(self, preferred, prompt, api_key=None):
+        """Like `complete`, but yields chunks; reroutes only before the first chunk."""
+        client = self._client(preferred, preferred, api_key)
+        cached = cache_get(client.name, client.model, prompt)
+        if cached is not None:
+            yield cached
+            return
+
+        tried = set()
+        name = self.acquire(preferred)
+        while True:
+            started = False
+            stream = self._client(name, preferred, api_key).stream(prompt)
+            try:
+                for chunk in stream:
+                    started = True
+                    yield chunk
+                return
+            except LLMError as e:
+                if e.status != 429 or started:
+                    raise
+                self._rate_limited(name, e)
+                tried.add(name)
+                name = self.acquire(preferred, exclude=tried)
+                if name is None:
+                    raise
+            finally:
+                stream.close()
+
+    def metrics(self):
+        """Snapshot of queue depth, wait times and per-provider call counts."""
+        with self._cond:
+            stats = dict(self.stats, calls=dict(self.stats["calls"]))
+            stats["wait_seconds"] = round(stats["wait_seconds"], 3)
+            stats["max_wait_seconds"] = round(stats["max_wait_seconds"], 3)
+            stats["tokens"] = {
+                name: round(bucket.tokens, 2) for name, bucket in self.buckets.items()
+            }
+        return stats
+
+
+class ScheduledClient:
+    """LLMClient-like handle whose calls go through the scheduler."""
+
+    def __init__(self, scheduler, preferred, api_key=None):
+        self.scheduler = scheduler
+        self.preferred = preferred
+        self.name = preferred
+        self.api_key = api_key
+
+    def complete(self, prompt):
+        return self.scheduler.complete(self.preferred, prompt, self.api_key)
+
+    def generate(self, prompt):
+        """Return the response text, or None if every provider failed (error is logged)."""
+        try:
+            return self.complete(prompt)
+        except LLMError as e:
+            logging.error(str(e))
+            return None
+
+    def stream(self, prompt):
+        return self.scheduler.stream(self.preferred, prompt, self.api_key)
+
+    def generate_stream(self, prompt):
+        """Return the response chunks as an AnswerStream; errors end the stream."""
+        return AnswerStream(self.stream(prompt))
+
+
+def configured_providers():
+    """Providers whose API key (or Ollama URL) is set in the environment."""
+    return [name for name, var in PROVIDER_CREDENTIALS.items() if os.getenv(var)]
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler():
+    """Return the process-wide scheduler shared by all pipelines and sessions."""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = ProviderScheduler(providers=configured_providers())
+        return _scheduler
+
+
+def get_llm(name, api_key=None, validator=None):
+    """
+    Return the handle to call for agent `name`.
+
+    Calls are scheduled against the rate limits unless USE_LLM_SCHEDULER is off,
+    and hedged with a second provider when USE_LLM_HEDGING is on; `validator`
+    decides which hedged answers count.
+    """
+    client = get_llm_client(name, api_key)  # raises ValueError for unknown agents
+    if USE_LLM_SCHEDULER:
+        client = ScheduledClient(get_scheduler(), name, api_key)
+    if USE_LLM_HEDGING:
+        backup = next((p for p in configured_providers() if p != name), None)
+        if backup is not None:
+            backup_client = get_llm_client(backup)
+            if USE_LLM_SCHEDULER:
+                backup_client = ScheduledClient(get_scheduler(), backup)
+            client = HedgedClient(client, backup_client, validator)
+    return client
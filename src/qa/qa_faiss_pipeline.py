@@ -1,13 +1,9 @@
-import json
 import logging
-import os
 
-import cohere
-import google.generativeai as genai
-import requests
 import streamlit as st
 
 from qa.context_retrieval.faiss.faiss_agent import FaissAgent
+from qa.llm.scheduler import get_llm
 
 # Configure logging
 logging.basicConfig(
@@ -16,11 +12,13 @@ logging.basicConfig(
 
 
 class QAFaissPipeline:
-    def __init__(self, model=None, index=None, metadata=None):
+    def __init__(self, model=None, index=None, metadata=None, adaptive_probe=None):
         self.faiss_agent = FaissAgent()
         self.model = model
         self.index = index
         self.metadata = metadata
+        # Optional AdaptiveProbe; when set, nprobe is chosen per question
+        self.adaptive_probe = adaptive_probe
         logging.info("QAFaissPipeline initialized successfully.")
 
     def retrieve_context(self, user_question: str, top_k: int, nprobe: int):
@@ -32,6 +30,7 @@ class QAFaissPipeline:
             metadata=self.metadata,
             top_k=top_k,
             nprobe=nprobe,
+            adaptive=self.adaptive_probe,
         )
         return context
 
@@ -41,10 +40,12 @@ class QAFaissPipeline:
         top_k: int = 5,
         nprobe: int = 10,
         agent_type: str = "cohere",
-    ) -> str:
-        """Retrieves FAISS context and generates a response."""
+        context=None,
+    ):
+        """Retrieves FAISS context (unless already retrieved) and generates a response."""
         st.write("Step 1: Retrieving relevant context from FAISS index...")
-        context = self.retrieve_context(user_question, top_k, nprobe)
+        if context is None:
+            context = self.retrieve_context(user_question, top_k, nprobe)
 
         if not context:
             logging.warning("No context found.")
@@ -59,44 +60,9 @@ class QAFaissPipeline:
         logging.info("Prompt generated:\n%s", prompt)
         st.write("Step 2: Generating response...")
 
-        response = self.generate_response(agent_type, prompt)
-        return response
+        # Return the answer as a token stream so it can be shown as it is generated
+        return self.stream_response(agent_type, prompt)
 
-    def generate_response(self, agent_type: str, prompt: str) -> str:
-        """Generates a response based on the agent type and prompt."""
-        if agent_type == "cohere":
-            response = cohere.ClientV2(api_key=os.getenv("COHERE_API_KEY")).chat(
-                model="command-r-plus-08-2024",
-                messages=[{"role": "user", "content": prompt}],
-            )
-            return response.message.content[0].text if response.message else None
-        elif agent_type == "llama":
-            payload = {"model": "llama3.2", "prompt": prompt}
-            headers = {"Content-Type": "application/json"}
-            return self._send_request(payload, headers)
-        elif agent_type == "gemini":
-            response = genai.GenerativeModel("gemini-1.5-flash").generate_content(
-                prompt
-            )
-            return response.text if response else None
-        else:
-            raise ValueError(f"Unsupported agent type: {agent_type}")
-
-    def _send_request(self, payload, headers):
-        """Sends a request to the Llama API and processes the streaming response."""
-        response = requests.post(
-            os.getenv("LLAMA_API"), json=payload, headers=headers, stream=True
-        )
-        if response.status_code == 200:
-            query_result = ""
-            for line in response.iter_lines():
-                if line:
-                    try:
-                        line_data = json.loads(line.decode("utf-8"))
-                        query_result += line_data.get("response", "")
-                    except json.JSONDecodeError:
-                        logging.warning("Could not decode line as JSON")
-            return query_result
-        else:
-            logging.error(f"Error: {response.status_code}")
-            return None
+    def stream_response(self, agent_type: str, prompt: str):
+        """Yields the response for the prompt in chunks as the agent generates it."""
+        return get_llm(agent_type).generate_stream(prompt)
@@ -1,27 +1,21 @@
-import json
 import logging
-import os
 
-import cohere
 import faiss
-import google.generativeai as genai
 import numpy as np
-import pandas as pd
-import requests
 import streamlit as st
 from dotenv import load_dotenv
 
-from qa.context_retrieval.retrieval_pipeline import retrieve_and_execute_pipeline
+from qa.context_retrieval.faiss.faiss_agent import FaissAgent
+from qa.context_retrieval.retrieval_pipeline import (
+    is_empty_result,
+    is_query_result,
+    retrieve_and_execute_pipeline,
+)
+from qa.context_retrieval.sql.post_processing.where_parser import parse_filter_query
+from qa.llm.scheduler import get_llm
 
 # Load environment variables
 load_dotenv()
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-COHERE_API_KEY = os.getenv("COHERE_API_KEY")
-LLAMA_API = os.getenv("LLAMA_API")
-
-# Initialize models
-genai.configure(api_key=GEMINI_API_KEY)
-cohere_client = cohere.ClientV2(api_key=COHERE_API_KEY)
 
 # Configure logging
 logging.basicConfig(
@@ -30,28 +24,56 @@ logging.basicConfig(
 
 
 class QAMixPipeline:
-    def __init__(self, model, faiss_index, metadata_by_id):
+    def __init__(
+        self, model, faiss_index, metadata, columnar_filter=None, partitions=None
+    ):
         """
         Initialize QAMixPipeline with model, FAISS index, and metadata.
 
         Args:
         - model: The embedding model (e.g., SentenceTransformer).
         - faiss_index: The FAISS index for similarity search.
-        - metadata_by_id: A dictionary mapping FAISS index entries to metadata.
+        - metadata: The MetadataStore aligned with FAISS index order.
+        - columnar_filter: Optional ColumnarFilter; filters it can evaluate skip SQLite.
+        - partitions: Optional PartitionedIndex; filtered searches then only scan the
+          (year, sentiment) partitions the filter can match.
         """
+        self.faiss_agent = FaissAgent()
         self.model = model
         self.faiss_index = faiss_index
-        self.metadata_by_id = metadata_by_id
+        self.metadata = metadata
+        self.columnar_filter = columnar_filter
+        self.partitions = partitions
         logging.info("QAMixPipeline initialized with model, FAISS index, and metadata.")
 
-    def retrieve_context(self, user_question: str, query_type: str, agent_type: str):
-        """Retrieve context using SQL-based retrieval."""
+    def retrieve_context(
+        self,
+        user_question: str,
+        query_type: str,
+        agent_type: str,
+        initial_query=None,
+        cancelled=None,
+    ):
+        """
+        Retrieve context using SQL-based retrieval, starting from `initial_query` if given.
+
+        Setting the `cancelled` event stops a speculative retrieval before its next
+        LLM call.
+        """
         if query_type != "filtering":
             raise ValueError(
                 "Invalid query_type. Only 'filtering' is accepted in QAMixPipeline."
             )
 
-        return retrieve_and_execute_pipeline(user_question, query_type, agent_type)
+        query_runner = self.columnar_filter.mask if self.columnar_filter else None
+        return retrieve_and_execute_pipeline(
+            user_question,
+            query_type,
+            agent_type,
+            query_runner=query_runner,
+            initial_query=initial_query,
+            cancelled=cancelled,
+        )
 
     def answer_question(
         self,
@@ -59,16 +81,23 @@ class QAMixPipeline:
         query_type: str,
         agent_type: str = "cohere",
         top_k: int = 5,
+        retrieved=None,
+        initial_query=None,
     ):
-        """Retrieves SQL context, filters FAISS embeddings, performs similarity search, and generates a response."""
+        """
+        Retrieves SQL context, filters FAISS embeddings, performs similarity search, and generates a response.
+
+        `retrieved` is an already computed (sql_query, context) from `retrieve_context`;
+        `initial_query` is an already generated SQL query to start retrieval from.
+        """
 
         st.write("Step 1: Retrieving context from database...")
-        sql_query, context = self.retrieve_context(
-            user_question, query_type, agent_type
+        sql_query, context = retrieved or self.retrieve_context(
+            user_question, query_type, agent_type, initial_query
         )
         logging.info(f"Retrieving context for the question using SQL:\n{sql_query}")
 
-        if context is None or (isinstance(context, pd.DataFrame) and context.empty):
+        if context is None or (is_query_result(context) and is_empty_result(context)):
             logging.warning("No context found.")
             st.warning("No context found.")
             return
@@ -82,43 +111,43 @@ class QAMixPipeline:
         )
         faiss.normalize_L2(question_embedding)
 
-        # Filter FAISS indices to only include those in context and retrieve relevant embeddings
+        # Mark the FAISS rows whose review id was returned by the SQL filter;
+        # the columnar filter already returns such a mask
         st.write("Step 3: Filtering relevant entries...")
-        context_ids = set(context["id"])
-        filtered_embeddings = []
-        metadata_map = []
-
-        for faiss_index in range(self.faiss_index.ntotal):
-            metadata_entry = self.metadata_by_id.get(faiss_index)
-            if metadata_entry and metadata_entry["id"] in context_ids:
-                embedding_vector = np.array(metadata_entry["embedding"]).astype(
-                    "float32"
-                )
-                filtered_embeddings.append(embedding_vector)
-                metadata_map.append(metadata_entry)
-
-        if not filtered_embeddings:
+        if isinstance(context, np.ndarray):
+            mask = context
+        else:
+            mask = np.isin(self.metadata.ids, context["id"].to_numpy())
+
+        if not mask.any():
             st.warning("No embeddings found for the retrieved IDs.")
             return
 
         st.write(
             "Step 4: Computing similarities and finding the most relevant contexts..."
         )
-        # Stack embeddings and compute similarity
-        filtered_embeddings = np.vstack(filtered_embeddings)
-        faiss.normalize_L2(filtered_embeddings)
-        similarities = np.dot(filtered_embeddings, question_embedding.T).flatten()
-
-        # Sort by similarity and get top_k results
-        top_indices = np.argsort(similarities)[-top_k:][::-1]
+        condition = self.partition_condition(sql_query)
+        if condition is not None:
+            similarities, top_rows = self.faiss_agent.search_partitioned(
+                question_embedding,
+                self.partitions,
+                condition,
+                mask,
+                top_k,
+                vectors=self.metadata.vectors,
+            )
+        else:
+            similarities, top_rows = self.faiss_agent.search_filtered(
+                question_embedding,
+                self.faiss_index,
+                mask,
+                top_k,
+                vectors=self.metadata.vectors,
+            )
 
         # Format the top_k results into a context string for the prompt
         context_text = ""
-        for idx in top_indices:
-            similarity_score = similarities[idx]
-            metadata_entry = metadata_map[idx]
-            text = metadata_entry.get("text", "Text not found")
-            review_id = metadata_entry.get("id", "ID not found")
+        for text in self.metadata.texts(top_rows):
             context_text += f"Text: {text}\n\n"
 
         st.write("Step 5: Generating final response...")
@@ -127,42 +156,23 @@ class QAMixPipeline:
         logging.info("Prompt generated:\n%s", prompt)
 
         # Generate response using the chosen agent
-        response = self.generate_response(agent_type, prompt)
-        return response
-
-    def generate_response(self, agent_type: str, prompt: str) -> str:
-        """Generates a response based on the agent type and prompt."""
-        if agent_type == "cohere":
-            response = cohere_client.chat(
-                model="command-r-plus-08-2024",
-                messages=[{"role": "user", "content": prompt}],
-            )
-            return response.message.content[0].text if response.message else None
-        elif agent_type == "llama":
-            payload = {"model": "llama3.2", "prompt": prompt}
-            headers = {"Content-Type": "application/json"}
-            return self._send_request(payload, headers)
-        elif agent_type == "gemini":
-            response = genai.GenerativeModel("gemini-1.5-flash").generate_content(
-                prompt
-            )
-            return response.text if response else None
-        else:
-            raise ValueError(f"Unsupported agent type: {agent_type}")
-
-    def _send_request(self, payload, headers):
-        """Sends a request to the Llama API and processes the streaming response."""
-        response = requests.post(LLAMA_API, json=payload, headers=headers, stream=True)
-        if response.status_code == 200:
-            query_result = ""
-            for line in response.iter_lines():
-                if line:
-                    try:
-                        line_data = json.loads(line.decode("utf-8"))
-                        query_result += line_data.get("response", "")
-                    except json.JSONDecodeError:
-                        logging.warning("Could not decode line as JSON")
-            return query_result
-        else:
-            logging.error(f"Error: {response.status_code}")
+        # Return the answer as a token stream so it can be shown as it is generated
+        return self.stream_response(agent_type, prompt)
+
+    def partition_condition(self, sql_query):
+        """
+        Return the parsed WHERE clause of `sql_query` for a partitioned search, or None
+        to search the full index (no partitions, no WHERE clause, or a query the parser
+        does not support).
+        """
+        if self.partitions is None or not sql_query:
+            return None
+        try:
+            return parse_filter_query(sql_query)
+        except ValueError as e:
+            logging.info(f"Searching the full index, filter not parsed: {e}")
             return None
+
+    def stream_response(self, agent_type: str, prompt: str):
+        """Yields the response for the prompt in chunks as the agent generates it."""
+        return get_llm(agent_type).generate_stream(prompt)
@@ -1,20 +1,65 @@
-import json
 import logging
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 
-import cohere
-import google.generativeai as genai
-import requests
 from dotenv import load_dotenv
 
+from qa.cache.semantic_cache import SemanticCache
+from qa.context_retrieval.embedding_service import EmbeddingService
+from qa.context_retrieval.faiss.columnar_filter import ColumnarFilter
+from qa.context_retrieval.faiss.faiss_agent import AdaptiveProbe
+from qa.context_retrieval.faiss.partitioned_index import load_partitions
+from qa.llm.scheduler import get_llm
 from qa.qa_faiss_pipeline import QAFaissPipeline
 from qa.qa_mix_pipeline import QAMixPipeline
 from qa.qa_sql_pipeline import QASQLPipeline
-from qa.router.task_router import post_processing_router, router_question
+from qa.router.local_router import LocalRouter, log_routed_question
+from qa.router.task_router import (
+    post_processing_route_and_query,
+    post_processing_router,
+    router_question,
+    router_sql_question,
+)
 
 # Load environment variables
 load_dotenv()
 
+# Evaluate simple filter queries on in-memory columns instead of SQLite
+USE_COLUMNAR_FILTER = os.getenv("USE_COLUMNAR_FILTER", "true").lower() == "true"
+
+# Centroids trained by scripts/train_local_router.py; questions the local router is
+# less confident about than the threshold go to the LLM router
+ROUTER_MODEL_PATH = os.getenv("ROUTER_MODEL_PATH")
+ROUTER_CONFIDENCE_THRESHOLD = float(os.getenv("ROUTER_CONFIDENCE_THRESHOLD", "0.8"))
+
+# Answers to near-identical questions are reused until the data changes
+USE_SEMANTIC_CACHE = os.getenv("USE_SEMANTIC_CACHE", "true").lower() == "true"
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.95"))
+SEMANTIC_CACHE_TTL = float(os.getenv("SEMANTIC_CACHE_TTL", "3600"))
+SEMANTIC_CACHE_SIZE = int(os.getenv("SEMANTIC_CACHE_SIZE", "512"))
+
+# Start FAISS retrieval (and SQL generation for likely SQL routes) while the
+# question is being classified by the LLM router
+USE_SPECULATIVE_ROUTING = (
+    os.getenv("USE_SPECULATIVE_ROUTING", "false").lower() == "true"
+)
+
+# Ask the LLM router for the SQL query together with the classification, saving
+# the separate SQL generation call on aggregate and filter routes
+USE_COMBINED_ROUTING = os.getenv("USE_COMBINED_ROUTING", "false").lower() == "true"
+
+# Choose nprobe per direct question: widen the IVF search only while unvisited lists
+# could still improve the results, stopping at the target recall or latency budget
+USE_ADAPTIVE_NPROBE = os.getenv("USE_ADAPTIVE_NPROBE", "false").lower() == "true"
+ADAPTIVE_TARGET_RECALL = float(os.getenv("ADAPTIVE_TARGET_RECALL", "0.95"))
+ADAPTIVE_LATENCY_BUDGET_MS = float(os.getenv("ADAPTIVE_LATENCY_BUDGET_MS", "0")) or None
+
+# Search only the (year, sentiment) partitions a filter can match, when the FAISS
+# builder produced them
+USE_PARTITIONED_SEARCH = os.getenv("USE_PARTITIONED_SEARCH", "true").lower() == "true"
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
@@ -24,63 +69,302 @@ logging.basicConfig(
 class RouterPipeline:
     def __init__(self, model, faiss_index, metadata):
         logging.info("Initializing RouterPipeline")
-        self.model = model  # Model passed in from outside
+        # Model passed in from outside, wrapped so every stage of a question
+        # (cache lookup, routing, retrieval) shares one encoding
+        self.model = (
+            model if isinstance(model, EmbeddingService) else EmbeddingService(model)
+        )
         self.faiss_index = faiss_index  # FAISS index passed in from outside
-        self.metadata = metadata
-        self.metadata_by_id = {entry["id"]: entry for entry in metadata}
+        self.metadata = metadata  # MetadataStore aligned with FAISS index order
+        self.columnar_filter = (
+            ColumnarFilter(metadata)
+            if USE_COLUMNAR_FILTER and metadata is not None
+            else None
+        )
+        self.partitions = None
+        if USE_PARTITIONED_SEARCH and faiss_index is not None:
+            self.partitions = load_partitions(
+                os.getenv("FAISS_PATH") or "", faiss_index.ntotal
+            )
+        self.adaptive_probe = None
+        if USE_ADAPTIVE_NPROBE and faiss_index is not None:
+            try:
+                self.adaptive_probe = AdaptiveProbe(
+                    faiss_index,
+                    target_recall=ADAPTIVE_TARGET_RECALL,
+                    latency_budget_ms=ADAPTIVE_LATENCY_BUDGET_MS,
+                )
+            except ValueError as e:
+                logging.warning(f"Adaptive nprobe disabled: {e}")
+        self.local_router = None
+        if ROUTER_MODEL_PATH and os.path.exists(ROUTER_MODEL_PATH):
+            self.local_router = LocalRouter.load(self.model.model, ROUTER_MODEL_PATH)
+            logging.info(f"Local router loaded from {ROUTER_MODEL_PATH}")
+        self.answer_cache = None
+        if USE_SEMANTIC_CACHE:
+            self.answer_cache = SemanticCache(
+                threshold=SEMANTIC_CACHE_THRESHOLD,
+                ttl_seconds=SEMANTIC_CACHE_TTL,
+                max_entries=SEMANTIC_CACHE_SIZE,
+                data_paths=[
+                    os.getenv("SQLITE_PATH"),
+                    os.getenv("FAISS_PATH"),
+                    os.getenv("METADATA_FAISS_PATH"),
+                ],
+            )
         logging.info(
             "RouterPipeline initialized with model, FAISS index, and metadata."
         )
+        self.speculation_stats = {
+            "requests": 0,
+            "used": 0,
+            "discarded": 0,
+            "saved_seconds": 0.0,
+        }
+        self._stats_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(
+            max_workers=4, thread_name_prefix="speculative"
+        )
 
     def classify_user_question(self, user_question, agent_type="llama"):
         """Classifies the user's question and returns the classification."""
-        logging.info("Generating prompt for classification.")
-        prompt = router_question(user_question)
-        logging.info(f"Sending prompt to {agent_type} model for classification.")
+        classification, _ = self.classify_and_generate_query(user_question, agent_type)
+        return classification
 
-        # Generate response based on the agent type
-        if agent_type == "llama":
-            response = self.generate_response_llama(prompt)
-        elif agent_type == "cohere":
-            response = self.generate_response_cohere(prompt)
-        elif agent_type == "gemini":
-            response = self.generate_response_gemini(prompt)
+    def classify_and_generate_query(
+        self, user_question, agent_type="llama", combined=False
+    ):
+        """
+        Classifies the user's question and returns (classification, query).
+
+        With `combined`, a question the local router cannot settle is classified by the
+        combined router prompt, which also returns the SQL query for aggregate and
+        filter questions. `query` is None otherwise, and the pipeline generates it.
+        """
+        start = time.time()
+        if self.local_router is not None:
+            labels, confidences = self.local_router.predict_embeddings(
+                self.model.encode(user_question)
+            )
+            classification, confidence = labels[0], float(confidences[0])
+            elapsed = time.time() - start
+            if confidence >= ROUTER_CONFIDENCE_THRESHOLD:
+                logging.info(
+                    f"Local router classified as {classification} "
+                    f"(confidence {confidence:.2f}) in {elapsed * 1000:.1f} ms"
+                )
+                log_routed_question(
+                    user_question, classification, "local", confidence, elapsed
+                )
+                return classification, None
+            logging.info(
+                f"Local router unsure ({classification}, confidence {confidence:.2f}); "
+                f"asking {agent_type}"
+            )
+
+        query = None
+        if combined:
+            classification, query = self.classify_with_llm_and_query(
+                user_question, agent_type
+            )
         else:
-            logging.error(f"Unsupported agent type: {agent_type}")
-            return None
+            classification = self.classify_with_llm(user_question, agent_type)
+        log_routed_question(
+            user_question, classification, agent_type, elapsed=time.time() - start
+        )
+        return classification, query
+
+    def classify_with_llm(self, user_question, agent_type="llama"):
+        """Classifies the user's question with the router prompt on an LLM."""
+        logging.info("Generating prompt for classification.")
+        response = self._ask_router_llm(router_question(user_question), agent_type)
 
         # Process and return classification
         if response:
             classification = post_processing_router(response)
             logging.info(f"Classification result: {classification}")
             return classification
-        else:
-            logging.error("Failed to get a response from the model")
+        return None
+
+    def classify_with_llm_and_query(self, user_question, agent_type="llama"):
+        """Classifies the question and writes its SQL query in one LLM call."""
+        logging.info("Generating combined prompt for classification and SQL.")
+        response = self._ask_router_llm(router_sql_question(user_question), agent_type)
+
+        if response:
+            classification, query = post_processing_route_and_query(response)
+            logging.info(f"Classification result: {classification}, query: {query}")
+            return classification, query
+        return None, None
+
+    def _ask_router_llm(self, prompt, agent_type):
+        """Sends a router prompt to the agent's LLM; returns None on failure."""
+        logging.info(f"Sending prompt to {agent_type} model for classification.")
+
+        # Generate response based on the agent type
+        try:
+            llm = get_llm(agent_type)
+        except ValueError:
+            logging.error(f"Unsupported agent type: {agent_type}")
             return None
+        response = llm.generate(prompt)
+        if not response:
+            logging.error("Failed to get a response from the model")
+        return response
 
     def route_question(self, question, agent_type):
+        """Answers the question from the semantic cache, or routes it and caches the answer."""
+        if self.answer_cache is None:
+            return self.route_uncached_question(question, agent_type)
+
+        embedding = self.model.encode(question)
+        answer = self.answer_cache.get(question, embedding, agent_type)
+        if answer is not None:
+            logging.info(f"Semantic cache stats: {self.answer_cache.stats}")
+            return answer
+
+        answer = self.route_uncached_question(question, agent_type)
+        if answer is None or isinstance(answer, str):
+            self._cache_answer(question, embedding, agent_type, answer)
+            return answer
+        # Streamed answers are cached once complete; cut-off ones are never cached
+        answer.on_complete(
+            lambda text: self._cache_answer(question, embedding, agent_type, text)
+        )
+        return answer
+
+    def _cache_answer(self, question, embedding, agent_type, answer):
+        """Adds a complete answer to the semantic cache."""
+        self.answer_cache.put(question, embedding, agent_type, answer)
+        logging.info(f"Semantic cache stats: {self.answer_cache.stats}")
+
+    def classify_speculatively(self, question, agent_type):
+        """
+        Classifies the question while retrieval for the likely routes runs alongside.
+
+        The direct route's FAISS search always starts early; SQL generation starts
+        early when the local router leans towards aggregate or filter. Returns
+        (classification, retrieved, query), where `retrieved` is the finished
+        retrieval for the chosen route or None and `query` is the SQL from the
+        combined router prompt, if used. Work for the other routes is discarded:
+        a started SQL retrieval for a wrong guess stops before its next LLM call.
+        """
+        guess = None
+        if self.local_router is not None:
+            labels, confidences = self.local_router.predict_embeddings(
+                self.model.encode(question)
+            )
+            # A confident local router answers in milliseconds; nothing to overlap
+            if float(confidences[0]) >= ROUTER_CONFIDENCE_THRESHOLD:
+                return self.classify_user_question(question, agent_type), None, None
+            # The combined router prompt writes the SQL itself, so only guess without it
+            if not USE_COMBINED_ROUTING:
+                guess = labels[0]
+
+        stages = {
+            "direct": lambda: QAFaissPipeline(
+                self.model, self.faiss_index, self.metadata, self.adaptive_probe
+            ).retrieve_context(question, top_k=5, nprobe=10)
+        }
+        # A running future cannot be cancelled, so the SQL stage also watches this event
+        cancelled = threading.Event()
+        if guess == "aggregate":
+            stages["aggregate"] = lambda: QASQLPipeline().retrieve_context(
+                question, "aggregating", agent_type, cancelled=cancelled
+            )
+        elif guess == "filter":
+            stages["filter"] = lambda: QAMixPipeline(
+                self.model,
+                self.faiss_index,
+                self.metadata,
+                self.columnar_filter,
+                self.partitions,
+            ).retrieve_context(question, "filtering", agent_type, cancelled=cancelled)
+        futures = {
+            route: self._executor.submit(_timed, stage)
+            for route, stage in stages.items()
+        }
+
+        classification, query = self.classify_and_generate_query(
+            question, agent_type, combined=USE_COMBINED_ROUTING
+        )
+        classified_at = time.time()
+        discarded = [route for route in futures if route != classification]
+        if guess in discarded:
+            cancelled.set()
+        for route in discarded:
+            futures[route].cancel()
+        with self._stats_lock:
+            self.speculation_stats["requests"] += 1
+            self.speculation_stats["discarded"] += len(discarded)
+
+        future = futures.get(classification)
+        if future is None:
+            return classification, None, query
+        try:
+            retrieved, started, finished = future.result()
+        except Exception as e:
+            logging.warning(f"Speculative {classification} retrieval failed: {e}")
+            return classification, None, query
+
+        # Run in sequence, the stage would have finished its duration after routing
+        saved = classified_at + (finished - started) - max(finished, classified_at)
+        with self._stats_lock:
+            self.speculation_stats["used"] += 1
+            self.speculation_stats["saved_seconds"] += saved
+        logging.info(
+            f"Speculative {classification} retrieval saved {saved * 1000:.0f} ms; "
+            f"stats: {self.speculation_stats}"
+        )
+        return classification, retrieved, query
+
+    def route_uncached_question(self, question, agent_type):
         """Routes the question to the appropriate pipeline based on the classification."""
-        classification = self.classify_user_question(question, agent_type)
+        retrieved = None
+        if USE_SPECULATIVE_ROUTING:
+            classification, retrieved, query = self.classify_speculatively(
+                question, agent_type
+            )
+        else:
+            classification, query = self.classify_and_generate_query(
+                question, agent_type, combined=USE_COMBINED_ROUTING
+            )
 
         if classification == "aggregate":
             logging.info("Routing to QASQLPipeline for aggregation.")
             pipeline = QASQLPipeline()
             return pipeline.answer_question(
-                question, query_type="aggregating", agent_type=agent_type
+                question,
+                query_type="aggregating",
+                agent_type=agent_type,
+                retrieved=retrieved,
+                initial_query=query,
             )
 
         elif classification == "filter":
             logging.info("Routing to QAMixPipeline for filtering.")
-            pipeline = QAMixPipeline(self.model, self.faiss_index, self.metadata_by_id)
+            pipeline = QAMixPipeline(
+                self.model,
+                self.faiss_index,
+                self.metadata,
+                self.columnar_filter,
+                self.partitions,
+            )
             return pipeline.answer_question(
-                question, query_type="filtering", agent_type=agent_type
+                question,
+                query_type="filtering",
+                agent_type=agent_type,
+                retrieved=retrieved,
+                initial_query=query,
             )
 
         elif classification == "direct":
             logging.info("Routing to QAFaissPipeline for direct answer.")
-            pipeline = QAFaissPipeline(self.model, self.faiss_index, self.metadata)
+            pipeline = QAFaissPipeline(
+                self.model, self.faiss_index, self.metadata, self.adaptive_probe
+            )
             answer = pipeline.answer_question(
-                question, top_k=5, nprobe=10, agent_type=agent_type
+                question, top_k=5, nprobe=10, agent_type=agent_type, context=retrieved
             )
             logging.info("Received answer from QAFaissPipeline.")
             return answer
@@ -89,42 +373,9 @@ class RouterPipeline:
             logging.error("Invalid classification for question.")
             return None
 
-    def generate_response_llama(self, prompt):
-        """Generate a response from the Llama API."""
-        payload = {"model": "llama3.2", "prompt": prompt}
-        headers = {"Content-Type": "application/json"}
-        response = requests.post(
-            os.getenv("LLAMA_API"), json=payload, headers=headers, stream=True
-        )
-        return self._process_response(response)
-
-    def generate_response_cohere(self, prompt):
-        """Generate a response from the Cohere API."""
-        cohere_client = cohere.ClientV2(api_key=os.getenv("COHERE_API_KEY"))
-        response = cohere_client.chat(
-            model="command-r-plus-08-2024",
-            messages=[{"role": "user", "content": prompt}],
-        )
-        return response.message.content[0].text if response.message else None
-
-    def generate_response_gemini(self, prompt):
-        """Generate a response from the Gemini API."""
-        genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
-        response = genai.GenerativeModel("gemini-1.5-flash").generate_content(prompt)
-        return response.text if response else None
-
-    def _process_response(self, response):
-        """Process streaming response from Llama API."""
-        if response.status_code == 200:
-            query_result = ""
-            for line in response.iter_lines():
-                if line:
-                    try:
-                        line_data = json.loads(line.decode("utf-8"))
-                        query_result += line_data.get("response", "")
-                    except json.JSONDecodeError:
-                        logging.warning("Could not decode line as JSON")
-            return query_result
-        else:
-            logging.error(f"Error: {response.status_code}")
-            return None
+
+def _timed(stage):
+    """Runs a stage and returns (result, start time, end time)."""
+    start = time.time()
+    result = stage()
+    return result, start, time.time()
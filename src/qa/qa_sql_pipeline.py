@@ -1,26 +1,15 @@
-import json
 import logging
-import os
 
-import cohere
-import google.generativeai as genai
 import pandas as pd
-import requests
 import streamlit as st
 from dotenv import load_dotenv
 
 from qa.context_retrieval.retrieval_pipeline import retrieve_and_execute_pipeline
+from qa.context_retrieval.sql.post_processing.query_executor import CONTEXT_MAX_BYTES
+from qa.llm.scheduler import get_llm
 
 # Load environment variables
 load_dotenv()
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-COHERE_API_KEY = os.getenv("COHERE_API_KEY")
-LLAMA_API = os.getenv("LLAMA_API")
-
-# Initialize models
-genai.configure(api_key=GEMINI_API_KEY)
-gemini_model = genai.GenerativeModel("gemini-1.5-flash")
-cohere_client = cohere.ClientV2(api_key=COHERE_API_KEY)
 
 # Configure logging
 logging.basicConfig(
@@ -29,35 +18,68 @@ logging.basicConfig(
 
 
 class QASQLPipeline:
-    def retrieve_context(self, user_question: str, query_type: str, agent_type: str):
-        """Retrieve context using SQL-based retrieval."""
+    def retrieve_context(
+        self,
+        user_question: str,
+        query_type: str,
+        agent_type: str,
+        initial_query=None,
+        cancelled=None,
+    ):
+        """
+        Retrieve context using SQL-based retrieval, starting from `initial_query` if given.
+
+        Setting the `cancelled` event stops a speculative retrieval before its next
+        LLM call.
+        """
         if query_type != "aggregating":
             raise ValueError(
                 "Invalid query_type. Only 'aggregating' is accepted in QASQLPipeline."
             )
 
-        return retrieve_and_execute_pipeline(user_question, query_type, agent_type)
+        return retrieve_and_execute_pipeline(
+            user_question,
+            query_type,
+            agent_type,
+            initial_query=initial_query,
+            cancelled=cancelled,
+        )
 
     def answer_question(
-        self, user_question: str, query_type: str, agent_type: str = "cohere"
-    ) -> str:
-        """Retrieves SQL context and generates a response."""
+        self,
+        user_question: str,
+        query_type: str,
+        agent_type: str = "cohere",
+        retrieved=None,
+        initial_query=None,
+    ):
+        """
+        Retrieves SQL context and generates a response.
+
+        `retrieved` is an already computed (sql_query, context) from `retrieve_context`;
+        `initial_query` is an already generated SQL query to start retrieval from.
+        """
         st.write("Step 1: Retrieving context from SQL database...")
         logging.info("Retrieving context for the question using SQL.")
-        sql_query, context = self.retrieve_context(
-            user_question, query_type, agent_type
+        sql_query, context = retrieved or self.retrieve_context(
+            user_question, query_type, agent_type, initial_query
         )
 
         if context is None or (isinstance(context, pd.DataFrame) and context.empty):
             logging.warning("No context found.")
             return None
 
-        # Format context based on type: DataFrame to string if SQL-based
+        # Format context based on type: DataFrame to string if SQL-based.
+        # Results over the budget arrive as a sample with a summary in `attrs`.
         st.write("Step 2: Formatting retrieved context for response generation...")
-        context_text = (
-            context.to_string(index=False)
-            if isinstance(context, pd.DataFrame)
-            else str(context)
+        if isinstance(context, pd.DataFrame):
+            context_text = context.attrs.get("summary") or context.to_string(
+                index=False
+            )
+        else:
+            context_text = str(context)
+        context_text = context_text.encode("utf-8")[:CONTEXT_MAX_BYTES].decode(
+            "utf-8", "ignore"
         )
         logging.info("SQL context retrieved and formatted.")
 
@@ -68,41 +90,9 @@ class QASQLPipeline:
         logging.info("Prompt generated:\n%s", prompt)
 
         st.write("Step 3: Prompt generated. Generating response...")
-        response = self.generate_response(agent_type, prompt)
-        return response
+        # Return the answer as a token stream so it can be shown as it is generated
+        return self.stream_response(agent_type, prompt)
 
-    def generate_response(self, agent_type: str, prompt: str) -> str:
-        """Generates a response based on the agent type and prompt."""
-        if agent_type == "cohere":
-            response = cohere_client.chat(
-                model="command-r-plus-08-2024",
-                messages=[{"role": "user", "content": prompt}],
-            )
-            return response.message.content[0].text if response.message else None
-        elif agent_type == "llama":
-            # Send request to Llama API
-            payload = {"model": "llama3.2", "prompt": prompt}
-            headers = {"Content-Type": "application/json"}
-            return self._send_request(payload, headers)
-        elif agent_type == "gemini":
-            response = gemini_model.generate_content(prompt)
-            return response.text if response else None
-        else:
-            raise ValueError(f"Unsupported agent type: {agent_type}")
-
-    def _send_request(self, payload, headers):
-        """Sends a request to the Llama API and processes the streaming response."""
-        response = requests.post(LLAMA_API, json=payload, headers=headers, stream=True)
-        if response.status_code == 200:
-            query_result = ""
-            for line in response.iter_lines():
-                if line:
-                    try:
-                        line_data = json.loads(line.decode("utf-8"))
-                        query_result += line_data.get("response", "")
-                    except json.JSONDecodeError:
-                        logging.warning("Could not decode line as JSON")
-            return query_result
-        else:
-            logging.error(f"Error: {response.status_code}")
-            return None
+    def stream_response(self, agent_type: str, prompt: str):
+        """Yields the response for the prompt in chunks as the agent generates it."""
+        return get_llm(agent_type).generate_stream(prompt)
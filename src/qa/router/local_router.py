@@ -0,0 +1,127 @@
+import json
+import logging
+import os
+import time
+
+import numpy as np
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Optional JSONL log of routed questions, reusable as training data
+ROUTER_LOG_PATH = os.getenv("ROUTER_LOG_PATH")
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(message)s")
+
+ROUTE_LABELS = ["aggregate", "filter", "direct"]
+
+# Seed questions labeled by hand, one JSON object per line with "question" and "label"
+LABELED_QUESTIONS_PATH = os.path.join(
+    os.path.dirname(__file__), "labeled_questions.jsonl"
+)
+
+# Softmax temperature turning cosine similarities into a confidence
+DEFAULT_TEMPERATURE = 0.05
+
+
+class LocalRouter:
+    """
+    Nearest-centroid question classifier over sentence embeddings.
+
+    Each route label is represented by the normalized mean embedding of its training
+    questions. A question is assigned to the most similar centroid; the softmax of
+    the similarities is its confidence, so callers can fall back to the LLM router
+    for ambiguous questions.
+    """
+
+    def __init__(self, model, labels, centroids, temperature=DEFAULT_TEMPERATURE):
+        self.model = model
+        self.labels = list(labels)
+        self.centroids = np.asarray(centroids, dtype="float32")
+        self.temperature = temperature
+
+    @classmethod
+    def fit(cls, model, questions, labels, temperature=DEFAULT_TEMPERATURE):
+        """Train centroids from labeled questions."""
+        embeddings = encode_questions(model, questions)
+        labels = np.asarray(labels)
+        route_labels = [label for label in ROUTE_LABELS if label in set(labels)]
+        centroids = np.stack(
+            [embeddings[labels == label].mean(axis=0) for label in route_labels]
+        )
+        centroids /= np.linalg.norm(centroids, axis=1, keepdims=True)
+        return cls(model, route_labels, centroids, temperature)
+
+    @classmethod
+    def load(cls, model, path):
+        data = np.load(path)
+        return cls(
+            model,
+            [str(label) for label in data["labels"]],
+            data["centroids"],
+            float(data["temperature"]),
+        )
+
+    def save(self, path):
+        with open(path, "wb") as f:
+            np.savez(
+                f,
+                labels=np.asarray(self.labels),
+                centroids=self.centroids,
+                temperature=self.temperature,
+            )
+
+    def predict_embeddings(self, embeddings):
+        """Return (labels, confidences) for normalized question embeddings."""
+        scores = embeddings @ self.centroids.T / self.temperature
+        scores -= scores.max(axis=1, keepdims=True)
+        probabilities = np.exp(scores)
+        probabilities /= probabilities.sum(axis=1, keepdims=True)
+        best = probabilities.argmax(axis=1)
+        return [self.labels[i] for i in best], probabilities.max(axis=1)
+
+    def predict(self, question):
+        """Return (label, confidence) for one question."""
+        labels, confidences = self.predict_embeddings(
+            encode_questions(self.model, [question])
+        )
+        return labels[0], float(confidences[0])
+
+
+def encode_questions(model, questions):
+    """Embed questions as L2-normalized float32 rows."""
+    embeddings = np.asarray(model.encode(list(questions)), dtype="float32")
+    return embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+
+
+def load_labeled_questions(path=LABELED_QUESTIONS_PATH):
+    """Return (questions, labels) from a JSONL file of labeled questions."""
+    questions, labels = [], []
+    with open(path, "r") as f:
+        for line in f:
+            if line.strip():
+                entry = json.loads(line)
+                questions.append(entry["question"])
+                labels.append(entry["label"])
+    return questions, labels
+
+
+def log_routed_question(question, label, source, confidence=None, elapsed=None):
+    """Append a routing decision to ROUTER_LOG_PATH, if configured."""
+    if not ROUTER_LOG_PATH or label is None:
+        return
+    entry = {
+        "timestamp": time.time(),
+        "question": question,
+        "label": label,
+        "source": source,
+        "confidence": confidence,
+        "elapsed_ms": None if elapsed is None else round(elapsed * 1000, 1),
+    }
+    try:
+        with open(ROUTER_LOG_PATH, "a") as f:
+            f.write(json.dumps(entry) + "\n")
+    except OSError as e:
+        logging.warning(f"Could not write router log: {e}")
@@ -1,6 +1,11 @@
 import logging
 import re
 
+from qa.context_retrieval.sql.post_processing.query_extractor import extract_query
+
+# Filter queries are joined to the FAISS rows by id, so they must keep this shape
+FILTER_QUERY_PATTERN = re.compile(r"^SELECT\s+id\s+FROM\s+user_review\s+WHERE\s", re.I)
+
 
 def router_question(user_question):
     """
@@ -22,6 +27,41 @@ def router_question(user_question):
     return prompt
 
 
+def router_sql_question(user_question):
+    """
+    Creates one prompt that classifies the question and, for "aggregate" and "filter"
+    questions, also asks for the SQL query, saving the separate SQL generation call.
+    """
+    prompt = f"""
+    User question: "{user_question}"
+
+    Table: 'user_review'
+    Columns: id, review_id, pseudo_author_id, author_name, review_text, review_rating, year, month, day, sentiment
+    Example values: 1, 14a011a8-7544-47b4-8480-c502af0ac26f, 152618553977019693742, "Use it every day", 5, 2014, 5, 27, negative
+
+    Step 1: Classify the question as one of the following:
+    - "`aggregate`" if it requires counting or averaging number and begin with "how many" or similar question
+    - "`filter`" if it needs filtering by sentiment or date
+    - "`direct`" if it doesn’t need filtering or aggregation
+
+    Step 2: Write the SQL Lite query for the class:
+    - `aggregate`: the one best simple query that answers the question, using only essential columns and filters. Don't add limit if it is not mentioned in the question.
+    - `filter`: `SELECT id FROM user_review WHERE [conditions]`. Only add conditions in the `WHERE` clause to match the question's intent. Do NOT add new columns, `GROUP BY`, `ORDER BY`, or `LIMIT` statements.
+    - `direct`: no query.
+    Don't use any table or columns outside those mentioned above.
+
+    Give brief explain max 50 words, the final answer inside backtick with only: `aggregate`, `filter`, or `direct`, then the query (strictly inside triple backticks)
+    Format
+    Brief Explanation: ...
+    Final Answer: `...`
+    SQL:
+    ```sql
+    ...
+    ```
+    """
+    return prompt
+
+
 def post_processing_router(response):
     """
     Processes the response from the language model to find the last occurrence of "aggregate," "filter," or "direct"
@@ -29,6 +69,11 @@ def post_processing_router(response):
     """
     # Search for the last occurrence of "aggregate", "filter", or "direct" within backticks at the end of the response
     match = re.search(r"`(aggregate|filter|direct)`\s*$", response.lower())
+    if not match:
+        # Responses to `router_sql_question` continue with the SQL after the label
+        match = re.search(
+            r"final answer:\s*`(aggregate|filter|direct)`", response.lower()
+        )
 
     if match:
         return match.group(
@@ -38,3 +83,21 @@ def post_processing_router(response):
     # If no valid classification term is found, log an error and default to 'direct'
     logging.error("Unexpected response format: defaulting to 'direct'")
     return "direct"  # Default to 'direct' if response is unexpected
+
+
+def post_processing_route_and_query(response):
+    """
+    Processes a response to `router_sql_question` and returns (classification, query).
+
+    The query is None for "direct" questions, and also when it is missing or a filter
+    query does not select ids, so the caller can generate it in a separate call.
+    """
+    classification = post_processing_router(response)
+    if classification == "direct":
+        return classification, None
+
+    query = extract_query(response)
+    if query and classification == "filter" and not FILTER_QUERY_PATTERN.match(query):
+        logging.warning(f"Combined router returned an unusable filter query: {query}")
+        query = None
+    return classification, query
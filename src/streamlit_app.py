@@ -1,4 +1,3 @@
-import json
 import logging
 import os
 
@@ -7,6 +6,9 @@ import streamlit as st
 from dotenv import load_dotenv
 from sentence_transformers import SentenceTransformer
 
+from qa.context_retrieval.faiss.metadata_store import MetadataStore
+from qa.llm.hedging import USE_LLM_HEDGING, hedge_stats
+from qa.llm.scheduler import USE_LLM_SCHEDULER, get_scheduler
 from qa.qa_router_pipeline import RouterPipeline
 
 # Load environment variables
@@ -31,8 +33,7 @@ def load_resources():
     faiss_index = faiss.read_index(FAISS_PATH)
 
     logging.info("Loading metadata...")
-    with open(METADATA_FAISS_PATH, "r") as f:
-        metadata = json.load(f)
+    metadata = MetadataStore(METADATA_FAISS_PATH)
 
     # Initialize RouterPipeline with the loaded components
     router_pipeline = RouterPipeline(model, faiss_index, metadata)
@@ -50,6 +51,15 @@ st.sidebar.image(
 )
 st.sidebar.title("Spotify Bot")
 st.sidebar.write("Ask questions about Spotify's user feedback and insights.")
+if USE_LLM_SCHEDULER:
+    with st.sidebar.expander("LLM provider usage"):
+        st.json(get_scheduler().metrics())
+if USE_LLM_HEDGING:
+    with st.sidebar.expander("Hedged requests"):
+        st.json(hedge_stats)
+if router_pipeline.adaptive_probe is not None:
+    with st.sidebar.expander("Adaptive nprobe"):
+        st.json(router_pipeline.adaptive_probe.stats)
 
 st.title("Spotify Bot Q&A")
 st.write("Enter a question, and the Spotify Bot will find the best answer for you.")
@@ -65,19 +75,30 @@ if "answer" not in st.session_state:
     st.session_state["answer"] = ""
 
 # Process the question when the user clicks the button
+streamed = False
 if st.button("Get Answer"):
     if question.strip():
         logging.info(f"Processing question: '{question}' with agent: {agent_type}")
 
         # Route the question through RouterPipeline
-        st.session_state["answer"] = router_pipeline.route_question(
-            question, agent_type
-        )
+        answer = router_pipeline.route_question(question, agent_type)
+
+        # Generated answers arrive as a token stream; cached ones as text
+        if answer is not None and not isinstance(answer, str):
+            st.write("**Answer:**")
+            stream = answer
+            answer = st.write_stream(stream)
+            streamed = True
+            if stream.error is not None:
+                st.warning(
+                    "The answer was cut off because the model stopped responding."
+                )
+        st.session_state["answer"] = answer
     else:
         st.warning("Please enter a question.")
 
-# Display the answer if it's available
-if st.session_state["answer"]:
+# Display the answer if it's available and was not just streamed
+if st.session_state["answer"] and not streamed:
     st.write("**Answer:**", st.session_state["answer"])
 
 # Button to clear the answer without reloading the page
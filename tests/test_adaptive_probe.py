@@ -0,0 +1,75 @@
+import sys
+import os
+import logging
+import faiss
+import numpy as np
+
+# Add src directory to sys.path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+
+from qa.context_retrieval.faiss.faiss_agent import AdaptiveProbe
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+)
+
+
+def clustered_vectors(rng, centers, n):
+    x = centers[rng.integers(0, len(centers), n)]
+    x = x + rng.standard_normal(x.shape).astype("float32")
+    faiss.normalize_L2(x)
+    return x
+
+
+def build_ivf_flat():
+    """IVF-Flat index over clustered vectors, plus held-out queries."""
+    rng = np.random.default_rng(0)
+    centers = rng.standard_normal((50, 32)).astype("float32")
+    vectors = clustered_vectors(rng, centers, 5000)
+    queries = clustered_vectors(rng, centers, 200)
+    index = faiss.index_factory(32, "IVF64,Flat", faiss.METRIC_INNER_PRODUCT)
+    index.train(vectors)
+    index.add(vectors)
+    faiss.extract_index_ivf(index).make_direct_map()
+    return index, vectors, queries
+
+
+def test_adaptive_probe_meets_target_recall():
+    index, vectors, queries = build_ivf_flat()
+    exact = faiss.IndexFlatIP(vectors.shape[1])
+    exact.add(vectors)
+    _, truth = exact.search(queries, 5)
+
+    for target_recall in (0.9, 0.95):
+        adaptive = AdaptiveProbe(index, target_recall=target_recall, max_nprobe=32)
+        hits, probes = 0, []
+        for query, expected in zip(queries, truth):
+            _, rows, probed = adaptive.search(query.reshape(1, -1), 5)
+            hits += len(np.intersect1d(rows, expected))
+            probes.append(probed)
+        recall = hits / truth.size
+        logging.info(
+            f"Target {target_recall}: recall {recall:.3f}, "
+            f"{np.mean(probes):.1f} lists probed on average"
+        )
+        assert recall >= target_recall
+        assert max(probes) <= 32
+        # Easy queries stop early rather than always probing max_nprobe lists
+        assert np.mean(probes) < 32
+
+
+def test_latency_budget_stops_after_first_lists():
+    index, _, queries = build_ivf_flat()
+    adaptive = AdaptiveProbe(index, latency_budget_ms=1e-6, initial_nprobe=4)
+    for query in queries[:20]:
+        _, rows, probed = adaptive.search(query.reshape(1, -1), 5)
+        assert probed == 4
+        assert len(rows) == 5
+    assert adaptive.stats["over_budget"] == 20
+
+
+if __name__ == "__main__":
+    test_adaptive_probe_meets_target_recall()
+    test_latency_budget_stops_after_first_lists()
+    print("Test completed.")
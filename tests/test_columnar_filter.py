@@ -0,0 +1,88 @@
+import sys
+import os
+import logging
+import sqlite3
+import tempfile
+import numpy as np
+import pandas as pd
+
+# Add src directory to sys.path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+
+from qa.context_retrieval.faiss.columnar_filter import ColumnarFilter
+from qa.context_retrieval.faiss.metadata_store import (
+    MetadataStore,
+    write_metadata_store,
+)
+from qa.databases_creation.sql_lite.db_creation import (
+    USER_REVIEW_COLUMNS,
+    assign_sentiment,
+    create_user_review_table,
+    insert_reviews,
+)
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+)
+
+
+def test_columnar_filter_matches_sqlite():
+    """Masks from the columnar filter select the same reviews as SQLite."""
+    df = pd.DataFrame(
+        {
+            "id": np.arange(0, 600, 3),
+            "pseudo_author_id": "author",
+            "review_id": [f"review_{i}" for i in range(200)],
+            "review_text": "some review text",
+            "review_rating": [[1, 2, 3, 4, 5, None][i % 6] for i in range(200)],
+            "year": [[2022, 2023, None][i % 3] for i in range(200)],
+            "month": [i % 12 + 1 for i in range(200)],
+            "day": [i % 28 + 1 for i in range(200)],
+        }
+    )
+    df["sentiment"] = assign_sentiment(df["review_rating"])
+    df = df[USER_REVIEW_COLUMNS]
+
+    conn = sqlite3.connect(":memory:")
+    create_user_review_table(conn)
+    insert_reviews(conn, df)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # FAISS row order differs from id order
+        shuffled = df.sample(frac=1, random_state=0)
+        write_metadata_store(
+            tmp_dir,
+            shuffled["id"].to_numpy(),
+            shuffled["review_text"].tolist(),
+            np.ones((len(shuffled), 2), dtype="float32"),
+            {
+                c: shuffled[c].to_numpy()
+                for c in ["review_rating", "year", "month", "day"]
+            },
+        )
+        store = MetadataStore(tmp_dir)
+        columnar_filter = ColumnarFilter(store)
+
+        queries = [
+            "SELECT id FROM user_review WHERE sentiment = 'positive'",
+            "SELECT id FROM user_review WHERE year = 2023 AND month BETWEEN 3 AND 6;",
+            "SELECT id FROM user_review WHERE NOT year = 2022 OR review_rating IS NULL",
+            "SELECT id FROM user_review WHERE review_rating NOT IN (1, 2) AND (sentiment <> 'neutral' OR day >= 15)",
+        ]
+        for query in queries:
+            expected = np.isin(store.ids, pd.read_sql_query(query, conn)["id"])
+            assert (columnar_filter.mask(query) == expected).all(), query
+
+        # Anything outside the supported subset falls back to SQLite
+        assert (
+            columnar_filter.mask(
+                "SELECT id FROM user_review WHERE review_text LIKE '%ads%'"
+            )
+            is None
+        )
+
+
+if __name__ == "__main__":
+    test_columnar_filter_matches_sqlite()
+    print("Test completed.")
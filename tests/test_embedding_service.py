@@ -0,0 +1,145 @@
+import sys
+import os
+import logging
+import threading
+import time
+import numpy as np
+
+# Add src directory to sys.path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+
+from qa.context_retrieval.embedding_service import EmbeddingService
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+)
+
+
+class CountingModel:
+    """Records every batch it encodes; the first batch can be held until released."""
+
+    def __init__(self, hold_first=False):
+        self.batches = []
+        self.started = threading.Event()
+        self.release = threading.Event()
+        if not hold_first:
+            self.release.set()
+
+    def encode(self, texts):
+        self.batches.append(list(texts))
+        if len(self.batches) == 1:
+            self.started.set()
+            self.release.wait(5)
+        return np.array([[len(text), 1.0, 0.0] for text in texts])
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.time() + timeout
+    while not condition():
+        assert time.time() < deadline, "timed out"
+        time.sleep(0.005)
+
+
+def test_cache_hits_and_normalization():
+    model = CountingModel()
+    service = EmbeddingService(model, batch_window_ms=10_000)
+    start = time.time()
+    first = service.encode("great app")
+    # A lone miss is encoded at once rather than waiting out the batch window
+    assert time.time() - start < 1
+    second = service.encode("great app")
+    np.testing.assert_allclose(first, second)
+    assert first.shape == (1, 3) and first.dtype == np.float32
+    assert abs(np.linalg.norm(first) - 1) < 1e-6
+    assert model.batches == [["great app"]]
+    assert service.stats["hits"] == 1 and service.stats["misses"] == 1
+
+    # Callers get copies, so changing one leaves the cached vector alone
+    first[0, 0] = 0
+    assert service.encode("great app")[0, 0] != 0
+
+
+def test_zero_vector_is_not_divided_by_zero():
+    model = CountingModel()
+    model.encode = lambda texts: np.zeros((len(texts), 3))
+    vector = EmbeddingService(model).encode("")
+    assert np.all(vector == 0)
+
+
+def test_lru_eviction():
+    model = CountingModel()
+    service = EmbeddingService(model, max_entries=2)
+    service.encode("a")
+    service.encode("b")
+    service.encode("a")  # "b" is now least recently used
+    service.encode("c")
+    service.encode("a")
+    assert len(model.batches) == 3
+    service.encode("b")
+    assert model.batches[-1] == ["b"]
+    assert service.stats == {"hits": 2, "misses": 4, "batches": 4, "encoded": 4}
+
+
+def test_concurrent_callers_share_encodes():
+    model = CountingModel(hold_first=True)
+    service = EmbeddingService(model, batch_window_ms=200)
+    results = {}
+
+    def encode(name, text):
+        results[name] = service.encode(text)
+
+    first = threading.Thread(target=encode, args=("first", "slow question"))
+    first.start()
+    assert model.started.wait(5)
+
+    # Callers asking for the text being encoded wait for it; new texts queue up
+    threads = [
+        threading.Thread(target=encode, args=(name, text))
+        for name, text in [
+            ("same_1", "slow question"),
+            ("same_2", "slow question"),
+            ("other_1", "next question"),
+            ("other_2", "another question"),
+        ]
+    ]
+    for thread in threads:
+        thread.start()
+    wait_for(lambda: service.stats["misses"] == 5)
+    model.release.set()
+    for thread in [first] + threads:
+        thread.join(5)
+
+    assert model.batches[0] == ["slow question"]
+    assert sorted(model.batches[1]) == ["another question", "next question"]
+    assert len(model.batches) == 2
+    np.testing.assert_allclose(results["same_1"], results["first"])
+    np.testing.assert_allclose(results["same_2"], results["first"])
+    assert service.stats["encoded"] == 3
+
+
+def test_encode_errors_reach_every_waiter():
+    model = CountingModel()
+
+    def fail(texts):
+        raise RuntimeError("model crashed")
+
+    model.encode = fail
+    service = EmbeddingService(model)
+    for _ in range(2):
+        try:
+            service.encode("question")
+            raise AssertionError("expected RuntimeError")
+        except RuntimeError:
+            pass
+    # A failed encode is not left in flight for later callers
+    assert service.stats["misses"] == 2
+
+
+if __name__ == "__main__":
+    test_cache_hits_and_normalization()
+    test_zero_vector_is_not_divided_by_zero()
+    test_lru_eviction()
+    test_concurrent_callers_share_encodes()
+    test_encode_errors_reach_every_waiter()
+    print("Test completed.")
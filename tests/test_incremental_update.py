@@ -0,0 +1,226 @@
+import sys
+import os
+import logging
+import hashlib
+import sqlite3
+import tempfile
+import faiss
+import numpy as np
+import pandas as pd
+
+# Add src directory to sys.path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+
+from qa.context_retrieval.faiss.metadata_store import MetadataStore
+from qa.context_retrieval.faiss.partitioned_index import (
+    load_partitions,
+    partition_keys,
+)
+from qa.databases_creation.faiss.db_creation import (
+    create_partitioned_faiss_index_and_save_metadata,
+    index_reduction,
+    load_review_attributes,
+)
+from qa.databases_creation.faiss.embedding_ingest import (
+    load_embedding_shards,
+    write_shard,
+)
+from qa.databases_creation.incremental_update import (
+    index_new_reviews,
+    insert_new_reviews,
+)
+from qa.databases_creation.sql_lite.db_creation import build_database
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+)
+
+DIM = 32
+
+
+class HashEncoder:
+    """Deterministic stand-in for the sentence encoder: one random vector per text."""
+
+    def encode(self, texts):
+        vectors = []
+        for text in texts:
+            seed = int(hashlib.sha256(text.encode("utf-8")).hexdigest()[:8], 16)
+            vectors.append(np.random.default_rng(seed).standard_normal(DIM))
+        return np.asarray(vectors, dtype="float32")
+
+    def close(self):
+        pass
+
+
+def write_reviews_csv(path, first, count, year="2022"):
+    rng = np.random.default_rng(first)
+    pd.DataFrame(
+        {
+            "pseudo_author_id": [f"author_{i}" for i in range(first, first + count)],
+            "review_id": [f"review_{i}" for i in range(first, first + count)],
+            "review_text": [
+                f"review number {i} says the app is fine but could be much better"
+                for i in range(first, first + count)
+            ],
+            "review_rating": rng.integers(1, 6, count),
+            "review_timestamp": [
+                f"{year if i % 5 else 2020 + i % 3}-0{1 + i % 9}-1{i % 10} 10:00:00"
+                for i in range(first, first + count)
+            ],
+        }
+    ).to_csv(path, index=False)
+
+
+def check_incremental_update(reduce_dim):
+    """Appending reviews keeps FAISS rows, metadata rows and partitions aligned."""
+    encoder = HashEncoder()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        database_path = os.path.join(tmp_dir, "reviews.db")
+        index_path = os.path.join(tmp_dir, "reviews.faiss")
+        metadata_path = os.path.join(tmp_dir, "metadata")
+        shard_dir = os.path.join(tmp_dir, "shards")
+        os.makedirs(shard_dir)
+
+        # Initial build: SQLite, one embedding shard, then the index and metadata
+        write_reviews_csv(os.path.join(tmp_dir, "initial.csv"), 0, 400)
+        build_database(os.path.join(tmp_dir, "initial.csv"), database_path)
+        conn = sqlite3.connect(database_path)
+        ids = [row[0] for row in conn.execute("SELECT id FROM user_review ORDER BY id")]
+        conn.close()
+        df = load_review_attributes(database_path, ids)
+        write_shard(shard_dir, 0, np.array(ids), encoder.encode(df["text"].tolist()))
+        _, embeddings = load_embedding_shards(shard_dir)
+        create_partitioned_faiss_index_and_save_metadata(
+            embeddings,
+            df,
+            index_path,
+            metadata_path,
+            nlist=8,
+            index_type="ivf_flat",
+            reduce_dim=reduce_dim,
+            build_partitions=True,
+        )
+
+        # New batch: 50 reviews already ingested, 150 new ones from a new year
+        write_reviews_csv(os.path.join(tmp_dir, "batch.csv"), 350, 200, year="2026")
+        assert (
+            insert_new_reviews(database_path, os.path.join(tmp_dir, "batch.csv")) == 150
+        )
+        conn = sqlite3.connect(database_path)
+        rows = conn.execute(
+            "SELECT id, review_id, review_text FROM user_review ORDER BY id"
+        ).fetchall()
+        conn.close()
+        assert [row[0] for row in rows] == list(range(550))
+        assert len({row[1] for row in rows}) == 550
+
+        index_new_reviews(
+            database_path,
+            index_path,
+            metadata_path,
+            None,
+            shard_dir,
+            max_imbalance_growth=100,
+            max_size_growth=100,
+            encoder=encoder,
+        )
+
+        index = faiss.read_index(index_path)
+        store = MetadataStore(metadata_path)
+        assert index.ntotal == len(store) == 550
+
+        # Metadata row i describes SQLite review i, and holds its vector as indexed
+        assert store.ids.tolist() == [row[0] for row in rows]
+        assert store.texts(range(550)) == [row[2] for row in rows]
+        expected = encoder.encode([row[2] for row in rows])
+        faiss.normalize_L2(expected)
+        transform = index_reduction(index)
+        assert (transform is not None) == (reduce_dim is not None)
+        if transform is not None:
+            expected = transform.apply(expected)
+        np.testing.assert_allclose(store.vectors, expected, atol=1e-5)
+
+        # FAISS row i holds metadata row i's vector
+        ivf = faiss.extract_index_ivf(index)
+        ivf.make_direct_map()
+        np.testing.assert_allclose(
+            ivf.reconstruct_n(0, ivf.ntotal), store.vectors, atol=1e-5
+        )
+
+        # Every row is in exactly one partition, the one for its year and sentiment
+        partitions = load_partitions(index_path, index.ntotal)
+        assert partitions is not None
+        keys = partition_keys(store.year, store.review_rating)
+        seen = []
+        for partition in partitions.partitions:
+            id_map = partition["index"]
+            partition_rows = faiss.vector_to_array(id_map.id_map)
+            assert all(
+                keys[row] == (partition["year"], partition["sentiment"])
+                for row in partition_rows
+            )
+            vectors = faiss.downcast_index(id_map.index).reconstruct_n(0, id_map.ntotal)
+            np.testing.assert_allclose(
+                vectors, store.vectors[partition_rows], atol=1e-5
+            )
+            seen.extend(partition_rows.tolist())
+        assert sorted(seen) == list(range(550))
+        assert any(partition["year"] == 2026 for partition in partitions.partitions)
+
+
+def test_insert_new_reviews_in_chunks():
+    """Chunks are checked against earlier chunks as well as the existing table."""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        database_path = os.path.join(tmp_dir, "reviews.db")
+        write_reviews_csv(os.path.join(tmp_dir, "initial.csv"), 0, 100)
+        build_database(os.path.join(tmp_dir, "initial.csv"), database_path)
+
+        # 20 known reviews, 60 new ones, and the new ones repeated at the end
+        write_reviews_csv(os.path.join(tmp_dir, "batch.csv"), 80, 80)
+        batch = pd.read_csv(os.path.join(tmp_dir, "batch.csv"))
+        pd.concat([batch, batch.iloc[20:]]).to_csv(
+            os.path.join(tmp_dir, "batch.csv"), index=False
+        )
+        inserted = insert_new_reviews(
+            database_path, os.path.join(tmp_dir, "batch.csv"), chunksize=7
+        )
+        assert inserted == 60
+
+        conn = sqlite3.connect(database_path)
+        rows = conn.execute(
+            "SELECT id, review_id FROM user_review ORDER BY id"
+        ).fetchall()
+        rollup_total = conn.execute(
+            "SELECT SUM(review_count) FROM user_review_rollup"
+        ).fetchone()[0]
+        conn.close()
+        assert [row[0] for row in rows] == list(range(160))
+        assert [row[1] for row in rows[100:]] == [
+            f"review_{i}" for i in range(100, 160)
+        ]
+        assert rollup_total == 160
+
+
+def test_missing_shard_dir_is_rejected():
+    try:
+        index_new_reviews("reviews.db", "reviews.faiss", "metadata", None, None)
+        raise AssertionError("expected ValueError")
+    except ValueError as e:
+        assert "EMBEDDING_VECTOR_PATH" in str(e)
+
+
+def test_incremental_update():
+    check_incremental_update(reduce_dim=None)
+
+
+def test_incremental_update_reduced():
+    check_incremental_update(reduce_dim=16)
+
+
+if __name__ == "__main__":
+    test_insert_new_reviews_in_chunks()
+    test_missing_shard_dir_is_rejected()
+    test_incremental_update()
+    test_incremental_update_reduced()
+    print("Test completed.")
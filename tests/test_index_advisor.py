@@ -0,0 +1,114 @@
+import sys
+import os
+import io
+import json
+import logging
+import sqlite3
+import tempfile
+from contextlib import redirect_stdout
+
+# Add src directory to sys.path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+
+from qa.databases_creation.sql_lite.db_creation import (
+    create_user_review_indexes,
+    create_user_review_table,
+)
+from qa.databases_creation.sql_lite.index_advisor import (
+    advise,
+    filtered_columns,
+    print_report,
+)
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+)
+
+INDEXED_QUERY = (
+    "SELECT COUNT(*) FROM user_review WHERE sentiment = 'negative' AND year = 2023"
+)
+SCAN_QUERY = "SELECT id FROM user_review WHERE review_text LIKE '%crash%' AND day = 3"
+COVERED_QUERY = "SELECT AVG(review_rating) FROM user_review"
+UNFILTERED_QUERY = "SELECT review_text FROM user_review"
+BROKEN_QUERY = "SELECT id FROM user_reviews WHERE year = 2023"
+
+
+def indexed_database(directory):
+    path = os.path.join(directory, "reviews.db")
+    conn = sqlite3.connect(path)
+    create_user_review_table(conn)
+    create_user_review_indexes(conn)
+    conn.commit()
+    conn.close()
+    return path
+
+
+def write_query_log(directory, queries):
+    path = os.path.join(directory, "queries.jsonl")
+    with open(path, "w") as f:
+        for query in queries:
+            f.write(json.dumps({"query_type": "filtering", "query": query}) + "\n")
+        f.write("not json\n")
+    return path
+
+
+def test_advisor_reports_full_scans():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        database_path = indexed_database(tmp_dir)
+        log_path = write_query_log(
+            tmp_dir,
+            [
+                INDEXED_QUERY,
+                SCAN_QUERY,
+                # The same query with other whitespace counts as a repeat
+                SCAN_QUERY.replace(" AND ", "\n   AND "),
+                COVERED_QUERY,
+                UNFILTERED_QUERY,
+                BROKEN_QUERY,
+            ],
+        )
+        report = advise(database_path, log_path)
+
+    assert report["queries"] == 5
+    assert [entry["query"] for entry in report["errors"]] == [BROKEN_QUERY]
+
+    scans = {entry["query"]: entry for entry in report["full_scans"]}
+    # The composite sentiment index serves the indexed query
+    assert INDEXED_QUERY not in scans
+    # Scanning a covering index reads the index, not the table
+    assert COVERED_QUERY not in scans
+    assert scans[SCAN_QUERY]["times_seen"] == 2
+    assert scans[SCAN_QUERY]["filtered_columns"] == ["day"]
+    assert any("SCAN" in detail for detail in scans[SCAN_QUERY]["plan"])
+    assert scans[UNFILTERED_QUERY]["filtered_columns"] == []
+
+    output = io.StringIO()
+    with redirect_stdout(output):
+        print_report(report)
+    printed = output.getvalue()
+    assert (
+        "5 distinct queries replayed, 2 still scan user_review, 1 failed to plan"
+        in printed
+    )
+    assert "candidate index: (day)" in printed
+    assert printed.split("Most frequent unindexed filters:")[1].split() == [
+        "(day):",
+        "2",
+        "queries",
+    ]
+
+
+def test_filtered_columns_ignore_literals():
+    query = (
+        "SELECT id FROM user_review WHERE review_text LIKE '%year of sentiment%' "
+        "AND review_rating <= 2 AND month IN (1, 2)"
+    )
+    assert filtered_columns(query) == ["review_rating", "month"]
+    assert filtered_columns("SELECT COUNT(*) FROM user_review") == []
+
+
+if __name__ == "__main__":
+    test_advisor_reports_full_scans()
+    test_filtered_columns_ignore_literals()
+    print("Test completed.")
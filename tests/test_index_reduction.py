@@ -0,0 +1,55 @@
+import sys
+import os
+import logging
+import faiss
+import numpy as np
+
+# Add src directory to sys.path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+
+from qa.databases_creation.faiss.db_creation import build_index, index_reduction
+from qa.databases_creation.faiss.index_benchmark import benchmark_index
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+)
+
+
+def synthetic_embeddings(n=10000, d=384, intrinsic_dim=48, seed=0):
+    """Normalized vectors with a common offset and most variance in a few directions."""
+    rng = np.random.default_rng(seed)
+    latent = rng.standard_normal((n, intrinsic_dim)).astype("float32")
+    projection = rng.standard_normal((intrinsic_dim, d)).astype("float32")
+    offset = 2.0 * rng.standard_normal(d).astype("float32")
+    embeddings = latent @ projection + offset
+    embeddings += 0.3 * rng.standard_normal((n, d)).astype("float32")
+    embeddings = np.ascontiguousarray(embeddings, dtype="float32")
+    faiss.normalize_L2(embeddings)
+    return embeddings
+
+
+def recall_by_nprobe(index, embeddings):
+    report = benchmark_index(index, embeddings, k=10, n_queries=200)
+    return {search["nprobe"]: search["recall_at_k"] for search in report["searches"]}
+
+
+def test_pca_reduction_keeps_recall():
+    """A 384 -> 128 PCA index loses little recall against the full-dimension one."""
+    embeddings = synthetic_embeddings()
+    full = build_index(embeddings, "ivf_flat", nlist=64)
+    reduced = build_index(embeddings, "ivf_flat", nlist=64, reduce_dim=128)
+    assert index_reduction(reduced).d_out == 128
+
+    full_recall = recall_by_nprobe(full, embeddings)
+    reduced_recall = recall_by_nprobe(reduced, embeddings)
+    logging.info(f"Recall@10 full: {full_recall}, reduced: {reduced_recall}")
+    for nprobe, recall in full_recall.items():
+        assert reduced_recall[nprobe] >= recall - 0.02, nprobe
+    # Ground truth is exact full-dimension search, so this is the reduction's loss
+    assert reduced_recall[64] >= 0.98
+
+
+if __name__ == "__main__":
+    test_pca_reduction_keeps_recall()
+    print("Test completed.")
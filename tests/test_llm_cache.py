@@ -0,0 +1,55 @@
+import sys
+import os
+import logging
+import tempfile
+import time
+
+# Add src directory to sys.path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+
+from qa.llm.cache import LLMResponseCache
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+)
+
+
+def test_ttl_expiry():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        cache = LLMResponseCache(os.path.join(tmp_dir, "llm.db"), ttl_seconds=0.2)
+        cache.put("cohere", "command", "prompt", "response")
+        assert cache.get("cohere", "command", "prompt") == "response"
+        # Keys include provider and model
+        assert cache.get("gemini", "command", "prompt") is None
+        assert cache.get("cohere", "other", "prompt") is None
+
+        time.sleep(0.3)
+        assert cache.get("cohere", "command", "prompt") is None
+        count = cache._conn.execute("SELECT COUNT(*) FROM llm_response").fetchone()
+        assert count[0] == 0
+        cache.close()
+
+
+def test_size_bounded_eviction():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        cache = LLMResponseCache(os.path.join(tmp_dir, "llm.db"), max_bytes=250)
+        for prompt in ("a", "b"):
+            cache.put("cohere", "command", prompt, "x" * 100)
+            time.sleep(0.01)
+        # Reading "a" makes "b" the least recently used response
+        assert cache.get("cohere", "command", "a") is not None
+        time.sleep(0.01)
+        cache.put("cohere", "command", "c", "x" * 100)
+
+        assert cache.stats["evictions"] == 1
+        assert cache.get("cohere", "command", "b") is None
+        assert cache.get("cohere", "command", "a") is not None
+        assert cache.get("cohere", "command", "c") is not None
+        cache.close()
+
+
+if __name__ == "__main__":
+    test_ttl_expiry()
+    test_size_bounded_eviction()
+    print("Test completed.")
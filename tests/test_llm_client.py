@@ -0,0 +1,221 @@
+import sys
+import os
+import json
+import logging
+from email.utils import format_datetime
+from datetime import datetime, timedelta, timezone
+from unittest import mock
+
+import requests
+
+# Add src directory to sys.path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+
+from qa.llm.client import AnswerStream, LLMClient, LLMError, retry_after_seconds
+from qa.llm.providers import GeminiProvider, OllamaProvider
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+)
+
+
+class FakeResponse:
+    def __init__(self, status_code=200, body=None, headers=None, lines=None):
+        self.status_code = status_code
+        self.body = body or {}
+        self.headers = headers or {}
+        self.text = json.dumps(self.body)
+        self.lines = lines or []
+        self.closed = False
+
+    def json(self):
+        return self.body
+
+    def iter_lines(self):
+        for line in self.lines:
+            if isinstance(line, Exception):
+                raise line
+            yield line
+
+    def close(self):
+        self.closed = True
+
+
+class FakeSession:
+    """Returns (or raises) the scripted outcomes in order and records each call."""
+
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = []
+
+    def post(self, url, **kwargs):
+        self.calls.append(kwargs)
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+
+def make_client(provider, *outcomes, max_retries=2):
+    client = LLMClient(provider, timeout=7, max_retries=max_retries, backoff=1.0)
+    client.session = FakeSession(*outcomes)
+    return client
+
+
+def ollama(text):
+    return FakeResponse(body={"response": text})
+
+
+def test_retries_with_backoff_and_retry_after():
+    client = make_client(
+        OllamaProvider("http://llama"),
+        FakeResponse(503),
+        FakeResponse(429, headers={"Retry-After": "4"}),
+        ollama("answer"),
+    )
+    with mock.patch("qa.llm.client.time.sleep") as sleep:
+        assert client.complete("prompt") == "answer"
+    # Exponential backoff first, then the server's Retry-After
+    assert [call.args[0] for call in sleep.call_args_list] == [1.0, 4.0]
+    assert all(
+        call["timeout"] == (client.timeout[0], 7) for call in client.session.calls
+    )
+
+
+def test_retry_after_http_date():
+    later = datetime.now(timezone.utc) + timedelta(seconds=30)
+    assert 25 <= retry_after_seconds(format_datetime(later, usegmt=True)) <= 30
+    assert retry_after_seconds("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
+    assert retry_after_seconds("soon") is None
+
+    client = make_client(
+        OllamaProvider("http://llama"),
+        FakeResponse(429, headers={"Retry-After": "soon"}),
+        ollama("answer"),
+    )
+    with mock.patch("qa.llm.client.time.sleep") as sleep:
+        assert client.complete("prompt") == "answer"
+    # An unreadable header falls back to the backoff instead of raising
+    sleep.assert_called_once_with(1.0)
+
+
+def test_timeouts_are_retried_then_raised():
+    client = make_client(
+        OllamaProvider("http://llama"),
+        requests.Timeout("read timed out"),
+        requests.Timeout("read timed out"),
+        requests.Timeout("read timed out"),
+    )
+    with mock.patch("qa.llm.client.time.sleep") as sleep:
+        try:
+            client.complete("prompt")
+            raise AssertionError("expected LLMError")
+        except LLMError as e:
+            assert e.status is None
+    assert len(client.session.calls) == 3
+    assert [call.args[0] for call in sleep.call_args_list] == [1.0, 2.0]
+
+
+def test_client_errors_are_not_retried():
+    client = make_client(OllamaProvider("http://llama"), FakeResponse(400))
+    try:
+        client.complete("prompt")
+        raise AssertionError("expected LLMError")
+    except LLMError as e:
+        assert e.status == 400
+    assert len(client.session.calls) == 1
+
+    # `generate` logs the same error and returns None
+    client = make_client(OllamaProvider("http://llama"), FakeResponse(404))
+    assert client.generate("prompt") is None
+
+
+def test_blocked_gemini_prompt_raises_llm_error():
+    blocked = {"candidates": [], "promptFeedback": {"blockReason": "SAFETY"}}
+    client = make_client(GeminiProvider("key"), FakeResponse(body=blocked))
+    try:
+        client.complete("prompt")
+        raise AssertionError("expected LLMError")
+    except LLMError as e:
+        assert "SAFETY" in str(e)
+
+    event = b"data: " + json.dumps(blocked).encode("utf-8")
+    client = make_client(GeminiProvider("key"), FakeResponse(lines=[event]))
+    try:
+        list(client.stream("prompt"))
+        raise AssertionError("expected LLMError")
+    except LLMError as e:
+        assert "SAFETY" in str(e)
+
+
+def test_stream_failure_midway_raises_llm_error():
+    lines = [
+        json.dumps({"response": "partial"}).encode("utf-8"),
+        requests.ConnectionError("connection reset"),
+    ]
+    client = make_client(OllamaProvider("http://llama"), FakeResponse(lines=lines))
+    chunks = []
+    try:
+        for chunk in client.stream("prompt"):
+            chunks.append(chunk)
+        raise AssertionError("expected LLMError")
+    except LLMError:
+        pass
+    assert chunks == ["partial"]
+
+
+def test_answer_stream_completes_with_full_text():
+    answer = AnswerStream(iter(["The app ", "crashes ", "on start."]))
+    completed = []
+    answer.on_complete(completed.append)
+    answer.on_complete(lambda text: completed.append(len(text)))
+    assert not answer.completed
+
+    assert list(answer) == ["The app ", "crashes ", "on start."]
+    assert answer.completed and answer.error is None
+    assert completed == ["The app crashes on start.", 25]
+
+
+def test_answer_stream_ends_quietly_on_provider_error():
+    lines = [
+        json.dumps({"response": "partial"}).encode("utf-8"),
+        requests.ConnectionError("connection reset"),
+    ]
+    client = make_client(OllamaProvider("http://llama"), FakeResponse(lines=lines))
+    answer = AnswerStream(client.stream("prompt"))
+    completed = []
+    answer.on_complete(completed.append)
+
+    assert list(answer) == ["partial"]
+    assert isinstance(answer.error, LLMError)
+    # A cut-off answer is never reported as complete
+    assert not answer.completed
+    assert answer.text == "partial"
+    assert completed == []
+
+
+def test_partially_consumed_answer_stream_is_not_complete():
+    answer = AnswerStream(iter(["first", "second"]))
+    completed = []
+    answer.on_complete(completed.append)
+
+    for chunk in answer:
+        break
+    assert chunk == "first"
+    assert answer.text == "first"
+    assert not answer.completed and answer.error is None
+    assert completed == []
+
+
+if __name__ == "__main__":
+    test_retries_with_backoff_and_retry_after()
+    test_retry_after_http_date()
+    test_timeouts_are_retried_then_raised()
+    test_client_errors_are_not_retried()
+    test_blocked_gemini_prompt_raises_llm_error()
+    test_stream_failure_midway_raises_llm_error()
+    test_answer_stream_completes_with_full_text()
+    test_answer_stream_ends_quietly_on_provider_error()
+    test_partially_consumed_answer_stream_is_not_complete()
+    print("Test completed.")
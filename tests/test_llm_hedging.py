@@ -0,0 +1,131 @@
+import sys
+import os
+import logging
+import time
+
+# Add src directory to sys.path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+
+from qa.llm.client import LLMError
+from qa.llm.hedging import HedgedClient, HedgePool, LatencyTracker
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+)
+
+
+class FixedDeadline(LatencyTracker):
+    def __init__(self, seconds):
+        super().__init__()
+        self.seconds = seconds
+
+    def deadline(self, name, **kwargs):
+        return self.seconds
+
+
+class FakeClient:
+    """Streams `chunks` after `delay` seconds, one every `gap` seconds, or fails."""
+
+    def __init__(self, name, chunks=("answer",), delay=0.0, gap=0.0, fail=False):
+        self.name = name
+        self.model = "model"
+        self.chunks = chunks
+        self.delay = delay
+        self.gap = gap
+        self.fail = fail
+        self.calls = 0
+        self.pulled = 0
+        self.closed = False
+
+    def complete(self, prompt):
+        return "".join(self.stream(prompt))
+
+    def stream(self, prompt):
+        self.calls += 1
+        try:
+            time.sleep(self.delay)
+            if self.fail:
+                raise LLMError(f"{self.name} failed")
+            for i, chunk in enumerate(self.chunks):
+                if i:
+                    time.sleep(self.gap)
+                self.pulled += 1
+                yield chunk
+        finally:
+            self.closed = True
+
+
+def hedged(primary, backup, deadline=0.2, validator=None, workers=4):
+    return HedgedClient(
+        primary,
+        backup,
+        validator,
+        tracker=FixedDeadline(deadline),
+        pool=HedgePool(workers),
+    )
+
+
+def test_primary_wins_before_deadline():
+    primary, backup = FakeClient("gemini", ["primary"]), FakeClient("cohere")
+    assert hedged(primary, backup).complete("q") == "primary"
+    assert backup.calls == 0
+
+
+def test_backup_wins_and_loser_is_cancelled():
+    primary = FakeClient("gemini", ["slow"] * 10, delay=0.5, gap=0.1)
+    backup = FakeClient("cohere", ["backup"])
+    start = time.monotonic()
+    assert hedged(primary, backup).complete("q") == "backup"
+    assert time.monotonic() - start < 0.5
+
+    # The primary is dropped at its first chunk instead of being read to the end
+    time.sleep(0.8)
+    assert primary.pulled == 1
+    assert primary.closed
+
+
+def test_invalid_fast_answer_is_rejected():
+    primary = FakeClient("gemini", ["no query here"])
+    backup = FakeClient("cohere", ["SELECT id FROM user_review"], delay=0.1)
+    client = hedged(primary, backup, validator=lambda text: "SELECT" in text)
+    assert client.complete("q") == "SELECT id FROM user_review"
+
+
+def test_both_failing_raises():
+    primary = FakeClient("gemini", fail=True)
+    backup = FakeClient("cohere", fail=True)
+    try:
+        hedged(primary, backup).complete("q")
+        raise AssertionError("expected LLMError")
+    except LLMError:
+        pass
+    assert primary.calls == 1 and backup.calls == 1
+
+
+def test_busy_pool_skips_the_hedge():
+    primary = FakeClient("gemini", ["primary"], delay=0.4)
+    backup = FakeClient("cohere")
+    assert hedged(primary, backup, workers=1).complete("q") == "primary"
+    assert backup.calls == 0
+
+
+def test_stream_commits_to_first_chunk():
+    primary = FakeClient("gemini", ["slow"] * 5, delay=0.5, gap=0.1)
+    backup = FakeClient("cohere", ["fast", " answer"], gap=0.05)
+    assert list(hedged(primary, backup).stream("q")) == ["fast", " answer"]
+
+    primary = FakeClient("gemini", ["primary", " answer"])
+    backup = FakeClient("cohere")
+    assert list(hedged(primary, backup).stream("q")) == ["primary", " answer"]
+    assert backup.calls == 0
+
+
+if __name__ == "__main__":
+    test_primary_wins_before_deadline()
+    test_backup_wins_and_loser_is_cancelled()
+    test_invalid_fast_answer_is_rejected()
+    test_both_failing_raises()
+    test_busy_pool_skips_the_hedge()
+    test_stream_commits_to_first_chunk()
+    print("Test completed.")
@@ -0,0 +1,172 @@
+import sys
+import os
+import logging
+import tempfile
+import time
+
+# Add src directory to sys.path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+
+import qa.llm.cache as llm_cache
+from qa.llm.client import LLMError
+from qa.llm.scheduler import ProviderScheduler, TokenBucket
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeClient:
+    """Answers with its own name; `rate_limited` raises a 429, `fail_after` cuts streams."""
+
+    def __init__(self, name, rate_limited=False, fail_after=None):
+        self.name = name
+        self.model = "model"
+        self.rate_limited = rate_limited
+        self.fail_after = fail_after
+        self.calls = 0
+
+    def _check(self):
+        self.calls += 1
+        if self.rate_limited:
+            raise LLMError(f"{self.name} rate limited", status=429, retry_after=30)
+
+    def complete(self, prompt):
+        self._check()
+        return f"{self.name} answer"
+
+    def stream(self, prompt):
+        self._check()
+        for i, chunk in enumerate([self.name, " ", "answer"]):
+            if i == self.fail_after:
+                raise LLMError(f"{self.name} rate limited", status=429)
+            yield chunk
+
+
+def make_scheduler(clients, rate_limits, clock=None, max_wait=30):
+    return ProviderScheduler(
+        rate_limits=rate_limits,
+        providers=list(clients),
+        max_wait=max_wait,
+        client_factory=lambda name, api_key=None: clients[name],
+        clock=clock or time.monotonic,
+    )
+
+
+def test_token_bucket_refill_and_drain():
+    clock = FakeClock()
+    bucket = TokenBucket(60, capacity=2, clock=clock)
+    assert bucket.try_acquire() and bucket.try_acquire()
+    assert not bucket.try_acquire()
+    assert bucket.time_until_available() == 1.0
+
+    # One token per second at 60 per minute, never above capacity
+    clock.now = 1.0
+    assert bucket.try_acquire()
+    assert not bucket.try_acquire()
+    clock.now = 100.0
+    assert bucket.try_acquire() and bucket.try_acquire()
+    assert not bucket.try_acquire()
+
+    # A 429 with Retry-After blocks the bucket, and refills only start after it
+    bucket.drain(10)
+    clock.now = 105.0
+    assert not bucket.try_acquire()
+    clock.now = 110.5
+    assert not bucket.try_acquire()
+    clock.now = 111.0
+    assert bucket.try_acquire()
+
+
+def test_scheduler_reroutes_and_falls_back():
+    clock = FakeClock()
+    clients = {
+        "gemini": FakeClient("gemini"),
+        "cohere": FakeClient("cohere"),
+        "llama": FakeClient("llama"),
+    }
+    scheduler = make_scheduler(clients, {"gemini": 1, "cohere": 1}, clock)
+
+    assert scheduler.complete("gemini", "q") == "gemini answer"
+    # gemini's bucket is empty: the next call goes to cohere, then to llama
+    assert scheduler.complete("gemini", "q") == "cohere answer"
+    assert scheduler.complete("gemini", "q") == "llama answer"
+    assert scheduler.stats["reroutes"] == 1
+    assert scheduler.stats["fallbacks"] == 1
+
+    # A 429 empties the provider's bucket and the call is rerouted
+    clock.now = 60.0
+    clients["gemini"].rate_limited = True
+    assert scheduler.complete("gemini", "q") == "cohere answer"
+    assert scheduler.stats["rate_limited"] == 1
+    assert scheduler.buckets["gemini"].tokens == 0
+
+
+def test_scheduler_queue_wait_times_out():
+    clients = {"gemini": FakeClient("gemini")}
+    scheduler = make_scheduler(clients, {"gemini": 1}, max_wait=0.2)
+    assert scheduler.acquire("gemini") == "gemini"
+
+    # No reroute target: the call queues, then is sent anyway after max_wait
+    start = time.monotonic()
+    assert scheduler.acquire("gemini") == "gemini"
+    waited = time.monotonic() - start
+    assert 0.2 <= waited < 2
+    assert scheduler.stats["queued"] == 1
+
+
+def test_stream_reroutes_only_before_first_chunk():
+    clients = {
+        "gemini": FakeClient("gemini", rate_limited=True),
+        "cohere": FakeClient("cohere"),
+    }
+    scheduler = make_scheduler(clients, {"gemini": 10, "cohere": 10})
+    assert "".join(scheduler.stream("gemini", "q")) == "cohere answer"
+
+    # Once a chunk was yielded, a failure is raised instead of rerouted
+    clients["gemini"] = FakeClient("gemini", fail_after=1)
+    scheduler = make_scheduler(clients, {"gemini": 10, "cohere": 10})
+    chunks = []
+    try:
+        for chunk in scheduler.stream("gemini", "q"):
+            chunks.append(chunk)
+        raise AssertionError("expected the stream to fail")
+    except LLMError:
+        pass
+    assert chunks == ["gemini"]
+    assert clients["cohere"].calls == 1
+
+
+def test_stream_answers_from_cache_without_a_token():
+    clients = {"gemini": FakeClient("gemini")}
+    scheduler = make_scheduler(clients, {"gemini": 10})
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        llm_cache.LLM_CACHE_PATH = os.path.join(tmp_dir, "llm_cache.db")
+        try:
+            llm_cache.cache_put("gemini", "model", "q", "cached answer")
+            assert list(scheduler.stream("gemini", "q")) == ["cached answer"]
+            assert scheduler.complete("gemini", "q") == "cached answer"
+        finally:
+            llm_cache.get_llm_cache().close()
+            llm_cache.LLM_CACHE_PATH = None
+            llm_cache._cache = None
+    assert clients["gemini"].calls == 0
+    assert scheduler.buckets["gemini"].tokens == 10
+
+
+if __name__ == "__main__":
+    test_token_bucket_refill_and_drain()
+    test_scheduler_reroutes_and_falls_back()
+    test_scheduler_queue_wait_times_out()
+    test_stream_reroutes_only_before_first_chunk()
+    test_stream_answers_from_cache_without_a_token()
+    print("Test completed.")
@@ -0,0 +1,66 @@
+import sys
+import os
+import json
+import logging
+import tempfile
+import numpy as np
+
+# Add src directory to sys.path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+
+from qa.context_retrieval.faiss.metadata_store import (
+    MetadataStore,
+    convert_json_metadata,
+)
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+)
+
+
+def test_convert_json_metadata():
+    """Convert a small legacy metadata JSON and read rows back by FAISS index."""
+    legacy = [
+        {
+            "id": 10,
+            "faiss_index": 0,
+            "text": "Great app for podcasts",
+            "review_rating": 5,
+            "year": 2023,
+            "month": 1,
+            "day": 2,
+            "embedding": [3.0, 4.0],
+        },
+        {
+            "id": 42,
+            "faiss_index": 1,
+            "text": "Ads are too loud 🙉",
+            "review_rating": 1,
+            "year": None,
+            "month": None,
+            "day": None,
+            "embedding": [0.0, 2.0],
+        },
+    ]
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        json_path = os.path.join(tmp_dir, "metadata.json")
+        with open(json_path, "w") as f:
+            json.dump(legacy, f)
+
+        store_dir = os.path.join(tmp_dir, "metadata")
+        convert_json_metadata(json_path, store_dir)
+        store = MetadataStore(store_dir)
+
+        assert len(store) == 2
+        assert store.ids.tolist() == [10, 42]
+        assert store.texts([1, 0]) == ["Ads are too loud 🙉", "Great app for podcasts"]
+        assert store.review_rating.tolist() == [5, 1]
+        assert store.year.tolist() == [2023, -1]
+        assert np.allclose(store.vectors, [[0.6, 0.8], [0.0, 1.0]])
+
+
+if __name__ == "__main__":
+    test_convert_json_metadata()
+    print("Test completed.")
@@ -0,0 +1,177 @@
+import sys
+import os
+import json
+import logging
+import tempfile
+from unittest import mock
+import faiss
+import numpy as np
+import pandas as pd
+
+# Add src directory to sys.path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+
+from qa.context_retrieval.faiss.columnar_filter import ColumnarFilter
+from qa.context_retrieval.faiss.faiss_agent import FaissAgent
+from qa.context_retrieval.faiss.metadata_store import (
+    MetadataStore,
+    write_metadata_store,
+)
+from qa.context_retrieval.faiss.partitioned_index import (
+    PARTITIONS_MANIFEST_FILE,
+    load_partitions,
+    partition_keys,
+    partitions_path,
+)
+from qa.context_retrieval.faiss.search_service import FaissSearchService
+from qa.context_retrieval.sql.post_processing.where_parser import parse_filter_query
+from qa.databases_creation.faiss.db_creation import (
+    append_to_partitions,
+    build_index,
+    create_partition_indexes,
+)
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+)
+
+DIM = 16
+QUERIES = [
+    "SELECT id FROM user_review WHERE year = 2023",
+    "SELECT id FROM user_review WHERE year = 2023 AND sentiment = 'negative'",
+    "SELECT id FROM user_review WHERE sentiment IN ('positive', 'neutral') AND month > 6",
+    "SELECT id FROM user_review WHERE year >= 2024 OR review_rating = 1",
+]
+
+
+def synthetic_rows(first, count, years, seed):
+    rng = np.random.default_rng(seed)
+    vectors = rng.standard_normal((count, DIM)).astype("float32")
+    faiss.normalize_L2(vectors)
+    df = pd.DataFrame(
+        {
+            "id": np.arange(first, first + count),
+            "text": [f"review {i}" for i in range(first, first + count)],
+            "review_rating": [
+                [1, 2, 3, 4, 5, None][i] for i in rng.integers(0, 6, count)
+            ],
+            "year": [years[i] for i in rng.integers(0, len(years), count)],
+            "month": rng.integers(1, 13, count),
+            "day": rng.integers(1, 29, count),
+        }
+    )
+    return vectors, df
+
+
+def columnar_filter(tmp_dir, vectors, df):
+    directory = os.path.join(tmp_dir, f"metadata_{len(df)}")
+    write_metadata_store(
+        directory,
+        df["id"].to_numpy(),
+        df["text"],
+        vectors,
+        {
+            column: df[column].to_numpy()
+            for column in ["review_rating", "year", "month", "day"]
+        },
+    )
+    return ColumnarFilter(MetadataStore(directory))
+
+
+def check_partitions_cover_rows(partitions, df):
+    """Each partition holds exactly the rows of its (year, sentiment)."""
+    keys = partition_keys(df["year"], df["review_rating"])
+    seen = []
+    for partition in partitions.partitions:
+        rows = faiss.vector_to_array(partition["index"].id_map)
+        assert len(rows) == partition["count"]
+        assert all(
+            keys[row] == (partition["year"], partition["sentiment"]) for row in rows
+        )
+        seen.extend(rows.tolist())
+    assert sorted(seen) == list(range(len(df)))
+
+
+def check_partitioned_matches_filtered(agent, index, partitions, row_filter):
+    """Partitioned search returns the same top-k as a filtered full-index search."""
+    queries = np.random.default_rng(1).standard_normal((5, DIM)).astype("float32")
+    faiss.normalize_L2(queries)
+    for query in QUERIES:
+        condition = parse_filter_query(query)
+        mask = row_filter.mask(query)
+        for vector in queries:
+            vector = vector.reshape(1, -1)
+            expected_scores, expected_rows = agent.search_filtered(
+                vector, index, mask, top_k=10
+            )
+            scores, rows = agent.search_partitioned(
+                vector, partitions, condition, mask, top_k=10
+            )
+            assert rows.tolist() == expected_rows.tolist(), query
+            np.testing.assert_allclose(scores, expected_scores, rtol=1e-5)
+            assert mask[rows].all()
+
+
+def test_partition_build_append_and_search():
+    agent = FaissAgent(search_service=FaissSearchService(workers=0))
+    vectors, df = synthetic_rows(0, 3000, [2022, 2023, 2024, None], seed=0)
+    index = build_index(vectors, "ivf_flat", nlist=16)
+
+    # A low flat-size threshold gives the larger partitions IVF sub-indexes
+    with tempfile.TemporaryDirectory() as tmp_dir, mock.patch(
+        "qa.databases_creation.faiss.db_creation.PARTITION_FLAT_MAX_ROWS", 100
+    ):
+        index_path = os.path.join(tmp_dir, "reviews.faiss")
+        create_partition_indexes(vectors, df, index_path, "ivf_flat")
+        partitions = load_partitions(index_path, index.ntotal)
+        assert partitions is not None
+        assert partitions.count == 3000
+        assert len(partitions.partitions) == 16
+        assert any(
+            faiss.try_extract_index_ivf(p["index"]) is not None
+            for p in partitions.partitions
+        )
+        check_partitions_cover_rows(partitions, df)
+        check_partitioned_matches_filtered(
+            agent, index, partitions, columnar_filter(tmp_dir, vectors, df)
+        )
+
+        # New rows, including a new year, go to existing and new partitions
+        new_vectors, new_df = synthetic_rows(3000, 300, [2024, 2026], seed=2)
+        index.add(new_vectors)
+        append_to_partitions(index_path, new_vectors, np.arange(3000, 3300), new_df)
+        all_vectors = np.vstack([vectors, new_vectors])
+        all_df = pd.concat([df, new_df], ignore_index=True)
+
+        partitions = load_partitions(index_path, index.ntotal)
+        assert partitions is not None
+        assert partitions.count == 3300
+        assert any(p["year"] == 2026 for p in partitions.partitions)
+        check_partitions_cover_rows(partitions, all_df)
+        check_partitioned_matches_filtered(
+            agent, index, partitions, columnar_filter(tmp_dir, all_vectors, all_df)
+        )
+
+
+def test_stale_partitions_are_not_loaded():
+    vectors, df = synthetic_rows(0, 200, [2023], seed=0)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        index_path = os.path.join(tmp_dir, "reviews.faiss")
+        assert load_partitions(index_path, 200) is None
+
+        create_partition_indexes(vectors, df, index_path, "ivf_flat")
+        assert load_partitions(index_path, 200) is not None
+        # An index that gained rows the partitions never saw (an interrupted update)
+        assert load_partitions(index_path, 250) is None
+
+        with open(
+            os.path.join(partitions_path(index_path), PARTITIONS_MANIFEST_FILE)
+        ) as f:
+            assert json.load(f)["count"] == 200
+
+
+if __name__ == "__main__":
+    test_partition_build_append_and_search()
+    test_stale_partitions_are_not_loaded()
+    print("Test completed.")
@@ -0,0 +1,77 @@
+import sys
+import os
+import logging
+import tempfile
+import numpy as np
+
+# Add src directory to sys.path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+
+from qa.context_retrieval.faiss.columnar_filter import ColumnarFilter
+from qa.context_retrieval.faiss.metadata_store import (
+    MetadataStore,
+    write_metadata_store,
+)
+from qa.context_retrieval.faiss.partitioned_index import match_partition, partition_keys
+from qa.context_retrieval.sql.post_processing.where_parser import parse_filter_query
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+)
+
+
+def test_partition_selection_covers_filter():
+    """Selected partitions hold every matching row; fully matched ones hold only those."""
+    ratings = [[1, 2, 3, 4, 5, None][i % 6] for i in range(200)]
+    years = [[2022, 2023, 2024, None][i % 4] for i in range(200)]
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        write_metadata_store(
+            tmp_dir,
+            np.arange(200),
+            ["some review text"] * 200,
+            np.ones((200, 2), dtype="float32"),
+            {
+                "review_rating": ratings,
+                "year": years,
+                "month": [i % 12 + 1 for i in range(200)],
+                "day": [i % 28 + 1 for i in range(200)],
+            },
+        )
+        columnar_filter = ColumnarFilter(MetadataStore(tmp_dir))
+
+    keys = partition_keys(years, ratings)
+    queries = [
+        "SELECT id FROM user_review WHERE year = 2023",
+        "SELECT id FROM user_review WHERE year = '2023' AND sentiment = 'negative'",
+        "SELECT id FROM user_review WHERE sentiment IN ('positive', 'neutral') AND month > 6",
+        "SELECT id FROM user_review WHERE NOT year BETWEEN 2022 AND 2023 OR sentiment <> 'positive'",
+        "SELECT id FROM user_review WHERE year IS NULL OR review_rating = 5",
+    ]
+    for query in queries:
+        condition = parse_filter_query(query)
+        mask = columnar_filter.mask(query)
+        for key in set(keys):
+            rows = np.array([k == key for k in keys])
+            match = match_partition(condition, *key)
+            if match is False:
+                assert not mask[rows].any(), (query, key)
+            elif match is True:
+                assert mask[rows].all(), (query, key)
+
+    # A single year and sentiment rules out every other partition, except those with
+    # a missing year or an unknown sentiment
+    condition = parse_filter_query(queries[1])
+    selected = {key for key in keys if match_partition(condition, *key) is not False}
+    assert selected == {
+        (2023, "negative"),
+        (2023, "unknown"),
+        (-1, "negative"),
+        (-1, "unknown"),
+    }
+
+
+if __name__ == "__main__":
+    test_partition_selection_covers_filter()
+    print("Test completed.")
@@ -2,12 +2,12 @@ import sys
 import os
 import logging
 import faiss
-import json
 from sentence_transformers import SentenceTransformer
 
 # Add src directory to sys.path for imports
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
 
+from qa.context_retrieval.faiss.metadata_store import MetadataStore
 from qa.qa_faiss_pipeline import QAFaissPipeline
 
 # Load environment variables
@@ -24,8 +24,7 @@ logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(
 logging.info("Loading FAISS index, metadata, and model for testing.")
 index = faiss.read_index(FAISS_PATH)
 
-with open(METADATA_FAISS_PATH, "r") as f:
-    metadata = json.load(f)
+metadata = MetadataStore(METADATA_FAISS_PATH)
 
 model = SentenceTransformer(EMBEDDING_MODEL_PATH)
 logging.info("FAISS resources loaded successfully for testing.")
@@ -43,6 +42,6 @@ answer = pipeline.answer_question(question, 5, 10, agent_type=agent_type)
 
 # Output the answer
 if answer:
-    print("Answer:", answer)
+    print("Answer:", "".join(answer))
 else:
     logging.warning("No answer generated for the question.")
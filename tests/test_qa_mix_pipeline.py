@@ -2,13 +2,13 @@ import sys
 import os
 import logging
 import faiss
-import json
 from sentence_transformers import SentenceTransformer
 import pandas as pd
 
 # Add src directory to sys.path for imports
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
 
+from qa.context_retrieval.faiss.metadata_store import MetadataStore
 from qa.qa_mix_pipeline import QAMixPipeline
 
 # Load environment variables
@@ -25,18 +25,13 @@ logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(
 logging.info("Loading FAISS index, metadata, and model for testing.")
 index = faiss.read_index(FAISS_PATH)
 
-with open(METADATA_FAISS_PATH, "r") as f:
-    metadata = json.load(f)
-metadata_by_id = {entry['id']: entry for entry in metadata}
+metadata = MetadataStore(METADATA_FAISS_PATH)
 
 model = SentenceTransformer(EMBEDDING_MODEL_PATH)
 logging.info("FAISS resources loaded successfully for testing.")
 
 # Initialize QAMixPipeline with loaded resources
-pipeline = QAMixPipeline()
-pipeline.model = model
-pipeline.faiss_index = index
-pipeline.metadata_by_id = metadata_by_id
+pipeline = QAMixPipeline(model, index, metadata)
 
 # Define a test question and parameters
 question = "What features do users mention the most?"
@@ -51,4 +46,4 @@ response = pipeline.answer_question(
     agent_type="gemini",
     top_k=3  # Retrieve top 3 similar reviews
 )
-print("Generated Response:", response)
\ No newline at end of file
+print("Generated Response:", "".join(response or []))
\ No newline at end of file
@@ -1,7 +1,6 @@
 import sys
 import os
 import logging
-import json
 import faiss
 from dotenv import load_dotenv
 from sentence_transformers import SentenceTransformer
@@ -9,6 +8,7 @@ from sentence_transformers import SentenceTransformer
 # Add src directory to sys.path for imports
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
 
+from qa.context_retrieval.faiss.metadata_store import MetadataStore
 from qa.qa_router_pipeline import RouterPipeline
 
 # Load environment variables
@@ -28,8 +28,7 @@ logging.info("Loading FAISS index...")
 faiss_index = faiss.read_index(FAISS_PATH)
 
 logging.info("Loading metadata...")
-with open(METADATA_FAISS_PATH, "r") as f:
-    metadata = json.load(f)
+metadata = MetadataStore(METADATA_FAISS_PATH)
     
 router_pipeline = RouterPipeline(model, faiss_index, metadata)
 
@@ -43,7 +42,7 @@ answer = router_pipeline.route_question(question, agent_type)
 
 # Output the answer
 if answer:
-    logging.info(f"Final answer for '{question}': {answer}")
+    logging.info(f"Final answer for '{question}': {''.join(answer)}")
 else:
     logging.warning(f"No answer generated for '{question}'")
 
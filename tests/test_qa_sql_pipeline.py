@@ -24,6 +24,6 @@ answer = pipeline.answer_question(question, query_type=query_type, agent_type=ag
 
 # Output the answer
 if answer:
-    print("Answer:", answer)
+    print("Answer:", "".join(answer))
 else:
     logging.warning("No answer generated for the question.")
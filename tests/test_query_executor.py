@@ -0,0 +1,185 @@
+import sys
+import os
+import logging
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+from unittest import mock
+
+# Add src directory to sys.path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+
+from qa.context_retrieval.sql.post_processing.query_executor import (
+    ResultSummary,
+    SQLiteConnectionPool,
+    fetch_bounded,
+    run_query,
+)
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+)
+
+
+def review_cursor(n, text_length=10):
+    """Cursor over `n` rows of (id, rating, text); every tenth rating is NULL."""
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE review (id INTEGER, rating INTEGER, text TEXT)")
+    conn.executemany(
+        "INSERT INTO review VALUES (?, ?, ?)",
+        ((i, None if i % 10 == 0 else i % 5 + 1, "x" * text_length) for i in range(n)),
+    )
+    return conn.execute("SELECT id, rating, text FROM review ORDER BY id")
+
+
+def test_result_within_budget_is_returned_in_full():
+    df = fetch_bounded(review_cursor(50), max_rows=100, max_bytes=10_000)
+    assert df["id"].tolist() == list(range(50))
+    assert list(df.columns) == ["id", "rating", "text"]
+    assert df.attrs["total_rows"] == 50
+    assert "summary" not in df.attrs
+
+
+def test_row_budget_summarizes_result():
+    df = fetch_bounded(review_cursor(5000), max_rows=100, max_bytes=1_000_000)
+    assert df.attrs["total_rows"] == 5000
+    assert len(df) == 20
+    # The sample holds distinct real rows from the whole result, not just its head
+    assert df["id"].is_unique
+    assert df["id"].max() > 100
+    assert all(df["text"] == "x" * 10)
+
+
+def test_byte_budget_summarizes_result():
+    df = fetch_bounded(
+        review_cursor(30, text_length=1000), max_rows=100, max_bytes=5000
+    )
+    assert df.attrs["total_rows"] == 30
+    assert "summary" in df.attrs
+    assert len(df) == 20
+
+
+def test_summary_text():
+    summary = ResultSummary(["id", "rating", "text"])
+    for row in review_cursor(1000):
+        summary.add(row)
+    text = summary.to_text()
+    assert text.startswith("The result has 1000 rows, too many to include in full.")
+    assert "Columns: id, rating, text." in text
+    assert "- id: min 0, max 999, mean 499.50, 0 nulls" in text
+    assert "- rating: min 1, max 5, mean 3.22, 100 nulls" in text
+    assert "- text: 1000 non-null values, average length 10 characters" in text
+    assert "Random sample of 20 rows:" in text
+
+
+def test_reservoir_sample_is_uniform():
+    """Every row is equally likely to be sampled, wherever it is in the result."""
+    n, runs = 1000, 300
+    counts = [0] * 10
+    for seed in range(runs):
+        summary = ResultSummary(["id"], sample_size=20)
+        summary._random = random.Random(seed)
+        for i in range(n):
+            summary.add((i,))
+        assert len(summary.sample) == 20
+        assert len(set(summary.sample)) == 20
+        for (i,) in summary.sample:
+            counts[i * 10 // n] += 1
+    # 600 samples per tenth of the result are expected; allow about 4 standard deviations
+    assert all(500 <= count <= 700 for count in counts), counts
+
+
+def review_database(directory):
+    path = os.path.join(directory, "reviews.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE review (id INTEGER, rating INTEGER)")
+    conn.executemany(
+        "INSERT INTO review VALUES (?, ?)", ((i, i % 5) for i in range(100))
+    )
+    conn.commit()
+    conn.close()
+    return path
+
+
+def test_pool_keeps_one_read_only_connection_per_thread():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        pool = SQLiteConnectionPool(review_database(tmp_dir))
+        with pool.connection() as conn:
+            pass
+        with pool.connection() as again:
+            assert again is conn
+            assert again.execute("PRAGMA query_only").fetchone()[0] == 1
+            assert again.execute("PRAGMA cache_size").fetchone()[0] == -65536
+            assert again.execute("PRAGMA temp_store").fetchone()[0] == 2  # MEMORY
+            assert again.execute("PRAGMA mmap_size").fetchone()[0] > 0
+
+        others = []
+
+        def use_pool():
+            with pool.connection() as other:
+                others.append(other)
+                other.execute("SELECT COUNT(*) FROM review").fetchone()
+
+        for _ in range(2):
+            thread = threading.Thread(target=use_pool)
+            thread.start()
+            thread.join()
+        assert others[0] is not conn and others[1] is not others[0]
+        # The first worker thread's connection was closed when the second opened one
+        assert len(pool._connections) == 2
+        pool.close_all()
+
+
+def test_writes_are_rejected():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        pool = SQLiteConnectionPool(review_database(tmp_dir))
+        with mock.patch(
+            "qa.context_retrieval.sql.post_processing.query_executor._pool", pool
+        ):
+            for query in [
+                "DELETE FROM review",
+                "INSERT INTO review VALUES (1000, 5)",
+                "DROP TABLE review",
+            ]:
+                result = run_query(query)
+                assert isinstance(result, str) and result.startswith(
+                    "Error executing query"
+                ), query
+            assert run_query("SELECT COUNT(*) AS n FROM review")["n"][0] == 100
+        pool.close_all()
+
+
+def test_runaway_query_is_interrupted():
+    runaway = (
+        "WITH RECURSIVE counter(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM counter) "
+        "SELECT COUNT(*) FROM counter"
+    )
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        pool = SQLiteConnectionPool(review_database(tmp_dir), timeout_seconds=0.2)
+        with mock.patch(
+            "qa.context_retrieval.sql.post_processing.query_executor._pool", pool
+        ):
+            start = time.monotonic()
+            result = run_query(runaway)
+            assert time.monotonic() - start < 5
+            assert isinstance(result, str)
+            assert "exceeded the 0.2s time limit" in result
+
+            # The deadline is re-armed per query, so the connection stays usable
+            assert run_query("SELECT COUNT(*) AS n FROM review")["n"][0] == 100
+        pool.close_all()
+
+
+if __name__ == "__main__":
+    test_result_within_budget_is_returned_in_full()
+    test_row_budget_summarizes_result()
+    test_byte_budget_summarizes_result()
+    test_summary_text()
+    test_reservoir_sample_is_uniform()
+    test_pool_keeps_one_read_only_connection_per_thread()
+    test_writes_are_rejected()
+    test_runaway_query_is_interrupted()
+    print("Test completed.")
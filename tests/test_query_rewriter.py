@@ -0,0 +1,66 @@
+import sys
+import os
+import logging
+import sqlite3
+import pandas as pd
+
+# Add src directory to sys.path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+
+from qa.databases_creation.sql_lite.db_creation import (
+    USER_REVIEW_COLUMNS,
+    append_rollup,
+    build_rollup,
+    create_user_review_table,
+    insert_reviews,
+)
+from qa.context_retrieval.sql.post_processing.query_rewriter import rewrite_to_rollup
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+)
+
+
+def test_rewrite_to_rollup():
+    """Rewritten aggregate queries return the same result as the base table."""
+    rows = [
+        (i, "author", f"review_{i}", "some review text", i % 5 + 1,
+         ["negative", "negative", "neutral", "positive", "positive"][i % 5],
+         2022 + i % 2, i % 12 + 1, i % 28 + 1)
+        for i in range(500)
+    ]  # fmt: skip
+
+    conn = sqlite3.connect(":memory:")
+    create_user_review_table(conn)
+    insert_reviews(conn, pd.DataFrame(rows[:300], columns=USER_REVIEW_COLUMNS))
+    build_rollup(conn)
+    insert_reviews(conn, pd.DataFrame(rows[300:], columns=USER_REVIEW_COLUMNS))
+    append_rollup(conn, min_id=300)
+
+    queries = [
+        "SELECT COUNT(*) FROM user_review WHERE sentiment = 'positive';",
+        "SELECT sentiment, COUNT(*) AS total FROM user_review WHERE year = 2023 GROUP BY sentiment ORDER BY total DESC",
+        "SELECT month, AVG(review_rating) FROM user_review WHERE year = 2022 GROUP BY month",
+        "SELECT COUNT(*) FROM user_review WHERE year = 1999",
+    ]
+    for query in queries:
+        rewritten = rewrite_to_rollup(query)
+        assert rewritten is not None and "user_review_rollup" in rewritten
+        expected = pd.read_sql_query(query, conn)
+        actual = pd.read_sql_query(rewritten, conn)
+        pd.testing.assert_frame_equal(expected, actual, check_dtype=False)
+
+    # Queries touching columns the rollup does not have are left alone
+    assert (
+        rewrite_to_rollup(
+            "SELECT COUNT(*) FROM user_review WHERE review_text LIKE '%ads%'"
+        )
+        is None
+    )
+    assert rewrite_to_rollup("SELECT review_text FROM user_review LIMIT 5") is None
+
+
+if __name__ == "__main__":
+    test_rewrite_to_rollup()
+    print("Test completed.")
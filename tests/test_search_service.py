@@ -0,0 +1,110 @@
+import sys
+import os
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import faiss
+import numpy as np
+
+# Add src directory to sys.path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+
+from qa.context_retrieval.faiss.faiss_agent import search_parameters
+from qa.context_retrieval.faiss.search_service import (
+    FaissSearchService,
+    get_search_service,
+)
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+)
+
+
+def build_ivf_flat(n=4000, d=32, nlist=32, seed=0):
+    rng = np.random.default_rng(seed)
+    vectors = rng.standard_normal((n, d)).astype("float32")
+    faiss.normalize_L2(vectors)
+    index = faiss.index_factory(d, f"IVF{nlist},Flat", faiss.METRIC_INNER_PRODUCT)
+    index.train(vectors)
+    index.add(vectors)
+    return index, vectors
+
+
+def test_omp_threads_apply_to_search_threads_only():
+    caller_threads = faiss.omp_get_max_threads()
+    service = FaissSearchService(workers=2, omp_threads=caller_threads + 2)
+    try:
+        assert service.run(faiss.omp_get_max_threads) == caller_threads + 2
+        # The thread that created the service (e.g. one that later trains an
+        # index) keeps its own setting
+        assert faiss.omp_get_max_threads() == caller_threads
+    finally:
+        service.close()
+
+    inline = FaissSearchService(workers=0, omp_threads=caller_threads + 3)
+    assert inline.run(faiss.omp_get_max_threads) == caller_threads + 3
+    assert faiss.omp_get_max_threads() == caller_threads
+
+
+def test_concurrent_searches_match_sequential():
+    index, vectors = build_ivf_flat()
+    queries = vectors[:64]
+    params = search_parameters(index, 8)
+    expected_D, expected_I = index.search(queries, 5, params=params)
+
+    service = FaissSearchService(workers=4, omp_threads=1)
+    try:
+        with ThreadPoolExecutor(max_workers=8) as clients:
+            results = list(
+                clients.map(
+                    lambda q: service.search(index, q.reshape(1, -1), 5, params),
+                    queries,
+                )
+            )
+    finally:
+        service.close()
+
+    np.testing.assert_array_equal(np.vstack([I for _, I in results]), expected_I)
+    np.testing.assert_allclose(np.vstack([D for D, _ in results]), expected_D)
+    # Per-call parameters leave the shared index's own setting alone
+    assert faiss.extract_index_ivf(index).nprobe == 1
+    assert service.stats["searches"] == len(queries)
+    assert service.stats["search_seconds"] > 0
+
+
+def test_search_errors_reach_the_caller():
+    service = FaissSearchService(workers=1)
+
+    def fail():
+        raise RuntimeError("search failed")
+
+    try:
+        service.run(fail)
+        raise AssertionError("expected RuntimeError")
+    except RuntimeError:
+        pass
+    finally:
+        service.close()
+    assert service.stats["searches"] == 1
+
+
+def test_shared_service():
+    services = []
+    threads = [
+        threading.Thread(target=lambda: services.append(get_search_service()))
+        for _ in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert all(service is services[0] for service in services)
+
+
+if __name__ == "__main__":
+    test_omp_threads_apply_to_search_threads_only()
+    test_concurrent_searches_match_sequential()
+    test_search_errors_reach_the_caller()
+    test_shared_service()
+    print("Test completed.")
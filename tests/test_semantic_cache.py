@@ -0,0 +1,92 @@
+import sys
+import os
+import logging
+import tempfile
+import time
+import numpy as np
+
+# Add src directory to sys.path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+
+from qa.cache.semantic_cache import SemanticCache
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+)
+
+
+def unit(*values):
+    vector = np.zeros(8, dtype="float32")
+    vector[: len(values)] = values
+    return vector / np.linalg.norm(vector)
+
+
+def test_similarity_threshold():
+    cache = SemanticCache(threshold=0.95)
+    cache.put("How do users feel about ads?", unit(1, 0), "cohere", "They dislike them")
+
+    assert cache.get("What do users think of ads?", unit(1, 0.1), "cohere") == (
+        "They dislike them"
+    )
+    # Below the threshold, and for another agent type, the answer is not reused
+    assert cache.get("What do users think of podcasts?", unit(1, 0.5), "cohere") is None
+    assert cache.get("What do users think of ads?", unit(1, 0.1), "gemini") is None
+    assert cache.stats["hits"] == 1 and cache.stats["misses"] == 2
+
+
+def test_numbers_must_match():
+    cache = SemanticCache(threshold=0.9)
+    cache.put("Negative reviews in 2022?", unit(1, 0), "cohere", "120")
+    assert cache.get("Negative reviews in 2023?", unit(1, 0), "cohere") is None
+    assert cache.get("negative reviews in 2022", unit(1, 0), "cohere") == "120"
+
+
+def test_ttl_expiry():
+    cache = SemanticCache(ttl_seconds=0.2)
+    cache.put("question", unit(1), "cohere", "answer")
+    assert cache.get("question", unit(1), "cohere") == "answer"
+    time.sleep(0.3)
+    assert cache.get("question", unit(1), "cohere") is None
+    assert cache.stats["expirations"] == 1
+    assert len(cache) == 0
+
+
+def test_lru_eviction():
+    cache = SemanticCache(max_entries=2)
+    cache.put("first", unit(1), "cohere", "a")
+    cache.put("second", unit(0, 1), "cohere", "b")
+    # Using the first entry makes the second the least recently used one
+    assert cache.get("first", unit(1), "cohere") == "a"
+    cache.put("third", unit(0, 0, 1), "cohere", "c")
+
+    assert len(cache) == 2
+    assert cache.stats["evictions"] == 1
+    assert cache.get("second", unit(0, 1), "cohere") is None
+    assert cache.get("first", unit(1), "cohere") == "a"
+    assert cache.get("third", unit(0, 0, 1), "cohere") == "c"
+
+
+def test_invalidated_when_data_changes():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, "reviews.db")
+        with open(db_path, "w") as f:
+            f.write("v1")
+        cache = SemanticCache(data_paths=[db_path])
+        cache.put("question", unit(1), "cohere", "answer")
+        assert cache.get("question", unit(1), "cohere") == "answer"
+
+        with open(db_path, "a") as f:
+            f.write(" and new reviews")
+        assert cache.get("question", unit(1), "cohere") is None
+        assert cache.stats["invalidations"] == 1
+        assert len(cache) == 0
+
+
+if __name__ == "__main__":
+    test_similarity_threshold()
+    test_numbers_must_match()
+    test_ttl_expiry()
+    test_lru_eviction()
+    test_invalidated_when_data_changes()
+    print("Test completed.")
@@ -0,0 +1,136 @@
+import sys
+import os
+import logging
+import threading
+from unittest import mock
+import numpy as np
+import pandas as pd
+
+# Add src directory to sys.path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+
+from qa.qa_router_pipeline import RouterPipeline
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+)
+
+QUESTION = "How many negative reviews were written in 2023?"
+QUERY = "SELECT COUNT(*) FROM user_review WHERE year = 2023"
+RELAXED_QUERY = "SELECT COUNT(*) FROM user_review"
+
+
+class FakeModel:
+    def encode(self, texts):
+        return np.ones((len(texts), 4))
+
+
+class UnsureRouter:
+    """Local router that leans towards `label` without being confident."""
+
+    def __init__(self, label):
+        self.label = label
+
+    def predict_embeddings(self, embeddings):
+        return [self.label], [0.5]
+
+
+class FakeFaissPipeline:
+    def __init__(self, *args):
+        pass
+
+    def retrieve_context(self, question, top_k, nprobe):
+        return "faiss context"
+
+
+class FakeRetriever:
+    """SQL generation agent that records its LLM calls; each can be held."""
+
+    calls = []
+    release = threading.Event()
+    started = threading.Event()
+
+    def __init__(self, api_key=None):
+        pass
+
+    def get_query(self, question, query_type):
+        FakeRetriever.calls.append("get_query")
+        FakeRetriever.started.set()
+        FakeRetriever.release.wait(5)
+        return f"```sql\n{QUERY}\n```"
+
+    def get_relax_query(self, question, query):
+        FakeRetriever.calls.append("get_relax_query")
+        return f"```sql\n{RELAXED_QUERY}\n```"
+
+    def solved_error_query(self, question, query, error):
+        FakeRetriever.calls.append("solved_error_query")
+        return None
+
+
+def run_query(query, query_type, query_budget, query_runner=None):
+    """The first query finds nothing, so the pipeline asks for a relaxed one."""
+    if query == QUERY:
+        return pd.DataFrame({"count": []})
+    return pd.DataFrame({"count": [42]})
+
+
+def classify_speculatively(guess, classification, hold_generation=False):
+    FakeRetriever.calls = []
+    FakeRetriever.release = threading.Event()
+    FakeRetriever.started = threading.Event()
+    if not hold_generation:
+        FakeRetriever.release.set()
+
+    pipeline = RouterPipeline(FakeModel(), None, None)
+    pipeline.local_router = UnsureRouter(guess)
+
+    def classify(question, agent_type, combined=False):
+        # The LLM router answers while SQL generation is under way
+        assert FakeRetriever.started.wait(5)
+        return classification, None
+
+    pipeline.classify_and_generate_query = classify
+    with mock.patch(
+        "qa.qa_router_pipeline.QAFaissPipeline", FakeFaissPipeline
+    ), mock.patch(
+        "qa.context_retrieval.retrieval_pipeline.CohereQueryRetriever", FakeRetriever
+    ), mock.patch(
+        "qa.context_retrieval.retrieval_pipeline.run_generated_query", run_query
+    ):
+        result = pipeline.classify_speculatively(QUESTION, "cohere")
+        # Let the discarded stage run on, then wait for it to stop
+        FakeRetriever.release.set()
+        pipeline._executor.shutdown(wait=True)
+    return result, pipeline.speculation_stats
+
+
+def test_right_guess_is_reused():
+    (classification, retrieved, query), stats = classify_speculatively(
+        "aggregate", "aggregate"
+    )
+    assert classification == "aggregate"
+    assert query is None
+    sql_query, context = retrieved
+    assert sql_query == RELAXED_QUERY
+    assert context["count"].tolist() == [42]
+    assert FakeRetriever.calls == ["get_query", "get_relax_query"]
+    assert stats["used"] == 1 and stats["discarded"] == 1  # the direct search
+
+
+def test_wrong_guess_is_discarded():
+    (classification, retrieved, query), stats = classify_speculatively(
+        "aggregate", "direct", hold_generation=True
+    )
+    assert classification == "direct"
+    assert retrieved == "faiss context"
+    # Generation was already running, but the relax call is never made
+    assert FakeRetriever.calls == ["get_query"]
+    assert stats["used"] == 1 and stats["discarded"] == 1
+
+
+if __name__ == "__main__":
+    test_right_guess_is_reused()
+    test_wrong_guess_is_discarded()
+    print("Test completed.")
@@ -0,0 +1,90 @@
+import sys
+import os
+import logging
+import sqlite3
+import tempfile
+import numpy as np
+import pandas as pd
+
+# Add src directory to sys.path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+
+from qa.databases_creation.sql_lite.db_creation import build_database, preprocess_text
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+)
+
+LONG_TEXT = "the app keeps crashing when I open my playlists on the phone"
+
+
+def write_reviews_csv(path, n=200):
+    """Reviews with the cases preprocessing drops or rewrites, spread over chunks."""
+    rng = np.random.default_rng(0)
+    texts = []
+    for i in range(n):
+        if i % 11 == 0:
+            texts.append(None)  # missing text
+        elif i % 7 == 0:
+            texts.append("too short to keep")
+        elif i % 5 == 0:
+            texts.append(f"{LONG_TEXT} 😀🎵 really!! #{i}")
+        else:
+            texts.append(f"{LONG_TEXT}, review {i}")
+    pd.DataFrame(
+        {
+            "pseudo_author_id": [f"author_{i}" for i in range(n)],
+            "review_id": [f"review_{i}" for i in range(n)],
+            "review_text": texts,
+            "review_rating": [
+                None if i % 13 == 0 else int(r)
+                for i, r in enumerate(rng.integers(1, 6, n))
+            ],
+            "review_timestamp": [
+                (
+                    "not a date"
+                    if i % 17 == 0
+                    else f"202{i % 4}-0{1 + i % 9}-1{i % 10} 08:00:00"
+                )
+                for i in range(n)
+            ],
+        }
+    ).to_csv(path, index=False)
+
+
+def table_rows(database_path, table, order_by):
+    conn = sqlite3.connect(database_path)
+    try:
+        return conn.execute(f"SELECT * FROM {table} ORDER BY {order_by}").fetchall()
+    finally:
+        conn.close()
+
+
+def test_chunked_build_matches_single_pass():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        csv_path = os.path.join(tmp_dir, "reviews.csv")
+        write_reviews_csv(csv_path)
+        chunked_path = os.path.join(tmp_dir, "chunked.db")
+        single_path = os.path.join(tmp_dir, "single.db")
+        build_database(csv_path, chunked_path, chunksize=7)
+        build_database(csv_path, single_path, chunksize=10_000)
+
+        chunked = table_rows(chunked_path, "user_review", "id")
+        assert chunked == table_rows(single_path, "user_review", "id")
+        rollup_order = "year, month, day, review_rating, sentiment"
+        assert table_rows(chunked_path, "user_review_rollup", rollup_order) == (
+            table_rows(single_path, "user_review_rollup", rollup_order)
+        )
+
+        # Both match preprocessing the whole file at once, as the build did before
+        expected = preprocess_text(pd.read_csv(csv_path))
+        assert [row[0] for row in chunked] == expected["id"].tolist()
+        assert [row[3] for row in chunked] == expected["review_text"].tolist()
+        assert [row[5] for row in chunked] == expected["sentiment"].tolist()
+        assert 0 < len(chunked) < 200
+
+
+if __name__ == "__main__":
+    test_chunked_build_matches_single_pass()
+    print("Test completed.")
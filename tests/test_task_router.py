@@ -0,0 +1,74 @@
+import sys
+import os
+import logging
+
+# Add src directory to sys.path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+
+from qa.router.task_router import post_processing_route_and_query
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+)
+
+
+def response(label, sql=None):
+    """A response in the format `router_sql_question` asks for."""
+    text = f"Brief Explanation: The question needs it.\nFinal Answer: `{label}`\n"
+    if sql is not None:
+        text += f"SQL:\n```sql\n{sql}\n```\n"
+    return text
+
+
+def test_aggregate_with_sql():
+    sql = "SELECT COUNT(*) FROM user_review WHERE sentiment = 'negative'"
+    assert post_processing_route_and_query(response("aggregate", sql)) == (
+        "aggregate",
+        sql,
+    )
+
+
+def test_filter_with_id_query():
+    sql = "SELECT id FROM user_review WHERE year = 2023 AND sentiment = 'positive'"
+    assert post_processing_route_and_query(response("filter", sql)) == ("filter", sql)
+
+
+def test_filter_with_wrong_query_shape():
+    # Filter queries must select ids, or they cannot be joined to the FAISS rows
+    for sql in (
+        "SELECT review_text FROM user_review WHERE year = 2023",
+        "SELECT COUNT(*) FROM user_review WHERE year = 2023",
+        "SELECT id FROM user_review",
+    ):
+        assert post_processing_route_and_query(response("filter", sql)) == (
+            "filter",
+            None,
+        )
+
+
+def test_direct_has_no_query():
+    assert post_processing_route_and_query(response("direct")) == ("direct", None)
+    # Even if the model wrote a query anyway
+    sql = "SELECT id FROM user_review WHERE year = 2023"
+    assert post_processing_route_and_query(response("direct", sql)) == (
+        "direct",
+        None,
+    )
+
+
+def test_missing_sql_block():
+    assert post_processing_route_and_query(response("aggregate")) == (
+        "aggregate",
+        None,
+    )
+    assert post_processing_route_and_query(response("filter")) == ("filter", None)
+
+
+if __name__ == "__main__":
+    test_aggregate_with_sql()
+    test_filter_with_id_query()
+    test_filter_with_wrong_query_shape()
+    test_direct_has_no_query()
+    test_missing_sql_block()
+    print("Test completed.")